@@ -0,0 +1,61 @@
+"""Timing and reporting helpers shared by the benchmark scripts.
+"""
+
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+
+BenchmarkedOperation = Callable[[int], Awaitable[object]]
+
+
+class Benchmark:
+    """Times repeated calls to an operation, and reports statistics about them.
+
+    :var name: The name of the operation, as printed in the results table
+    :vartype name: str
+    :var timings: The duration of each call to the operation, in seconds
+    :vartype timings: List[float]
+    :var cpuTime: The total CPU time used by the process during all calls to the operation, in seconds.
+                    This includes other threads, e.g the database driver's, and for SQLite, the database itself.
+    :vartype cpuTime: float
+    """
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.timings: List[float] = []
+        self.cpuTime = 0.0
+
+
+    async def run(self, operation: BenchmarkedOperation, repeat: int):
+        """Call `operation` `repeat` times in sequence, timing each call.
+        Each call is given its index, so that calls can act on different records.
+
+        :param BenchmarkedOperation operation: The operation to time
+        :param int repeat: The number of times to call the operation
+        """
+        cpuStarted = time.process_time()
+        for i in range(repeat):
+            started = time.perf_counter()
+            await operation(i)
+            self.timings.append(time.perf_counter() - started)
+        self.cpuTime += time.process_time() - cpuStarted
+
+
+    def __str__(self) -> str:
+        timings = sorted(self.timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        return f"{self.name:<44}{len(timings):>8}{statistics.mean(timings) * 1e6:>12.1f}" \
+                f"{statistics.median(timings) * 1e6:>12.1f}{p95 * 1e6:>12.1f}{self.cpuTime / len(timings) * 1e6:>12.1f}" \
+                f"{len(timings) / sum(timings):>12.1f}"
+
+
+def printHeader(title: str):
+    print(f"\n{title}")
+    print(f"{'operation':<44}{'calls':>8}{'mean us':>12}{'median us':>12}{'p95 us':>12}{'cpu us':>12}{'ops/s':>12}")
+
+
+async def benchmark(name: str, operation: BenchmarkedOperation, repeat: int) -> Benchmark:
+    result = Benchmark(name)
+    await result.run(operation, repeat)
+    print(result)
+    return result
@@ -0,0 +1,114 @@
+"""Micro-benchmarks for registering and calling legacy message commands through `HeirarchicalCommandsDB`.
+
+A commands DB is filled with `--commands` no-op commands, spread over every access level, some with aliases and some
+case sensitive. `HeirarchicalCommandsDB.call` is then timed for hits and misses, from the lowest and highest access levels.
+Registering the commands with help strings, building their help pages and suggesting commands for typos are also timed,
+as is splitting messages of different lengths into command calls with `CommandParser`. Run from the project root:
+
+> `python -m benchmarks.commandsBenchmarks --commands 300 --repeat 100000`
+"""
+
+import argparse
+import asyncio
+import random
+from typing import List, Optional, Tuple
+
+from bot.cfg import cfg
+cfg.validateConfig()
+
+# These must be imported in the same order as bot.bot, to avoid circular imports
+from bot import lib # noqa: F401
+from bot.interactions import basedCommand # noqa: F401
+from bot.commandsManager.heirarchicalCommandsDB import HeirarchicalCommandsDB
+from bot.commandsManager.commandParser import CommandParser
+from discord import Message
+
+from benchmarks.benchmarkUtil import benchmark, printHeader
+
+
+async def noop(message: Message, args: str, isDM: bool):
+    pass
+
+
+def fillCommandsDB(db: HeirarchicalCommandsDB, numCommands: int, rng: random.Random, withHelp: bool = False) -> List[Tuple[str, int]]:
+    """Register `numCommands` no-op commands. Most commands require the lowest access level, as in a typical bot.
+    A quarter of the commands have an alias, and a tenth of them are case sensitive.
+    If `withHelp` is given, the commands are added to help, with help strings of realistic length.
+
+    :return: The name and required access level of every registered command
+    :rtype: List[Tuple[str, int]]
+    """
+    weights = [8] + [1] * (db.numAccessLevels - 1)
+    commands: List[Tuple[str, int]] = []
+    for i in range(numCommands):
+        accessLevel = rng.choices(range(db.numAccessLevels), weights)[0]
+        caseSensitive = rng.random() < 0.1
+        name = f"Command{i}" if caseSensitive else f"command{i}"
+        aliases = [f"cmd{i}"] if rng.random() < 0.25 else []
+        db.register(name, noop, accessLevel, aliases=aliases, forceKeepCommandCasing=caseSensitive, noHelp=not withHelp,
+                    signatureStr=f"**{name}** *<arg1> <arg2>*", shortHelp=f"Does the thing for {name}. " * 3)
+        commands.append((name, accessLevel))
+    return commands
+
+
+async def runBenchmarks(numCommands: int, repeat: int, bulkRepeat: int):
+    rng = random.Random(0)
+    db = HeirarchicalCommandsDB(len(cfg.userAccessLevels))
+    commands = fillCommandsDB(db, numCommands, rng)
+    maxLevel = db.numAccessLevels - 1
+    lowestCommands = [name for name, accessLevel in commands if accessLevel == 0]
+    highestCommands = [name for name, _ in commands]
+    print(f"benchmarking HeirarchicalCommandsDB.call: {numCommands} commands, {repeat} calls per operation")
+
+    printHeader("HeirarchicalCommandsDB")
+    await benchmark("call (hit, lowest access level)",
+                    lambda i: db.call(lowestCommands[i % len(lowestCommands)], None, "", 0), repeat) # type: ignore[reportGeneralTypeIssues]
+    await benchmark("call (hit, highest access level)",
+                    lambda i: db.call(highestCommands[i % len(highestCommands)], None, "", maxLevel), repeat) # type: ignore[reportGeneralTypeIssues]
+    await benchmark("call (hit, upper case)",
+                    lambda i: db.call(lowestCommands[i % len(lowestCommands)].upper(), None, "", maxLevel), repeat) # type: ignore[reportGeneralTypeIssues]
+    await benchmark("call (miss, lowest access level)", lambda i: db.call(f"unknown{i}", None, "", 0), repeat) # type: ignore[reportGeneralTypeIssues]
+    await benchmark("call (miss, highest access level)", lambda i: db.call(f"unknown{i}", None, "", maxLevel), repeat) # type: ignore[reportGeneralTypeIssues]
+
+    helpDBs: List[HeirarchicalCommandsDB] = []
+    async def registerWithHelp(_: int):
+        helpDBs.append(HeirarchicalCommandsDB(len(cfg.userAccessLevels)))
+        fillCommandsDB(helpDBs[-1], numCommands, random.Random(0), withHelp=True)
+
+    async def buildHelpPages(i: int):
+        helpDBs[i].helpSectionEmbeds
+
+    await benchmark(f"register ({numCommands} commands with help)", registerWithHelp, bulkRepeat)
+    await benchmark(f"build all help pages ({numCommands} commands)", buildHelpPages, bulkRepeat)
+
+    helpDB = helpDBs[0]
+    typos = [name[:2] + name[3:] for name, _ in commands]
+    await benchmark("suggest (typo)", lambda i: asyncio.sleep(0, helpDB.suggest(typos[i % len(typos)], maxLevel)), repeat // 10)
+    await benchmark("suggest (no match)", lambda i: asyncio.sleep(0, helpDB.suggest(f"xyzzy{i}", maxLevel)), repeat // 10)
+
+    printHeader("CommandParser")
+    parser = CommandParser(mentionUserId=1234567890123456789)
+    prefixes = (cfg.defaultCommandPrefix,)
+    for length in (20, 2000, 4000):
+        words = " ".join(rng.choice(("it’s", "a", "long", "message", "with", "some", "words")) for _ in range(length // 4))[:length]
+        call = f"{cfg.defaultCommandPrefix}command1 {words}"
+        mention = f"<@{parser.mentionUserId}> command1 {words}"
+        notCommand = f"just {words}"
+        for name, content in (("prefix", call), ("mention", mention), ("not a command", notCommand)):
+            async def parse(_: int):
+                parser.parse(content, prefixes)
+            await benchmark(f"parse ({len(content)} chars, {name})", parse, repeat)
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark calling legacy message commands.")
+    parser.add_argument("--commands", type=int, default=300, help="The number of commands to register")
+    parser.add_argument("--repeat", type=int, default=100000, help="The number of timed calls for each call operation")
+    parser.add_argument("--bulk-repeat", type=int, default=20, help="The number of timed calls for each operation on all commands")
+    parsed = parser.parse_args(args)
+
+    asyncio.run(runBenchmarks(parsed.commands, parsed.repeat, parsed.bulk_repeat))
+
+
+if __name__ == "__main__":
+    main()
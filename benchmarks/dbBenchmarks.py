@@ -0,0 +1,175 @@
+"""Micro-benchmarks for the bot's database layer.
+
+Every `SnowflakeDB`, `GuildDB` and `ReactionMenuDB` operation is timed against a database seeded with `--records`
+users, guilds and reaction menus. By default, this is a temporary SQLite database using the `cfg.sqlitePragmas` profile,
+so no outside services are needed. Run from the project root:
+
+> `python -m benchmarks.dbBenchmarks --records 10000 --repeat 500`
+
+Give `--connection-string` to benchmark another database. Its tables are created if they are missing,
+and ALL EXISTING RECORDS ARE DELETED.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+from bot.cfg import cfg
+cfg.validateConfig()
+
+# These must be imported in the same order as bot.bot, to avoid circular imports
+from bot import lib
+from bot.interactions import basedCommand # noqa: F401
+from bot.databases import guildDB, userDB, reactionMenuDB, schema
+from bot.databases.snowflakeDb import SnowflakeDB
+from bot.users.basedGuild import BasedGuild
+from bot.users.basedUser import BasedUser
+from bot.reactionMenus import reactionMenu
+from benchmarks.benchmarkUtil import benchmark, printHeader
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class BenchmarkMenu(reactionMenu.DatabaseReactionMenu):
+    pass
+
+
+async def clearTables(engine: AsyncEngine):
+    async with engine.begin() as connection:
+        for base in reversed(schema.modelBases):
+            for table in reversed(base.metadata.sorted_tables):
+                await connection.execute(delete(table))
+
+
+async def seed(usersDB: userDB.UserDB, guildsDB: guildDB.GuildDB, menusDB: reactionMenuDB.ReactionMenuDB, records: int):
+    await usersDB.createMany(BasedUser(id=i) for i in range(records))
+    await guildsDB.createMany(BasedGuild(id=i, commandPrefix=".") for i in range(records))
+
+    async with menusDB.sessionMaker() as session:
+        for i in range(records):
+            session.add(BenchmarkMenu(id=i, channelId=i, options=[
+                reactionMenu.DatabaseReactionMenuOption(emoji=emoji, name=emoji) for emoji in ("1️⃣", "2️⃣", "3️⃣")
+            ]))
+        await session.commit()
+
+
+async def benchmarkSnowflakeDB(title: str, db: SnowflakeDB, records: int, repeat: int, bulkRepeat: int):
+    """Benchmark the operations that are common to all `SnowflakeDB`s. `db` must be seeded with IDs `0` to `records - 1`.
+    IDs from `records` upwards are used for records created during benchmarking, which are deleted again.
+    """
+    recordType = db._recordType
+    printHeader(title)
+
+    await benchmark("exists (hit)", lambda i: db.exists(i % records), repeat)
+    await benchmark("exists (miss)", lambda i: db.exists(records + i), repeat)
+    await benchmark("get", lambda i: db.get(i % records), repeat)
+    await benchmark("getOrCreate (existing)", lambda i: db.getOrCreate(recordType(id=i % records)), repeat)
+    await benchmark("getOrCreate (new)", lambda i: db.getOrCreate(recordType(id=records + i)), repeat)
+    await benchmark("delete", lambda i: db.delete(records + i), repeat)
+    await benchmark("create", lambda i: db.create(recordType(id=records + i)), repeat)
+    await benchmark("upsert (existing)", lambda i: db.upsert(recordType(id=records + i)), repeat)
+    await benchmark("deleteMany", lambda _: db.deleteMany(range(records, records + repeat)), 1)
+    await benchmark(f"createMany ({records} records)",
+                    lambda i: db.createMany(recordType(id=records * (i + 1) + j) for j in range(records)), bulkRepeat)
+    await benchmark(f"deleteMany ({records} records)",
+                    lambda i: db.deleteMany(range(records * (i + 1), records * (i + 2))), bulkRepeat)
+    await benchmark("countAllDocuments", lambda _: db.countAllDocuments(), bulkRepeat)
+    await benchmark("countAllDocuments (approximate)", lambda _: db.countAllDocuments(approximate=True), bulkRepeat)
+
+    async def iterate(_: int):
+        async for _ in db.iterate():
+            pass
+
+    async def iterateIds(_: int):
+        async for _ in db.iterateIds():
+            pass
+
+    await benchmark(f"iterate ({records} records)", iterate, bulkRepeat)
+    await benchmark(f"iterateIds ({records} records)", iterateIds, bulkRepeat)
+
+
+async def benchmarkGuildDB(db: guildDB.GuildDB, records: int, repeat: int, bulkRepeat: int):
+    printHeader("GuildDB")
+
+    await benchmark("update", lambda i: db.update(i % records, commandPrefix=str(i % 10)), repeat)
+    await benchmark("getCommandPrefix", lambda i: db.getCommandPrefix(i % records), repeat)
+    await benchmark(f"reconcile ({records} guilds, no changes)", lambda _: db.reconcile(set(range(records))), bulkRepeat)
+    # Alternates between joining and leaving an extra 1% of guilds
+    extraGuilds = set(range(records, records + max(1, records // 100)))
+    await benchmark(f"reconcile ({records} guilds, 1% changes)",
+                    lambda i: db.reconcile(set(range(records)) | (extraGuilds if i % 2 == 0 else set())), bulkRepeat)
+
+
+async def benchmarkReactionMenuDB(db: reactionMenuDB.ReactionMenuDB, records: int, repeat: int, bulkRepeat: int):
+    """`db` must be seeded with `BenchmarkMenu`s with IDs `0` to `records - 1`.
+    """
+    printHeader("ReactionMenuDB")
+
+    def newMenu(menuId: int):
+        return BenchmarkMenu(id=menuId, channelId=menuId,
+                                options=[reactionMenu.DatabaseReactionMenuOption(emoji="1️⃣", name="1️⃣")])
+
+    await benchmark("exists", lambda i: db.exists(i % records), repeat)
+    await benchmark("getMenuClassForRecord", lambda i: db.getMenuClassForRecord(i % records), repeat)
+    await benchmark("get", lambda i: db.get(i % records), repeat)
+    await benchmark("getOrCreate (existing)", lambda i: db.getOrCreate(BenchmarkMenu(id=i % records, channelId=0)), repeat)
+    await benchmark("create", lambda i: db.create(newMenu(records + i)), repeat)
+    await benchmark("upsert (existing)", lambda i: db.upsert(BenchmarkMenu(id=records + i, channelId=0)), repeat)
+    await benchmark("update", lambda i: db.update(records + i, ownerId=i), repeat)
+    await benchmark("delete", lambda i: db.delete(records + i), repeat)
+    await benchmark("countAllDocuments", lambda _: db.countAllDocuments(), bulkRepeat)
+
+    async def iterate(_: int):
+        async for _ in db.iterate():
+            pass
+
+    await benchmark(f"iterate ({records} menus)", iterate, bulkRepeat)
+
+
+async def runBenchmarks(connectionString: str, records: int, repeat: int, bulkRepeat: int):
+    engine = lib.sql.createEngine(connectionString, sqlitePragmas=cfg.sqlitePragmas)
+    print(f"benchmarking {engine.dialect.name} ({engine.driver}): {records} records, {repeat} calls per operation")
+
+    try:
+        await schema.createTables(engine)
+        await clearTables(engine)
+
+        usersDB = userDB.UserDB(engine)
+        guildsDB = guildDB.GuildDB(engine)
+        menusDB = reactionMenuDB.ReactionMenuDB(engine)
+
+        started = time.perf_counter()
+        await seed(usersDB, guildsDB, menusDB, records)
+        print(f"seeded in {time.perf_counter() - started:.2f}s")
+
+        await benchmarkSnowflakeDB("SnowflakeDB (UserDB)", usersDB, records, repeat, bulkRepeat)
+        await benchmarkSnowflakeDB("SnowflakeDB (GuildDB)", guildsDB, records, repeat, bulkRepeat)
+        await benchmarkGuildDB(guildsDB, records, repeat, bulkRepeat)
+        await benchmarkReactionMenuDB(menusDB, records, repeat, bulkRepeat)
+    finally:
+        await engine.dispose()
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the bot's database operations.")
+    parser.add_argument("--connection-string", default=None,
+                        help="The database to benchmark. ALL RECORDS WILL BE DELETED. Defaults to a temporary SQLite database")
+    parser.add_argument("--records", type=int, default=1000, help="The number of each record type to seed the database with")
+    parser.add_argument("--repeat", type=int, default=200, help="The number of timed calls for each single-record operation")
+    parser.add_argument("--bulk-repeat", type=int, default=5, help="The number of timed calls for each whole-table operation")
+    parsed = parser.parse_args(args)
+
+    if parsed.connection_string is not None:
+        asyncio.run(runBenchmarks(parsed.connection_string, parsed.records, parsed.repeat, parsed.bulk_repeat))
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            connectionString = f"sqlite+aiosqlite:///{os.path.join(directory, 'benchmark.db')}"
+            asyncio.run(runBenchmarks(connectionString, parsed.records, parsed.repeat, parsed.bulk_repeat))
+
+
+if __name__ == "__main__":
+    main()
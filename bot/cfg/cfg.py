@@ -33,12 +33,32 @@ defaultEmojis = EmojisConfig(
 timeouts = TimeoutsConfig(
     BASED_updateCheckFrequency = SerializableTimedelta(days=1),
     # The time to wait inbetween database autosaves.
-    dataSaveFrequency = SerializableTimedelta(hours=1)
+    dataSaveFrequency = SerializableTimedelta(hours=1),
+    # The time to wait inbetween sweeps for expired database reaction menus that were missed by the task scheduler,
+    # e.g because the bot was offline when they expired.
+    expiredMenusSweepFrequency = SerializableTimedelta(minutes=10),
+    # How long after a menu's expiry time to wait before the sweeper may end it, giving the task scheduler the first chance.
+    expiredMenusSweepGrace = SerializableTimedelta(minutes=1),
+    # How long after a record is written to keep reading it from the primary database rather than the read replica.
+    # This should be at least the replica's worst replication lag.
+    readReplicaMaxLag = SerializableTimedelta(seconds=5),
+    # How often to check for cache invalidations from other bot processes, when invalidationBus is "sqlite"
+    invalidationBusPollFrequency = SerializableTimedelta(milliseconds=250),
+    # How long to remember a user's access level in a guild for. Cached access levels are also forgotten when the user's
+    # roles, the guild's roles, the guild's owner, or the guild's channel permission overwrites change.
+    accessLevelCacheTTL = SerializableTimedelta(minutes=5),
+    # How long to wait for each async access level check. Checks that take longer are logged and treated as failed,
+    # and the resulting access level is not cached. Give 0 for no timeout.
+    accessLevelCheckTimeout = SerializableTimedelta(seconds=0),
+    # How long to remember /help autocomplete results for each user, so that repeated keystrokes skip the lookup
+    autocompleteCacheTTL = SerializableTimedelta(seconds=30)
 )
 
 paths = PathsConfig(
     # path to folder to save log txts to
-    logsFolder = SerializablePath("saveData", "logs")
+    logsFolder = SerializablePath("saveData", "logs"),
+    # path to the SQLite database used to share cache invalidations between bot processes, when invalidationBus is "sqlite"
+    invalidationBusDatabase = SerializablePath("saveData", "invalidations.db")
 )
 
 basicAccessLevels = BasicAccessLevelNames(
@@ -51,6 +71,11 @@ basicAccessLevels = BasicAccessLevelNames(
 # Also determines the number of access levels available, e.g when registering commands
 userAccessLevels = [basicAccessLevels.user, "mod", basicAccessLevels.serverAdmin, basicAccessLevels.developer]
 
+# How to evaluate async access level checks when inferring a user's access level. One of:
+# "sequential": Await each check in turn, from the highest access level down
+# "concurrent": Start all checks at once, and take the highest passing level. Lower checks are cancelled once a higher one passes
+accessLevelCheckStrategy = "sequential"
+
 # Message to print alongside cmd_help menus
 helpIntro = "Give a command name in `/help` for more detail."
 
@@ -60,6 +85,9 @@ defaultHelpSection = "Miscellaneous"
 # Maximum number of commands each cmd_help menu may contain
 maxCommandsPerHelpPage = 5
 
+# The maximum number of rendered help pages to keep in memory for each guild's commands
+helpPageCacheSize = 256
+
 # List of module names from the commands package to import
 includedCommandModules = ()
 
@@ -87,6 +115,12 @@ BASED_checkForUpdates = True
 # Default prefix for commands
 defaultCommandPrefix = "."
 
+# Whether or not message commands can also be called by mentioning the bot instead of giving a command prefix
+mentionAsCommandPrefix = False
+
+# The greatest number of typos to correct when suggesting a command in place of an unknown message command. Give 0 to disable suggestions.
+maxCommandSuggestionDistance = 2
+
 # discord user IDs of developers - will be granted developer command permissions
 developers = [188618589102669826]
 
@@ -105,17 +139,77 @@ httpErrRetries = 3
 # The number of seconds to wait between API call retries upon HTTP exception catching
 httpErrRetryDelaySeconds = 1
 
+# The maximum number of guilds to sync app commands to at once. Guilds whose commands have not changed since they were last synced are skipped
+appCommandSyncConcurrency = 4
+
 # Exactly one of databaseConnectionString or databaseConnectionString_envVarName must be given.
 # databaseConnectionString directly contains the connection string for your database
 # databaseConnectionString_envVarName contains the name of an environment variable to get your connection string from
 databaseConnectionString = ""
 databaseConnectionString_envVarName = ""
 
+# Optionally, at most one of readReplicaConnectionString or readReplicaConnectionString_envVarName may be given,
+# to serve database reads from a read replica of the database. Reads of recently written records are still served
+# by the primary database, see timeouts.readReplicaMaxLag.
+readReplicaConnectionString = ""
+readReplicaConnectionString_envVarName = ""
+
+# How to share cache invalidations with other bot processes, when records are written. One of:
+# "memory": Don't share invalidations. Use this when running a single bot process
+# "sqlite": Share invalidations through a SQLite database at paths.invalidationBusDatabase,
+#           for multiple bot processes (e.g shards) on the same machine
+invalidationBus = "memory"
+
+# Pragmas to set on every connection, when the database is SQLite (e.g databaseConnectionString = "sqlite+aiosqlite:///based.db")
+sqlitePragmas = {
+    # Write-ahead logging, so that reads are not blocked by writes
+    "journal_mode": "WAL",
+    # Safe from corruption in WAL mode. On power loss, only the most recent transactions may be lost
+    "synchronous": "NORMAL",
+    # Required for reaction menu options to be deleted along with their menus
+    "foreign_keys": "ON",
+    # Milliseconds to wait for a lock before giving up with "database is locked"
+    "busy_timeout": 5000,
+    # Negative values are in KiB, so this is 64MiB of page cache per connection
+    "cache_size": -64000,
+    "temp_store": "MEMORY",
+    # 256MiB of memory-mapped I/O
+    "mmap_size": 268435456
+}
+
+# Whether or not to create any missing tables from the bot's models on startup. This is intended for SQLite databases,
+# other databases should be managed with the liquibase changelogs in db/changelogs
+databaseCreateTables = False
+
+# How to count the records in each database when printing startup stats. One of:
+# "exact": COUNT(*) each table. On large MySQL InnoDB tables, this is a full table scan
+# "approximate": Estimate from table statistics where supported (MySQL, PostgreSQL), otherwise count exactly
+# "none": Skip counting
+startupRecordCounts = "exact"
+
+# Whether or not to add and remove guild records on startup, for guilds joined or left while the bot was offline
+reconcileGuildsOnStartup = True
+
 
 def validateConfig():
     global developmentGuilds
     if len(developmentGuilds) > 0 and isinstance(developmentGuilds[0], Item):
         developmentGuilds = [SerializableDiscordObject(int(i)) for i in developmentGuilds] # type: ignore[reportGeneralTypeIssues]
+    for pragma, value in sqlitePragmas.items():
+        if not pragma.isidentifier() or not (isinstance(value, int) or str(value).isidentifier()):
+            raise ValueError(f"Invalid sqlitePragmas entry '{pragma}': {value}")
+    if invalidationBus not in ("memory", "sqlite"):
+        raise ValueError(f"Unknown invalidationBus '{invalidationBus}'. Must be one of 'memory' or 'sqlite'")
+    if startupRecordCounts not in ("exact", "approximate", "none"):
+        raise ValueError(f"Unknown startupRecordCounts '{startupRecordCounts}'. Must be one of 'exact', 'approximate' or 'none'")
+    if accessLevelCheckStrategy not in ("sequential", "concurrent"):
+        raise ValueError(f"Unknown accessLevelCheckStrategy '{accessLevelCheckStrategy}'. Must be one of 'sequential' or 'concurrent'")
+    if maxCommandSuggestionDistance < 0:
+        raise ValueError(f"maxCommandSuggestionDistance cannot be negative, but {maxCommandSuggestionDistance} was given")
+    if appCommandSyncConcurrency < 1:
+        raise ValueError(f"appCommandSyncConcurrency must be at least 1, but {appCommandSyncConcurrency} was given")
+    if helpPageCacheSize < 1:
+        raise ValueError(f"helpPageCacheSize must be at least 1, but {helpPageCacheSize} was given")
     for _, basicAccessLevel in basicAccessLevels._fieldItems():
         if basicAccessLevel not in userAccessLevels:
             raise ValueError(f"basic access level '{basicAccessLevel}' is missing from userAccessLevels")
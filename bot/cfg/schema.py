@@ -49,12 +49,20 @@ class EmojisConfig(SerializableDataClass):
 class TimeoutsConfig(SerializableDataClass):
     BASED_updateCheckFrequency: SerializableTimedelta
     dataSaveFrequency: SerializableTimedelta
+    expiredMenusSweepFrequency: SerializableTimedelta
+    expiredMenusSweepGrace: SerializableTimedelta
+    readReplicaMaxLag: SerializableTimedelta
+    invalidationBusPollFrequency: SerializableTimedelta
+    accessLevelCacheTTL: SerializableTimedelta
+    accessLevelCheckTimeout: SerializableTimedelta
+    autocompleteCacheTTL: SerializableTimedelta
 
 
 @dataclass
 class PathsConfig(SerializableDataClass):
     # path to folder to save log txts to
     logsFolder: SerializablePath
+    invalidationBusDatabase: SerializablePath
 
     def createMissingDirectories(self):
         # Normalize all paths and create missing directories
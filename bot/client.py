@@ -1,7 +1,9 @@
 import asyncio
+from functools import partial
 from inspect import iscoroutinefunction
 import signal
-from typing import List, Optional, Dict, Type, Union, cast, overload
+import time
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Dict, Tuple, Type, Union, cast, overload
 import aiohttp
 import discord
 from discord import app_commands
@@ -10,11 +12,14 @@ from discord.ext import tasks
 from discord.utils import MISSING
 from datetime import datetime, timedelta
 
-from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 
-from .interactions import accessLevels, commandChecks
-from .databases import userDB, guildDB, reactionMenuDB
+from .interactions import accessLevels, commandChecks, commandIndex, commandSync
+from .databases import userDB, guildDB, reactionMenuDB, schema
+from .commandsManager import commandParser
+from .databases.invalidation import InvalidationBus, InMemoryInvalidationBus
 from . import lib
+from .lib.sql import SessionSharer
 from .cfg import cfg
 from . import logging
 from .scheduling import timedTaskHeap
@@ -67,6 +72,14 @@ class BasedClient(ClientBaseClass):
     :vartype launchTime: datetime
     :var killer: Indicator of when OS termination signals are received
     :vartype killer: GracefulKiller
+    :var interactionAccessLevels: Cached access levels of users who trigger interactions
+    :vartype interactionAccessLevels: commandChecks.AccessLevelCache[AccessLevelType]
+    :var messageAccessLevels: Cached access levels of users who call message commands, as indices of `cfg.userAccessLevels`
+    :vartype messageAccessLevels: commandChecks.AccessLevelCache[int]
+    :var commandParser: Splits messages into message command calls
+    :vartype commandParser: commandParser.CommandParser
+    :var commandIndex: The app commands in the tree, by guild scope and access level
+    :vartype commandIndex: commandIndex.CommandIndex
     """
 
     def __init__(self, databaseEngine: AsyncEngine,
@@ -75,15 +88,24 @@ class BasedClient(ClientBaseClass):
                         inMemoryReactionMenusDB: Optional[Dict[int, "reactionMenu.InMemoryReactionMenu"]] = None,
                         databaseReactionMenusDB: Optional[reactionMenuDB.ReactionMenuDB] = None,
                         logger: Optional[logging.Logger] = None,
-                        httpClient: Optional[aiohttp.ClientSession] = None):
+                        httpClient: Optional[aiohttp.ClientSession] = None,
+                        readReplicaEngine: Optional[AsyncEngine] = None,
+                        invalidationBus: Optional[InvalidationBus] = None):
         
         self.databaseEngine = databaseEngine
+        self.readReplicaEngine = readReplicaEngine
+        self.invalidationBus = invalidationBus if invalidationBus is not None else InMemoryInvalidationBus()
         self.sessionMaker = async_sessionmaker(self.databaseEngine, expire_on_commit=False)
+        self.interactionAccessLevels: commandChecks.AccessLevelCache[accessLevels.AccessLevelType] = \
+            commandChecks.AccessLevelCache(cfg.timeouts.accessLevelCacheTTL)
+        self.messageAccessLevels: commandChecks.AccessLevelCache[int] = commandChecks.AccessLevelCache(cfg.timeouts.accessLevelCacheTTL)
+        self.commandParser = commandParser.CommandParser()
+        self.commandIndex = commandIndex.CommandIndex(self)
 
         intents = discord.Intents.default()
         intents.message_content = True
         intents.members = True
-        super().__init__(command_prefix="‎", intents=intents)
+        super().__init__(command_prefix="‎", intents=intents, tree_cls=commandIndex.BasedCommandTree)
 
         self._usersDB = usersDB
         self._guildsDB = guildsDB
@@ -104,39 +126,84 @@ class BasedClient(ClientBaseClass):
 
         self.basedCommands: Dict[discord.app_commands.Command, "basedCommand.BasedCommandMeta"] = {}
         self.staticComponentCallbacks: Dict["basedComponent.StaticComponents", "basedComponent.StaticComponentCallbackMeta"] = {}
+        # Static component ID value -> (callback with its owning object bound, whether it takes args).
+        # Built on first use, and rebuilt after static components or cogs are added or removed
+        self._staticComponentDispatch: Optional[Dict[str, Tuple[Callable[..., Awaitable[Any]], bool]]] = None
 
         self.helpSections: Dict[str, List[discord.app_commands.Command]] = {}
+        # Guild ID (None for global) -> hash of the app commands last synced to the scope by this process
+        self._appCommandsHashes: Dict[Optional[int], str] = {}
 
         self.add_listener(self.on_interaction)
 
 
     async def on_interaction(self, interaction: discord.Interaction):
-        customId = None if interaction.data is None else interaction.data.get("custom_id", None)
-        if interaction.type != discord.InteractionType.component \
-                or customId is None \
-                or not basedComponent.customIdIsStaticComponent(customId):
+        if interaction.type != discord.InteractionType.component or interaction.data is None:
             return
-        componentMeta = basedComponent.staticComponentMeta(customId)
-        if not self.hasStaticComponent(componentMeta.ID):
+        customId = interaction.data.get("custom_id", None)
+        if customId is None or (split := basedComponent.splitStaticComponentCustomId(customId)) is None:
             return
-        
-        callbackMeta = self.getStaticComponentCallbackMeta(componentMeta.ID)
-        cbArgs = (interaction, componentMeta.args) if callbackMeta.takesArgs else (interaction,)
-
-        # Pass the owning object (e.g self/cls) to the callback if it needs one
-        if basedApp.isCogApp(callbackMeta.callback):
-            cogName = basedApp.getCogAppCogName(callbackMeta.callback)
-            cog = self.get_cog(cogName)
-            if cog is None:
-                raise ValueError(f"unable to find cog '{cogName}' for static component: {callbackMeta.callback.__qualname__}")
-
-        # Ignoring some warnings here for incorrect call syntax - pyright can't see that the tuple will always contain
-        # the correct arguments, because we can't unpack a tuple until runtime
-            await callbackMeta.callback(cog, *cbArgs) # type: ignore[reportGeneralTypeIssues]
-        elif callbackMeta.hasSelf():
-            await callbackMeta.callback(callbackMeta.cbSelf, *cbArgs) # type: ignore[reportGeneralTypeIssues]
+        ID, args = split
+
+        dispatch = self._staticComponentDispatch
+        if dispatch is None:
+            dispatch = self._staticComponentDispatch = self._buildStaticComponentDispatch()
+        if (entry := dispatch.get(ID)) is None:
+            self._logUnresolvedStaticComponent(ID)
+            return
+
+        callback, takesArgs = entry
+        if takesArgs:
+            await callback(interaction, args or None)
         else:
-            await callbackMeta.callback(*cbArgs) # type: ignore[reportGeneralTypeIssues]
+            await callback(interaction)
+
+
+    def _buildStaticComponentDispatch(self) -> Dict[str, Tuple[Callable[..., Awaitable[Any]], bool]]:
+        """Resolve every registered static component callback into a callable with its owning cog or object already bound,
+        keyed by the value of its ID in the `StaticComponents` enum.
+        """
+        dispatch: Dict[str, Tuple[Callable[..., Awaitable[Any]], bool]] = {}
+        for ID, callbackMeta in self.staticComponentCallbacks.items():
+            # Pass the owning object (e.g self/cls) to the callback if it needs one
+            if basedApp.isCogApp(callbackMeta.callback):
+                cog = self.get_cog(basedApp.getCogAppCogName(callbackMeta.callback))
+                # The cog's callbacks are registered before the cog itself. The table is rebuilt once the cog has been added
+                if cog is None:
+                    continue
+                callback = partial(callbackMeta.callback, cog)
+            elif callbackMeta.hasSelf():
+                callback = partial(callbackMeta.callback, callbackMeta.cbSelf)
+            else:
+                callback = callbackMeta.callback
+            dispatch[ID.value] = (callback, callbackMeta.takesArgs) # type: ignore[reportGeneralTypeIssues]
+        return dispatch
+
+
+    def _logUnresolvedStaticComponent(self, ID: str):
+        """Log a static component interaction that was dropped because its callback is registered, but belongs to a cog
+        that is not loaded. Interactions for unregistered IDs are ignored silently.
+
+        :param str ID: The value of the component's ID in the `StaticComponents` enum
+        """
+        for componentId, callbackMeta in self.staticComponentCallbacks.items():
+            if componentId.value == ID and basedApp.isCogApp(callbackMeta.callback):
+                cogName = basedApp.getCogAppCogName(callbackMeta.callback)
+                self.logger.log(type(self).__name__, "on_interaction",
+                                f"unable to find cog '{cogName}' for static component: {callbackMeta.callback.__qualname__}",
+                                category=logging.LogCategory.staticComponents, eventType="NO_COG")
+                return
+
+
+    async def add_cog(self, *args, **kwargs):
+        await super().add_cog(*args, **kwargs)
+        self._staticComponentDispatch = None
+
+
+    async def remove_cog(self, *args, **kwargs):
+        cog = await super().remove_cog(*args, **kwargs)
+        self._staticComponentDispatch = None
+        return cog
 
 
     def addBasedCommand(self, command: discord.app_commands.Command):
@@ -160,6 +227,7 @@ class BasedClient(ClientBaseClass):
         else:
             self.helpSections[meta.helpSection].append(command)
         self.basedCommands[command] = meta
+        self.commandIndex.invalidate()
 
 
     def addStaticComponent(self, callback: "basedComponent.StaticComponentCallbackType"):
@@ -179,6 +247,7 @@ class BasedClient(ClientBaseClass):
             raise KeyError(f"Static component callback {callback.__qualname__} is already registered")
 
         self.staticComponentCallbacks[meta.ID] = meta
+        self._staticComponentDispatch = None
 
 
     def basedCommand(self,
@@ -282,6 +351,7 @@ class BasedClient(ClientBaseClass):
             self.helpSections[meta.helpSection].remove(command)
             if len(self.helpSections[meta.helpSection]) == 0:
                 del self.helpSections[meta.helpSection]
+        self.commandIndex.invalidate()
 
 
     @overload
@@ -321,6 +391,7 @@ class BasedClient(ClientBaseClass):
             raise KeyError(f"Static component callback {ID.name} is not registered")
         
         del self.staticComponentCallbacks[ID]
+        self._staticComponentDispatch = None
 
 
     def commandsInSectionForAccessLevel(self, section: str, level: "accessLevels.AccessLevelType") -> List[discord.app_commands.Command]:
@@ -434,16 +505,30 @@ class BasedClient(ClientBaseClass):
         """Save all savedata to file, and start the db saving task if it is not running.
         inMemoryReactionMenusDB is not affected.
         """
-        self._usersDB = userDB.UserDB(self.databaseEngine)
-        self._guildsDB = guildDB.GuildDB(self.databaseEngine)
-        self._databaseReactionMenusDB = reactionMenuDB.ReactionMenuDB(self.databaseEngine)
+        replicaMaxLag = cfg.timeouts.readReplicaMaxLag
+        if self._databaseReactionMenusDB is not None:
+            self._databaseReactionMenusDB.close()
+        self._usersDB = userDB.UserDB(self.databaseEngine, self.readReplicaEngine, replicaMaxLag, self.invalidationBus)
+        self._guildsDB = guildDB.GuildDB(self.databaseEngine, self.readReplicaEngine, replicaMaxLag, self.invalidationBus)
+        self._databaseReactionMenusDB = reactionMenuDB.ReactionMenuDB(self.databaseEngine, self.readReplicaEngine, replicaMaxLag,
+                                                                        self.invalidationBus)
         if self._inMemoryReactionMenusDB is None:
             self._inMemoryReactionMenusDB = {}
         
-        async with self.sessionMaker() as session:
-            print(f"{await self._usersDB.countAllDocuments(session=session)} users loaded")                    
-            print(f"{await self._guildsDB.countAllDocuments(session=session)} guilds loaded")                  
-            print(f"{await self._databaseReactionMenusDB.countAllDocuments(session=session)} database reaction menus loaded")
+        await self._databaseReactionMenusDB.loadActiveIds()
+
+        if cfg.startupRecordCounts != "none":
+            # Each count opens its own session, so that the counts run concurrently on separate pooled connections
+            approximate = cfg.startupRecordCounts == "approximate"
+            usersCount, guildsCount, menusCount = await asyncio.gather(
+                self._usersDB.countAllDocuments(approximate=approximate),
+                self._guildsDB.countAllDocuments(approximate=approximate),
+                self._databaseReactionMenusDB.countAllDocuments(approximate=approximate)
+            )
+            qualifier = "~" if approximate else ""
+            print(f"{qualifier}{usersCount} users loaded")
+            print(f"{qualifier}{guildsCount} guilds loaded")
+            print(f"{qualifier}{menusCount} database reaction menus loaded")
 
         print(f"{len(self._inMemoryReactionMenusDB)} in memory reaction menus loaded")
         
@@ -452,6 +537,161 @@ class BasedClient(ClientBaseClass):
         if not self.dbSaveTask.is_running():
             self.dbSaveTask.start()
 
+        if not self.expiredMenusSweepTask.is_running():
+            self.expiredMenusSweepTask.start()
+
+
+    def isMenu(self, messageId: int) -> bool:
+        """Decide whether the message with the given ID may be a reaction menu, without any I/O.
+        If this returns `False`, the message is definitely not a menu. In-memory menus are always detected exactly,
+        database menus may give false positives.
+
+        :param int messageId: The ID of the message
+        :return: `False` if the message is not a reaction menu, `True` if it may be one
+        :rtype: bool
+        """
+        return messageId in self.inMemoryReactionMenusDB or self.databaseReactionMenusDB.isActive(messageId)
+
+
+    async def reconcileGuilds(self):
+        """Add records for guilds that were joined while the bot was offline, and remove records for guilds
+        that were left while the bot was offline.
+        This is performed in one streamed pass over the stored guild IDs, with bulk inserts and deletes.
+        Records are not removed while any guild is unavailable, or if the bot is not in any guilds,
+        since the guild list may be incomplete during an outage.
+        """
+        started = time.perf_counter()
+        guilds = self.guilds
+        deleteDeparted = bool(guilds) and not any(g.unavailable for g in guilds)
+        created, deleted = await self.guildsDB.reconcile({g.id for g in guilds}, deleteDeparted=deleteDeparted)
+        self.logger.log(type(self).__name__, "reconcileGuilds",
+                        f"guilds reconciled in {time.perf_counter() - started:.2f}s: {created} added, " \
+                            + (f"{deleted} removed" if deleteDeparted else "removals skipped, as the guild list may be incomplete"),
+                        category=logging.LogCategory.guildsDB, eventType="RECONCILE")
+
+
+    async def syncAppCommands(self, guilds: Iterable[Optional[discord.abc.Snowflake]] = (None,), force: bool = False) -> List[commandSync.ScopeSyncResult]:
+        """Sync the app command tree to many scopes, skipping scopes whose commands have not changed since they were last synced.
+        Each scope's serialized commands are hashed and compared with the hash from its last sync. Guild hashes are stored
+        in the guilds database, so survive restarts. The global hash is only remembered by this process.
+        Up to `cfg.appCommandSyncConcurrency` scopes are synced at once. A rate limit response pauses all syncs,
+        and each scope is retried up to `cfg.httpErrRetries` times.
+
+        :param guilds: The guilds to sync, with `None` for global commands (Default (None,))
+        :type guilds: Iterable[Optional[discord.abc.Snowflake]]
+        :param bool force: Sync every scope, even if its commands have not changed (Default False)
+        :return: The outcome of syncing each scope, in the order given
+        :rtype: List[commandSync.ScopeSyncResult]
+        """
+        scopes = list({None if guild is None else guild.id: guild for guild in guilds}.values())
+        unknownGuildIds = [guild.id for guild in scopes if guild is not None and guild.id not in self._appCommandsHashes]
+        if unknownGuildIds and not force:
+            for guildId, storedHash in (await self.guildsDB.getAppCommandsHashes(unknownGuildIds)).items():
+                if storedHash is not None:
+                    self._appCommandsHashes[guildId] = storedHash
+
+        backoff = commandSync.SyncBackoff()
+        semaphore = asyncio.Semaphore(cfg.appCommandSyncConcurrency)
+        syncedGuildHashes: Dict[int, str] = {}
+
+        async def syncScope(guild: Optional[discord.abc.Snowflake]) -> commandSync.ScopeSyncResult:
+            guildId = None if guild is None else guild.id
+            # A failure in any one scope, including while serializing its commands, must not stop the other scopes
+            try:
+                scopeHash = commandSync.payloadHash(await commandSync.scopePayload(self.tree, guild))
+                if not force and self._appCommandsHashes.get(guildId) == scopeHash:
+                    return commandSync.ScopeSyncResult(guildId)
+
+                async with semaphore:
+                    synced = await commandSync.syncScope(self.tree, guild, backoff, cfg.httpErrRetries, cfg.httpErrRetryDelaySeconds)
+            except Exception as e:
+                return commandSync.ScopeSyncResult(guildId, exception=e)
+
+            self._appCommandsHashes[guildId] = scopeHash
+            if guildId is not None:
+                syncedGuildHashes[guildId] = scopeHash
+            return commandSync.ScopeSyncResult(guildId, synced=synced)
+
+        try:
+            results = await asyncio.gather(*(syncScope(guild) for guild in scopes))
+        finally:
+            # Persist the hashes of the scopes that did sync, even if syncing was cancelled
+            if syncedGuildHashes:
+                await self.guildsDB.setAppCommandsHashes(syncedGuildHashes)
+        return list(results)
+
+
+    def invalidateAccessLevels(self, guildId: int, userId: Optional[int] = None):
+        """Forget the cached access levels of a user in a guild, or of all users in the guild if no user is given.
+
+        :param int guildId: The ID of the guild
+        :param Optional[int] userId: The ID of the user, or `None` for all users in the guild (Default None)
+        """
+        for cache in (self.interactionAccessLevels, self.messageAccessLevels):
+            if userId is None:
+                cache.invalidateGuild(guildId)
+            else:
+                cache.invalidate(guildId, userId)
+
+
+    async def endMenus(self, menuIds: Iterable[int], session: Optional[AsyncSession] = None) -> int:
+        """End all reaction menus with the given IDs, e.g when their messages are deleted. IDs that are not menus are ignored.
+        Database menus are loaded with one `IN` query, their `onEnd` callbacks are run with bounded concurrency,
+        and their records are deleted in one statement, so the number of queries does not depend on the number of menus.
+
+        :param Iterable[int] menuIds: The IDs of the menus to end
+        :return: The number of menus that were ended
+        :rtype: int
+        """
+        menuIds = [menuId for menuId in menuIds if self.isMenu(menuId)]
+        if not menuIds: return 0
+
+        inMemoryMenus = [menu for menuId in menuIds if (menu := self.inMemoryReactionMenusDB.get(menuId)) is not None]
+        tasks = lib.discordUtil.BasicScheduler()
+        for menu in inMemoryMenus:
+            tasks.add(menu.end(self))
+
+        async with SessionSharer(session, self.sessionMaker) as s:
+            databaseMenus = await self.databaseReactionMenusDB.getMany(
+                (menuId for menuId in menuIds if menuId not in self.inMemoryReactionMenusDB), session=s.session
+            )
+            await reactionMenu.endDatabaseMenus(self, databaseMenus, session=s.session)
+
+        await tasks.wait()
+        tasks.logExceptions()
+
+        return len(inMemoryMenus) + len(databaseMenus)
+
+
+    async def sweepExpiredMenus(self, batchSize: int = 100) -> int:
+        """End all database reaction menus whose expiry time has passed by more than `cfg.timeouts.expiredMenusSweepGrace`.
+        This is a safety net for the task scheduler, which does not persist between restarts.
+        Due menus are selected through the index on `expiryTime`, and ended in batches of size :param:`batchSize`.
+
+        :param int batchSize: The number of menus to end at once (Default 100)
+        :return: The number of menus that were ended
+        :rtype: int
+        """
+        cutoff = discord.utils.utcnow() - cfg.timeouts.expiredMenusSweepGrace
+        due = reactionMenu.DatabaseReactionMenu.expiryTime <= cutoff
+        ended = 0
+
+        async with self.sessionMaker() as session:
+            menus: List[reactionMenu.DatabaseReactionMenu] = []
+            # Keyset iteration is unaffected by the deletion of already-read menus
+            async for menu in self.databaseReactionMenusDB.iterate(batchSize, where=due, session=session):
+                menus.append(menu)
+                if len(menus) == batchSize:
+                    await reactionMenu.endDatabaseMenus(self, menus, timedOut=True, session=session)
+                    ended += len(menus)
+                    menus = []
+
+            await reactionMenu.endDatabaseMenus(self, menus, timedOut=True, session=session)
+            ended += len(menus)
+            await session.commit()
+
+        return ended
+
 
     def saveAllDBs(self):
         """Save all of the bot's savedata to file.
@@ -484,9 +724,12 @@ class BasedClient(ClientBaseClass):
         await self.close()
         # save bot save data
         self.saveAllDBs()
+        await self.invalidationBus.stop()
         # close the bot's aiohttp session
         await self.httpClient.close()
         await self.databaseEngine.dispose()
+        if self.readReplicaEngine is not None:
+            await self.readReplicaEngine.dispose()
 
         print(datetime.now().strftime("%H:%M:%S: Shutdown complete."))
 
@@ -506,6 +749,13 @@ class BasedClient(ClientBaseClass):
         print(datetime.now().strftime("%H:%M:%S: Data saved!"))
 
 
+    @waitBeforeStartingTask
+    @tasks.loop(**lib.timeUtil.td_secondsMinutesHours(cfg.timeouts.expiredMenusSweepFrequency))
+    async def expiredMenusSweepTask(self):
+        if ended := await self.sweepExpiredMenus():
+            print(discord.utils.utcnow().strftime(f"%H:%M:%S: {ended} expired reaction menus swept"))
+
+
     def dispatch(self, event_name, *args, **kwargs):
         if event_name == "ready" and not self.loggedIn:
             asyncio.create_task(self._asyncInit(True, *args, **kwargs))
@@ -521,8 +771,16 @@ class BasedClient(ClientBaseClass):
         if not self.shutdownCheckTask.is_running():
             self.shutdownCheckTask.start()
 
+        if cfg.databaseCreateTables:
+            await schema.createTables(self.databaseEngine)
+
+        await self.invalidationBus.start()
+
         await self.reloadDBs()
 
+        if cfg.reconcileGuildsOnStartup:
+            await self.reconcileGuilds()
+
         self.loggedIn = True
         if dispatchReady:
             self.dispatch("ready", *args, **kwargs)
@@ -1,9 +1,9 @@
 """https://gist.github.com/Rapptz/0ad5914e42aeaa1cecea334f6508b8d5"""
 
 from __future__ import annotations
-from typing import Dict, List, Optional, Tuple, Union
+from typing import List, NamedTuple, Optional, Tuple, Union
 
-from discord import AppCommandType, Colour, Embed, InteractionType, app_commands, Interaction, Object, ChannelType, Guild
+from discord import Colour, Embed, InteractionType, app_commands, Interaction, ChannelType, Guild
 from discord.app_commands.transformers import CommandParameter
 from discord.utils import MISSING
 from discord.ui import View, Button
@@ -12,7 +12,7 @@ from discord import HTTPException
 from .. import client, lib
 from ..cfg import cfg
 from ..cfg.cfg import basicAccessLevels
-from ..interactions import accessLevels, basedCommand, commandChecks, basedApp, basedComponent
+from ..interactions import accessLevels, basedCommand, commandChecks, basedApp, basedComponent, commandIndex
 from .helpUtil import *
 
 
@@ -98,25 +98,56 @@ def unpackHelpPageArgs(args: str) -> Tuple[Optional[str], Optional[int], Optiona
     )
 
 
+class RenderedHelpPage(NamedTuple):
+    """A help page, rendered ready to be sent. Rendered pages are shared between all users viewing the same page, so must not be modified.
+
+    :var embed: The content of the page
+    :vartype embed: Embed
+    :var buttons: The emoji and custom_id of each button under the page, in order. Disabled buttons have no custom_id
+    :vartype buttons: Tuple[Tuple[str, Optional[str]], ...]
+    """
+    embed: Embed
+    buttons: Tuple[Tuple[str, Optional[str]], ...]
+
+    def view(self) -> View:
+        """Build a new view containing the page's buttons.
+        Views hold per-message state, so a new one is built each time that the page is sent.
+
+        :return: A view with the page's buttons, or `MISSING` if the page has no buttons
+        :rtype: View
+        """
+        if not self.buttons:
+            return MISSING
+        view = View()
+        for emoji, customId in self.buttons:
+            view.add_item(Button(emoji=emoji, custom_id=customId, disabled=customId is None))
+        return view
+
+
 class HelpCog(basedApp.BasedCog):
     def __init__(self, bot: client.BasedClient, *args, **kwargs):
         self.bot = bot
+        self.autocompleteCache = commandIndex.AutocompleteCache(cfg.timeouts.autocompleteCacheTTL)
         super().__init__(*args, **kwargs)
 
 
-    def _commandsForAccessLevel(self, level: Optional[basedCommand.AccessLevelType] = None, guild: Optional[Union[Object, Guild]] = None, type=AppCommandType.chat_input, exactLevel=True):
-        return list(c for c in self.bot.tree.walk_commands(guild=guild, type=type) if isinstance(c, app_commands.Command)) if level is None else \
-            [c for c in self.bot.tree.walk_commands(guild=guild, type=type) \
-                if isinstance(c, app_commands.Command) and ((basedCommand.accessLevel(c) is level) \
-                    if exactLevel else \
-                (commandChecks.accessLevelSufficient(level, basedCommand.accessLevel(c))))]
-
-
     def getCommands(self, interaction: Interaction, level: Optional[basedCommand.AccessLevelType] = None, exactLevel=True) -> List[app_commands.Command]:
-        foundCommands = self._commandsForAccessLevel(level, exactLevel=exactLevel)
-        if interaction.guild is not None:
-            foundCommands.extend(self._commandsForAccessLevel(level, guild=interaction.guild, exactLevel=exactLevel))
-        return foundCommands
+        """Look up the chat input commands visible where `interaction` was used, from the client's command index.
+        The returned list is shared with the index, and should not be modified.
+
+        :param interaction: The interaction whose guild to look up commands for
+        :type interaction: Interaction
+        :param level: The access level of commands to look up, or None for commands of all access levels (Default None)
+        :type level: Optional[basedCommand.AccessLevelType]
+        :param exactLevel: Whether to look up only commands requiring exactly `level`, or all commands callable at `level` (Default True)
+        :type exactLevel: bool
+        :return: The matching commands
+        :rtype: List[app_commands.Command]
+        """
+        scope = self.bot.commandIndex.scope(interaction.guild)
+        if level is None:
+            return scope.accessible[accessLevels.maxAccessLevel()]
+        return scope.commands[level] if exactLevel else scope.accessible[level]
 
 
     @basedCommand.basedCommand(accessLevel=basicAccessLevels.user)
@@ -155,24 +186,20 @@ class HelpCog(basedApp.BasedCog):
     async def help_autocomplete(self,
         interaction: Interaction, current: str
     ) -> List[app_commands.Choice[str]]:
-        commandsForScope = self.getCommands(interaction, await commandChecks.inferUserPermissions(interaction), exactLevel=False)
-
-        choices: List[app_commands.Choice[str]] = []
-        for c in commandsForScope:
-            name = c.qualified_name
-            if current in name:
-                choices.append(app_commands.Choice(name=name, value=name))
-
-        # Only show unique commands
-        choices = sorted(set(choices), key=lambda c: c.name)
-        return choices[:25]
+        scope = self.bot.commandIndex.scope(interaction.guild)
+        key = (interaction.guild_id, interaction.user.id, current)
+        if (choices := self.autocompleteCache.get(key, scope)) is None:
+            names = scope.names[await commandChecks.inferUserPermissions(interaction)]
+            choices = [app_commands.Choice(name=name, value=name) for name in commandIndex.completeNames(names, current)]
+            self.autocompleteCache.set(key, scope, choices)
+        return choices
 
 
     @cmd_help.autocomplete('help_section')
     async def helpSection_autocomplete(self,
         interaction: Interaction, current: str
     ) -> List[app_commands.Choice[str]]:
-        return [app_commands.Choice(name=c, value=c) for c in self.bot.helpSections if current in c][:25]
+        return [app_commands.Choice(name=c, value=c) for c in commandIndex.completeNames(self.bot.commandIndex.scope(interaction.guild).sortedSectionNames, current)]
 
 
     @basedApp.BasedCog.staticComponentCallback(basedComponent.StaticComponents.Help)
@@ -186,9 +213,9 @@ class HelpCog(basedApp.BasedCog):
             await self.showHelpPageSingleSection(interaction, commandAccessLevel, category, pageNum=pageNum)
 
 
-    async def showHelpPageAllSections(self, interaction: Interaction, commandAccessLevel: basedCommand.AccessLevelType, category: Optional[str] = None, pageNum: Optional[int] = None, helpSections: Optional[Dict[str, List[app_commands.Command]]] = None):
-        # This method calls itself sometimes. The helpSections argument acts as a cache, so we don't keep having to look up potential commands.
-        helpSections = helpSections if helpSections is not None else self.bot.helpSectionsForAccessLevel(commandAccessLevel)
+    async def showHelpPageAllSections(self, interaction: Interaction, commandAccessLevel: basedCommand.AccessLevelType, category: Optional[str] = None, pageNum: Optional[int] = None):
+        scope = self.bot.commandIndex.scope(interaction.guild)
+        helpSections = scope.helpSections[commandAccessLevel]
         
         # If no commands are available in the current section for the access level, show an empty list
         if not helpSections:
@@ -196,12 +223,12 @@ class HelpCog(basedApp.BasedCog):
         helpSectionNames = list(helpSections.keys())
 
         if category is None:
-            await self.showHelpPageAllSections(interaction, category=helpSectionNames[0], pageNum=1, commandAccessLevel=commandAccessLevel, helpSections=helpSections)
+            await self.showHelpPageAllSections(interaction, category=helpSectionNames[0], pageNum=1, commandAccessLevel=commandAccessLevel)
             return
 
         # This will happen if the user clicks the 'back' button when on the first page of a help section, to go back to the last help section
         if pageNum == 0:
-            await self.showHelpPageAllSections(interaction, category=helpSectionNames[helpSectionNames.index(category) - 1], pageNum=1, commandAccessLevel=commandAccessLevel, helpSections=helpSections)
+            await self.showHelpPageAllSections(interaction, category=helpSectionNames[helpSectionNames.index(category) - 1], pageNum=1, commandAccessLevel=commandAccessLevel)
             return
 
         # This will happen if the user is browsing a particular help section and then changes access level to a level that does not have commands in the section
@@ -211,16 +238,21 @@ class HelpCog(basedApp.BasedCog):
         pageNum = pageNum or 1
             
         offset = cfg.maxCommandsPerHelpPage * (pageNum - 1)
-        possibleCommands = self.bot.commandsInSectionForAccessLevel(category, commandAccessLevel)
+        possibleCommands = helpSections[category]
 
         # This will happen if the user clicks the 'next' button when on the last page of a help section, to go to the next help section
         if offset > len(possibleCommands):
             nextSection = helpSectionNames[helpSectionNames.index(category) + 1]
-            await self.showHelpPageAllSections(interaction, category=nextSection, pageNum=1, commandAccessLevel=commandAccessLevel, helpSections=helpSections)
+            await self.showHelpPageAllSections(interaction, category=nextSection, pageNum=1, commandAccessLevel=commandAccessLevel)
             return
 
-        defaultAccessLevel = accessLevels.defaultAccessLevel()
         userAccessLevel = await commandChecks.inferUserPermissions(interaction)
+        pageKey = (True, category, pageNum, commandAccessLevel, userAccessLevel)
+        if (page := scope.renderedPages.get(pageKey)) is not None:
+            await self.sendHelpPage(interaction, page)
+            return
+
+        defaultAccessLevel = accessLevels.defaultAccessLevel()
 
         # Find all access levels the user can switch to
         if userAccessLevel is defaultAccessLevel:
@@ -243,23 +275,32 @@ class HelpCog(basedApp.BasedCog):
         notLastInSection = last != len(possibleCommands)
         notLastPage = notLastInSection or category != helpSectionNames[-1]
 
-        await self.fillAndSendHelpPage(interaction, True, e, category, pageNum, commandAccessLevel, notLastInSection, possibleCommands, offset, last, notFirstPage, notLastPage, switchableAccessLevels, userAccessLevel)
+        page = self.renderHelpPage(True, e, category, pageNum, commandAccessLevel, notLastInSection, possibleCommands, offset, last, notFirstPage, notLastPage, switchableAccessLevels)
+        if offset == 0 or offset < len(possibleCommands):
+            scope.renderedPages.set(pageKey, page)
+        await self.sendHelpPage(interaction, page)
 
     
     async def showHelpPageSingleSection(self, interaction: Interaction, commandAccessLevel: basedCommand.AccessLevelType, category: str, pageNum: Optional[int] = None):
         userAccessLevel = await commandChecks.inferUserPermissions(interaction)
+        scope = self.bot.commandIndex.scope(interaction.guild)
+        # Only pages of real sections are cached, since the category is typed by the user
+        knownSection = category in scope.sectionNames
+        pageNum = (pageNum or 1) if knownSection else 1
+        pageKey = (False, category, pageNum, commandAccessLevel, userAccessLevel)
+        if knownSection and (page := scope.renderedPages.get(pageKey)) is not None:
+            await self.sendHelpPage(interaction, page)
+            return
 
-        if category not in self.bot.helpSections:
-            pageNum = 1
+        if not knownSection:
             offset = 0
             possibleCommands = []
             switchableAccessLevels = []
         else:
             defaultAccessLevel = accessLevels.defaultAccessLevel()
 
-            pageNum = pageNum or 1
             offset = cfg.maxCommandsPerHelpPage * (pageNum - 1)
-            possibleCommands = self.bot.commandsInSectionForAccessLevel(category, commandAccessLevel)
+            possibleCommands = scope.helpSections[commandAccessLevel].get(category, [])
             switchableAccessLevels = []
             
             # Find all access levels the user can switch to and still have commands available in the section
@@ -272,14 +313,12 @@ class HelpCog(basedApp.BasedCog):
                     # This will happen if a help section is requested that only contains commands at an access level higher than the default
                     # Pick the lowest access level that the user has access to and also contains commands in this section
                     if noCommands:
-                        currentCommands = self.bot.commandsInSectionForAccessLevel(category, level)
+                        currentCommands = scope.helpSections[level].get(category)
                         if currentCommands:
                             possibleCommands = currentCommands
                             commandAccessLevel = level
                             noCommands = False
-                    # Once we're sure we've got an access level with some commands, we can do a more efficient lookup
-                    # that exits checking a given level as soon as a single matching command is found
-                    elif any(basedCommand.accessLevel(c) is level for c in self.bot.helpSections[category]):
+                    elif category in scope.helpSections[level]:
                         switchableAccessLevels.append(level)
 
         e = Embed(description=cfg.helpIntro)
@@ -292,10 +331,14 @@ class HelpCog(basedApp.BasedCog):
         notLastInSection = last != len(possibleCommands)
         notLastPage = notLastInSection
 
-        await self.fillAndSendHelpPage(interaction, False, e, category, pageNum, commandAccessLevel, notLastInSection, possibleCommands, offset, last, notFirstPage, notLastPage, switchableAccessLevels, userAccessLevel)
+        page = self.renderHelpPage(False, e, category, pageNum, commandAccessLevel, notLastInSection, possibleCommands, offset, last, notFirstPage, notLastPage, switchableAccessLevels)
+        # Pages past the end of the section are rendered empty, and not cached
+        if knownSection and (offset == 0 or offset < len(possibleCommands)):
+            scope.renderedPages.set(pageKey, page)
+        await self.sendHelpPage(interaction, page)
 
 
-    async def fillAndSendHelpPage(self, interaction: Interaction, showAll: bool, embed: Embed, category: str, pageNum: int, commandAccessLevel: basedCommand.AccessLevelType, notLastInSection: bool, possibleCommands: List[app_commands.Command], offset: int, last: int, notFirstPage: bool, notLastPage: bool, switchableAccessLevels: List[basedCommand.AccessLevelType], userAccessLevel: basedCommand.AccessLevelType):
+    def renderHelpPage(self, showAll: bool, embed: Embed, category: str, pageNum: int, commandAccessLevel: basedCommand.AccessLevelType, notLastInSection: bool, possibleCommands: List[app_commands.Command], offset: int, last: int, notFirstPage: bool, notLastPage: bool, switchableAccessLevels: List[basedCommand.AccessLevelType]) -> RenderedHelpPage:
         embed.title = f"{commandAccessLevel.name.title()} Commands"
         embed.colour = Colour.blue()
 
@@ -311,11 +354,8 @@ class HelpCog(basedApp.BasedCog):
                 embed.add_field(name=formatSignature(c), value=commandDescription(c, meta), inline=False)
 
         # If we need to add any buttons
+        buttons: List[Tuple[str, Optional[str]]] = []
         if notFirstPage or notLastPage or switchableAccessLevels:
-            view = View()
-            previousPageButton = Button(emoji=cfg.defaultEmojis.previous.sendable, disabled=True)
-            nextPageButton = Button(emoji=cfg.defaultEmojis.next.sendable, disabled=True)
-
             # Circle access level switch around from bottom to top
             if switchableAccessLevels:
                 if len(switchableAccessLevels) == 1:
@@ -333,34 +373,34 @@ class HelpCog(basedApp.BasedCog):
                     if nextAccessLevel is None:
                         nextAccessLevel = minAccessLevel
 
-                switchAccessLevelButton = Button(emoji=cfg.defaultEmojis.spiral.sendable)
                 # Setting category to None, so that the first category is shown
-                switchAccessLevelButton = basedComponent.StaticComponents.Help(switchAccessLevelButton, args=packHelpPageArgs(showAll, accessLevelNum=nextAccessLevel._intLevel(), category=None))
-                view.add_item(switchAccessLevelButton)
-
-            # Add 'back' and 'next' buttons
-            if notFirstPage:
-                previousPageButton = basedComponent.StaticComponents.Help(previousPageButton, args=packHelpPageArgs(showAll, pageNum=pageNum-1, accessLevelNum=commandAccessLevel._intLevel(), category=category))
-                previousPageButton.disabled = False
-            if notLastPage:
-                nextPageButton = basedComponent.StaticComponents.Help(nextPageButton, args=packHelpPageArgs(showAll, pageNum=min(HELP_MAX_PAGE, pageNum+1), accessLevelNum=commandAccessLevel._intLevel(), category=category))
-                nextPageButton.disabled = False
-
-            view.add_item(previousPageButton).add_item(nextPageButton)
-        else:
-            view = MISSING
-        
+                buttons.append((cfg.defaultEmojis.spiral.sendable, basedComponent.staticComponentCustomId(basedComponent.StaticComponents.Help,
+                                args=packHelpPageArgs(showAll, accessLevelNum=nextAccessLevel._intLevel(), category=None))))
+
+            # Add 'back' and 'next' buttons, disabled if there is no page to go to
+            buttons.append((cfg.defaultEmojis.previous.sendable, None if not notFirstPage else \
+                            basedComponent.staticComponentCustomId(basedComponent.StaticComponents.Help,
+                                args=packHelpPageArgs(showAll, pageNum=pageNum-1, accessLevelNum=commandAccessLevel._intLevel(), category=category))))
+            buttons.append((cfg.defaultEmojis.next.sendable, None if not notLastPage else \
+                            basedComponent.staticComponentCustomId(basedComponent.StaticComponents.Help,
+                                args=packHelpPageArgs(showAll, pageNum=min(HELP_MAX_PAGE, pageNum+1), accessLevelNum=commandAccessLevel._intLevel(), category=category))))
+
+        return RenderedHelpPage(embed, tuple(buttons))
+
+
+    async def sendHelpPage(self, interaction: Interaction, page: RenderedHelpPage):
+        view = page.view()
         if interaction.type == InteractionType.component:
             if interaction.response.is_done():
-                await interaction.edit_original_response(embed=embed, view=view)
+                await interaction.edit_original_response(embed=page.embed, view=view)
             else:
                 # TODO: I'm not sure why I keep getting 'interaction already acknowledged' here. The interaction should be new for each button press?
                 try:
-                    await interaction.response.edit_message(embed=embed, view=view)
+                    await interaction.response.edit_message(embed=page.embed, view=view)
                 except HTTPException:
                     pass
         else:
-            await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+            await interaction.response.send_message(embed=page.embed, view=view, ephemeral=True)
 
 
 async def setup(bot: client.BasedClient):
@@ -1,4 +1,6 @@
 import importlib
+import importlib.util
+import sys
 
 from ..commandsManager import heirarchicalCommandsDB
 from ..cfg import cfg
@@ -20,3 +22,29 @@ def loadCommands():
                 raise e
 
     return commandsDB
+
+
+def reloadCommandsModule(modName: str):
+    """Reload a single commands module, replacing only the commands that it registered.
+    The swap is synchronous, so commands called from `on_message` always see either all of the old module's commands,
+    or all of the new module's commands. If the module fails to load, its old commands are restored.
+
+    :param str modName: The name of the module to reload, as given in `cfg.includedCommandModules`
+    :return: The commands DB
+    :rtype: HeirarchicalCommandsDB
+    """
+    fullName = importlib.util.resolve_name(("" if modName.startswith(".") else ".") + modName, "bot.commands")
+    oldRegistrations = commandsDB.unregisterModule(fullName)
+
+    try:
+        if fullName in sys.modules:
+            importlib.reload(sys.modules[fullName])
+        else:
+            importlib.import_module(fullName)
+    except BaseException:
+        # Remove anything that the failed load registered, before restoring the old commands
+        commandsDB.unregisterModule(fullName)
+        commandsDB.restoreRegistrations(oldRegistrations)
+        raise
+
+    return commandsDB
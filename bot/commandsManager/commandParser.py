@@ -0,0 +1,183 @@
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+
+class PrefixMatch(NamedTuple):
+    """The command prefix found at the start of a message.
+
+    :var prefix: The matched prefix
+    :vartype prefix: str
+    :var end: The index in the message where the command starts, after the prefix and any skipped spaces
+    :vartype end: int
+    """
+    prefix: str
+    end: int
+
+
+class ParsedCommand(NamedTuple):
+    """A message command call, split into its parts.
+
+    :var prefix: The prefix that the command was called with
+    :vartype prefix: str
+    :var command: The name that the command was called by
+    :vartype command: str
+    :var args: The arguments to the command, with smart apostrophes replaced with '
+    :vartype args: str
+    """
+    prefix: str
+    command: str
+    args: str
+
+
+class PrefixTrie:
+    """A trie of command prefixes, for finding which of many prefixes a message starts with in a single scan,
+    which stops as soon as the message stops matching any prefix. Where multiple prefixes match, the longest one wins.
+    """
+    def __init__(self, prefixes: Iterable[str] = ()):
+        """
+        :param Iterable[str] prefixes: Prefixes to add to the trie (Default ())
+        """
+        # Each node maps characters to child nodes. A node that ends a prefix maps `None` to (prefix, skipSpaces)
+        self._root: Dict[Any, Any] = {}
+        for prefix in prefixes:
+            self.add(prefix)
+
+
+    def add(self, prefix: str, skipSpaces: bool = False):
+        """Add a prefix to the trie.
+
+        :param str prefix: The prefix to add
+        :param bool skipSpaces: Whether spaces following the prefix should be skipped, e.g for mentions (Default False)
+        :raise ValueError: If `prefix` is empty
+        """
+        if not prefix:
+            raise ValueError("Command prefixes cannot be empty")
+
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[None] = (prefix, skipSpaces)
+
+
+    def match(self, text: str) -> Optional[PrefixMatch]:
+        """Find the longest prefix in the trie that `text` starts with.
+
+        :param str text: The text to match, e.g the content of a message
+        :return: The matched prefix, or `None` if `text` does not start with any prefix in the trie
+        :rtype: Optional[PrefixMatch]
+        """
+        node = self._root
+        best: Optional[Tuple[str, bool]] = None
+        depth = end = 0
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            depth += 1
+            terminal = node.get(None)
+            if terminal is not None:
+                best, end = terminal, depth
+
+        if best is None:
+            return None
+
+        prefix, skipSpaces = best
+        if skipSpaces:
+            while end < len(text) and text[end] == " ":
+                end += 1
+        return PrefixMatch(prefix, end)
+
+
+def mentionPrefixes(userId: int) -> Tuple[str, str]:
+    """Get the ways in which a user can be mentioned at the start of a message, for use as command prefixes.
+
+    :param int userId: The ID of the mentioned user
+    :return: The user and nickname mention formats for the user
+    :rtype: Tuple[str, str]
+    """
+    return f"<@{userId}>", f"<@!{userId}>"
+
+
+def parseCommand(content: str, prefixes: PrefixTrie) -> Optional[ParsedCommand]:
+    """Split a message into a command call, if it starts with a command prefix.
+    The message is not copied: the command name is found by scanning for the first space after the prefix,
+    and only the arguments are sliced out and have their smart apostrophes replaced.
+
+    :param str content: The content of the message
+    :param PrefixTrie prefixes: The prefixes that commands can be called with
+    :return: The command call, or `None` if the message does not start with a prefix, or contains only a prefix
+    :rtype: Optional[ParsedCommand]
+    """
+    match = prefixes.match(content)
+    if match is None or match.end == len(content):
+        return None
+
+    commandEnd = content.find(" ", match.end)
+    if commandEnd == -1:
+        return ParsedCommand(match.prefix, content[match.end:], "")
+    # replace special apostraphe characters with the universal '
+    args = content[commandEnd + 1:].replace("‘", "'").replace("’", "'")
+    return ParsedCommand(match.prefix, content[match.end:commandEnd], args)
+
+
+class CommandParser:
+    """Parses message commands for many guilds, each with their own command prefixes.
+    Prefix tries are cached by the prefixes that they match, since many guilds share the same prefixes.
+    If a mention user is set, mentioning that user is also accepted as a command prefix.
+
+    :var mentionUserId: The ID of the user whose mention is accepted as a command prefix, if any
+    :vartype mentionUserId: Optional[int]
+    :var cacheSize: The maximum number of prefix tries to cache
+    :vartype cacheSize: int
+    """
+    def __init__(self, mentionUserId: Optional[int] = None, cacheSize: int = 1024):
+        """
+        :param Optional[int] mentionUserId: The ID of the user whose mention is accepted as a command prefix (Default None)
+        :param int cacheSize: The maximum number of prefix tries to cache (Default 1024)
+        """
+        self.mentionUserId = mentionUserId
+        self.cacheSize = cacheSize
+        self._tries: OrderedDict[Tuple[str, ...], PrefixTrie] = OrderedDict()
+
+
+    def setMentionUser(self, userId: Optional[int]):
+        """Set the user whose mention is accepted as a command prefix.
+
+        :param Optional[int] userId: The ID of the user, or `None` to stop accepting mentions as a command prefix
+        """
+        if userId != self.mentionUserId:
+            self.mentionUserId = userId
+            self._tries.clear()
+
+
+    def trieFor(self, prefixes: Tuple[str, ...]) -> PrefixTrie:
+        """Get the prefix trie matching `prefixes`, and the mention user if one is set.
+
+        :param Tuple[str, ...] prefixes: The command prefixes to match
+        :return: A trie matching all of the prefixes
+        :rtype: PrefixTrie
+        """
+        if (trie := self._tries.get(prefixes)) is not None:
+            self._tries.move_to_end(prefixes)
+            return trie
+
+        trie = PrefixTrie(prefixes)
+        if self.mentionUserId is not None:
+            for mention in mentionPrefixes(self.mentionUserId):
+                trie.add(mention, skipSpaces=True)
+
+        self._tries[prefixes] = trie
+        if len(self._tries) > self.cacheSize:
+            self._tries.popitem(last=False)
+        return trie
+
+
+    def parse(self, content: str, prefixes: Tuple[str, ...]) -> Optional[ParsedCommand]:
+        """Split a message into a command call, if it starts with one of `prefixes`, or a mention of the mention user.
+
+        :param str content: The content of the message
+        :param Tuple[str, ...] prefixes: The command prefixes to accept
+        :return: The command call, or `None` if the message does not start with a prefix, or contains only a prefix
+        :rtype: Optional[ParsedCommand]
+        """
+        return parseCommand(content, self.trieFor(prefixes))
@@ -0,0 +1,134 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..lib.stringTyping import editDistance
+
+
+def _deletions(word: str, maxDeletions: int) -> Set[str]:
+    """Get every string that can be made by deleting up to `maxDeletions` characters from `word`, including `word` itself.
+    """
+    variants = {word}
+    frontier = {word}
+    for _ in range(maxDeletions):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+class FuzzyIndex:
+    """An index of command identifiers, for finding the registered identifiers closest to an unknown command.
+    Identifiers are compared by the edit distance between their lower case forms.
+
+    The index maps every string that can be made by deleting up to `maxDistance` characters from an identifier,
+    to that identifier. Any two strings within `maxDistance` edits of each other share one of these deletions, so a lookup
+    only needs to generate the deletions of the unknown command, look each of them up, and measure the edit distance
+    to the few identifiers found, rather than to every identifier.
+    Identifiers are added and removed one at a time as commands are registered and unregistered, without rebuilding the index.
+
+    :var maxDistance: The greatest edit distance at which identifiers can be found
+    :vartype maxDistance: int
+    """
+    def __init__(self, maxDistance: int):
+        """
+        :param int maxDistance: The greatest edit distance at which identifiers can be found
+        """
+        self.maxDistance = maxDistance
+        # Lower case identifier -> (identifier as it should be suggested, access levels of each registration of it)
+        self._entries: Dict[str, Tuple[str, List[int]]] = {}
+        # Deletion -> lower case identifiers with that deletion
+        self._deletions: Dict[str, Set[str]] = {}
+        # The length of the longest identifier. Queries more than `maxDistance` characters longer than this cannot match anything
+        self._longest = 0
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def add(self, ident: str, accessLevel: int):
+        """Add a command identifier to the index. If the identifier is already in the index,
+        it is made available to the lowest of its access levels.
+
+        :param str ident: The identifier to add, as it should be suggested
+        :param int accessLevel: The lowest access level that can call the identifier
+        """
+        key = ident.lower()
+        if (existing := self._entries.get(key)) is not None:
+            existing[1].append(accessLevel)
+            return
+
+        self._entries[key] = (ident, [accessLevel])
+        self._longest = max(self._longest, len(key))
+        for deletion in _deletions(key, self.maxDistance):
+            self._deletions.setdefault(deletion, set()).add(key)
+
+
+    def remove(self, ident: str, accessLevel: int):
+        """Remove a command identifier that was added at the given access level. If the identifier was also added
+        at other access levels, it remains in the index for those.
+
+        :param str ident: The identifier to remove
+        :param int accessLevel: The access level that the identifier was added at
+        :raise KeyError: If the identifier is not in the index
+        :raise ValueError: If the identifier was not added at `accessLevel`
+        """
+        key = ident.lower()
+        levels = self._entries[key][1]
+        levels.remove(accessLevel)
+        if levels: return
+
+        del self._entries[key]
+        for deletion in _deletions(key, self.maxDistance):
+            keys = self._deletions[deletion]
+            keys.discard(key)
+            if not keys:
+                del self._deletions[deletion]
+        if len(key) == self._longest:
+            self._longest = max(map(len, self._entries), default=0)
+
+
+    def closest(self, query: str, accessLevel: int) -> Optional[str]:
+        """Find the identifier closest to `query`, out of those callable at `accessLevel`.
+        Ties are broken alphabetically.
+
+        :param str query: The unknown command
+        :param int accessLevel: The access level of the caller
+        :return: The closest identifier, or `None` if no callable identifier is within `maxDistance` of `query`
+        :rtype: Optional[str]
+        """
+        # The number of deletions generated grows with the cube of the query's length, so rule out long queries before generating any
+        if len(query) > self._longest + self.maxDistance:
+            return None
+
+        key = query.lower()
+        # The length of the longest deletion shared with each candidate. An identifier that shares a deletion of length L
+        # with the query is at least max(len(query), len(identifier)) - L edits away from it
+        candidates: Dict[str, int] = {}
+        for deletion in _deletions(key, self.maxDistance):
+            for candidate in self._deletions.get(deletion, ()):
+                if candidates.get(candidate, -1) < len(deletion):
+                    candidates[candidate] = len(deletion)
+
+        lowerBounds = sorted((max(len(key), len(candidate)) - shared, candidate) for candidate, shared in candidates.items())
+        best: Optional[Tuple[int, str]] = None
+        bound = self.maxDistance
+        for lowerBound, candidate in lowerBounds:
+            # Candidates are in order of their lower bound, so no later candidate can be closer than the best so far
+            if lowerBound > bound:
+                break
+            display, candidateLevels = self._entries[candidate]
+            if min(candidateLevels) > accessLevel:
+                continue
+            distance = editDistance(key, candidate, bound)
+            if distance <= bound and (best is None or (distance, display) < best):
+                best = (distance, display)
+                bound = distance
+
+        return None if best is None else best[1]
+
+
+    def clear(self):
+        """Remove all identifiers from the index.
+        """
+        self._entries.clear()
+        self._deletions.clear()
+        self._longest = 0
@@ -1,12 +1,33 @@
-from typing import Dict, List
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 from discord import Message, Embed, Colour # type: ignore[import]
 
 from ..cfg import cfg
 from .commandRegistry import CommandRegistry, COMMAND_FUNCTION_TYPE
+from .fuzzyIndex import FuzzyIndex
 
 
 HelpSectionsType = List[Dict[str, List[CommandRegistry]]]
+# (required access level, exact identifier if the command can only be called with its casing, registry)
+DispatchEntry = Tuple[int, Optional[str], CommandRegistry]
+
+
+class Registration(NamedTuple):
+    """Everything that registering one command added to a `HeirarchicalCommandsDB`, so that it can be removed again.
+
+    :var module: The name of the module that registered the command
+    :vartype module: str
+    :var accessLevel: The access level that the command requires
+    :vartype accessLevel: int
+    :var idents: The identifiers that the command can be called by, including aliases
+    :vartype idents: List[str]
+    :var registry: The registered command
+    :vartype registry: CommandRegistry
+    """
+    module: str
+    accessLevel: int
+    idents: List[str]
+    registry: CommandRegistry
 
 
 class HeirarchicalCommandsDB:
@@ -17,13 +38,18 @@ class HeirarchicalCommandsDB:
     :var commands: A list, where the index in the list corresponds to the access level requirement. Each index in the list is
                     a dictionary mapping a command identifier string to a command registry.
     :vartype commands: List[Dict[str, CommandRegistry]]
+    :var dispatch: The same commands as `commands`, flattened for calling. Maps lower case command identifiers to a list
+                    of the commands which can be called by that identifier in some casing, in calling priority order.
+    :vartype dispatch: Dict[str, List[DispatchEntry]]
+    :var suggestions: The identifiers of all commands shown in help, for suggesting commands similar to unknown commands
+    :vartype suggestions: FuzzyIndex
+    :var moduleRegistrations: The registrations made by each module, so that a module's commands can be unregistered
+    :vartype moduleRegistrations: Dict[str, List[Registration]]
     :var helpSections: A list, where indices correspond to access levels, and elements are dictionaries mapping help section
                         names to lists of CommandRegistrys
     :vartype helpSections: List[Dict[str, List[CommandRegistry]]]
-    :var helpSectionEmbeds: A list, where indices correspond to access levels, and elements are dictionaries mapping help
-                            section names to a list of discord.Embeds describing each command in the section by their
-                            shortHelp strings
-    :vartype helpSectionEmbeds: List[Dict[str, List[Embed]]]
+    :var helpThumbnailUrl: The URL of the thumbnail to show in help embeds, if any
+    :vartype helpThumbnailUrl: Optional[str]
     """
 
     def __init__(self, numAccessLevels: int):
@@ -32,17 +58,12 @@ class HeirarchicalCommandsDB:
         self.numAccessLevels = numAccessLevels
         self.clear()
         self.helpSections: HelpSectionsType = [{"miscellaneous": []} for _ in range(self.numAccessLevels)]
-        self.helpSectionEmbeds = [{"miscellaneous": [Embed(title=cfg.userAccessLevels[accessLevel] + " Commands",
-                                                            description=cfg.helpIntro + "\n__Miscellaneous__",
-                                                            colour=Colour.blue())]}
-                                                                    for accessLevel in range(self.numAccessLevels)]
-        self.helpSectionEmbeds[0]["miscellaneous"][0].set_footer(text="Page 1 of 1")
-        self.totalEmbeds = [1 for _ in range(numAccessLevels)]
+        self.helpThumbnailUrl: Optional[str] = None
 
     def register(self, command: str, function: COMMAND_FUNCTION_TYPE, accessLevel: int, aliases: List[str] = [],
                  forceKeepArgsCasing: bool = False, forceKeepCommandCasing: bool = False, allowDM: bool = True,
                  noHelp: bool = False, signatureStr: str = "", shortHelp: str = "", longHelp: str = "",
-                 useDoc: bool = False, helpSection: str = "miscellaneous"):
+                 useDoc: bool = False, helpSection: str = "miscellaneous", module: Optional[str] = None):
         """Register a command in the database.
 
         :param str command: the text name users should call the function by. Commands are case sensitive.
@@ -61,6 +82,8 @@ class HeirarchicalCommandsDB:
         :param bool useDoc: If no help strings are given, fall back on the docstring of function. (Default False)
         :param str helpSection: The name of the help section that this command should be
                                 displayed under (Default "miscellaneous")
+        :param Optional[str] module: The name of the module registering the command, for `unregisterModule`
+                                        (Default function.__module__)
         :raise IndexError: When attempting to register at an unsupported access level
         :raise NameError: When attempting to register a command identifier or alias that already exists at the
                             requested access level
@@ -125,28 +148,147 @@ class HeirarchicalCommandsDB:
         newRegistry = CommandRegistry(cmdIdent, function, forceKeepArgsCasing, forceKeepCommandCasing, allowDM, not noHelp,
                                       aliases=aliases, signatureStr=signatureStr, shortHelp=shortHelp, longHelp=longHelp,
                                       helpSection=helpSection)
-        for currentIdent in allIdents:
-            self.commands[accessLevel][currentIdent] = newRegistry
+        self._addRegistration(Registration(module if module is not None else function.__module__, accessLevel, allIdents, newRegistry))
+
+
+    def _addRegistration(self, registration: Registration):
+        """Add a validated command registration to the commands, dispatch table, help and suggestions.
+        """
+        accessLevel, registry = registration.accessLevel, registration.registry
+        for currentIdent in registration.idents:
+            self.commands[accessLevel][currentIdent] = registry
+            self._addDispatchEntry(currentIdent, accessLevel, registry)
+
+        if registry.allowHelp:
+            # Add the command to help. Its help pages are rebuilt when they are next requested
+            self.helpSections[accessLevel][registry.helpSection].append(registry)
+            self._helpPages.pop((accessLevel, registry.helpSection), None)
+            for currentIdent in registration.idents:
+                self.suggestions.add(currentIdent, accessLevel)
+
+        self.moduleRegistrations.setdefault(registration.module, []).append(registration)
+
+
+    def unregisterModule(self, module: str) -> List[Registration]:
+        """Remove all of the commands registered by a module from the commands, dispatch table, help and suggestions.
+        Commands registered by other modules are unaffected, and help pages are only rebuilt for the affected sections.
+
+        :param str module: The name of the module whose commands to remove
+        :return: The removed registrations, which can be given to `restoreRegistrations` to undo the removal
+        :rtype: List[Registration]
+        """
+        registrations = self.moduleRegistrations.pop(module, [])
+        for registration in registrations:
+            accessLevel, registry = registration.accessLevel, registration.registry
+            for currentIdent in registration.idents:
+                if self.commands[accessLevel].get(currentIdent) is registry:
+                    del self.commands[accessLevel][currentIdent]
+
+                lowerIdent = currentIdent.lower()
+                entries = [entry for entry in self.dispatch.get(lowerIdent, []) if entry[2] is not registry]
+                if entries:
+                    self.dispatch[lowerIdent] = entries
+                else:
+                    self.dispatch.pop(lowerIdent, None)
+
+            if registry.allowHelp:
+                section = self.helpSections[accessLevel][registry.helpSection]
+                section[:] = [other for other in section if other is not registry]
+                self._helpPages.pop((accessLevel, registry.helpSection), None)
+                for currentIdent in registration.idents:
+                    self.suggestions.remove(currentIdent, accessLevel)
+
+        return registrations
+
+
+    def restoreRegistrations(self, registrations: List[Registration]):
+        """Add back registrations that were removed by `unregisterModule`.
+
+        :param List[Registration] registrations: The registrations to restore
+        :raise NameError: If any of the registrations' identifiers have since been registered at the same access level
+        """
+        for registration in registrations:
+            for currentIdent in registration.idents:
+                if currentIdent in self.commands[registration.accessLevel]:
+                    raise NameError("A command at access level " + str(registration.accessLevel) +
+                                    " already exists with the name " + currentIdent)
+
+        for registration in registrations:
+            self._addRegistration(registration)
+
+
+    def helpSectionPages(self, accessLevel: int, sectionName: str) -> List[Embed]:
+        """Get the pages of help embeds listing the commands in a help section, by their shortHelp strings.
+        Pages are built when they are first requested, and cached until a command is added to or removed from the section.
+        Sections without any commands, e.g because their commands' module was unregistered, have no pages.
+
+        :param int accessLevel: The access level which commands in the section require
+        :param str sectionName: The name of the section
+        :return: The section's help pages, in order, or an empty list if the section has no commands
+        :rtype: List[Embed]
+        :raise KeyError: If no section exists with the given name at the given access level
+        """
+        key = (accessLevel, sectionName)
+        if (pages := self._helpPages.get(key)) is None:
+            pages = self._buildHelpPages(accessLevel, sectionName)
+            self._helpPages[key] = pages
+        return pages
+
+
+    def _buildHelpPages(self, accessLevel: int, sectionName: str) -> List[Embed]:
+        """Lay out the commands in a help section onto as many embeds as are needed, in registration order.
+        """
+        if not self.helpSections[accessLevel][sectionName]:
+            return []
+
+        def newPage() -> Embed:
+            page = Embed(title=cfg.userAccessLevels[accessLevel] + " Commands",
+                            description=cfg.helpIntro + "\n__" + sectionName.title() + "__", colour=Colour.blue())
+            if self.helpThumbnailUrl is not None:
+                page.set_thumbnail(url=self.helpThumbnailUrl)
+            return page
+
+        pages = [newPage()]
+        for registry in self.helpSections[accessLevel][sectionName]:
+            pages[-1].add_field(name=registry.signatureStr, value=registry.shortHelp, inline=False)
+
+            if len(pages[-1]) > 6000 or len(pages[-1].fields) > cfg.maxCommandsPerHelpPage:
+                pages[-1].remove_field(-1)
+                pages.append(newPage())
+                pages[-1].add_field(name=registry.signatureStr, value=registry.shortHelp, inline=False)
+
+        for pageNum, page in enumerate(pages):
+            page.set_footer(text="Page " + str(pageNum + 1) + " of " + str(len(pages)))
+        return pages
+
+
+    @property
+    def helpSectionEmbeds(self) -> List[Dict[str, List[Embed]]]:
+        """A list, where indices correspond to access levels, and elements are dictionaries mapping help section names
+        to the section's help pages. Sections without any commands are omitted.
+        Building this requires every help page to be built, so prefer `helpSectionPages`.
+        """
+        return [{sectionName: self.helpSectionPages(accessLevel, sectionName) for sectionName, registries in sections.items() if registries}
+                    for accessLevel, sections in enumerate(self.helpSections)]
+
+
+    @property
+    def totalEmbeds(self) -> List[int]:
+        """The total number of help pages for each access level.
+        """
+        return [sum(len(self.helpSectionPages(accessLevel, sectionName)) for sectionName in sections)
+                    for accessLevel, sections in enumerate(self.helpSections)]
 
-        if not noHelp:
-            # Add the command to help
-            self.helpSections[accessLevel][helpSection].append(newRegistry)
-            self.helpSectionEmbeds[accessLevel][helpSection][-1].add_field(
-                name=signatureStr, value=newRegistry.shortHelp, inline=False)
-
-            if len(self.helpSectionEmbeds[accessLevel][helpSection][-1]) > 6000 or \
-                    len(self.helpSectionEmbeds[accessLevel][helpSection][-1].fields) > cfg.maxCommandsPerHelpPage:
-
-                self.helpSectionEmbeds[accessLevel][helpSection][-1].remove_field(-1)
-                self.helpSectionEmbeds[accessLevel][helpSection].append(Embed(
-                    title=cfg.userAccessLevels[accessLevel] + " Commands", description=cfg.helpIntro + "\n__" +
-                            helpSection.title() + "__", colour=Colour.blue()))
-                self.helpSectionEmbeds[accessLevel][helpSection][-1].add_field(
-                    name=signatureStr, value=newRegistry.shortHelp, inline=False)
-                for pageNum in range(len(self.helpSectionEmbeds[accessLevel][helpSection])):
-                    self.helpSectionEmbeds[accessLevel][helpSection][pageNum].set_footer(
-                        text="Page " + str(pageNum + 1) + " of " + str(len(self.helpSectionEmbeds[accessLevel][helpSection])))
-                self.totalEmbeds[accessLevel] += 1
+
+    def setHelpThumbnail(self, url: Optional[str]):
+        """Set the thumbnail to show in all help embeds.
+
+        :param Optional[str] url: The URL of the thumbnail image, or `None` to show no thumbnail
+        """
+        self.helpThumbnailUrl = url
+        for pages in self._helpPages.values():
+            for page in pages:
+                page.set_thumbnail(url=url)
 
 
     async def call(self, command: str, message: Message, args: str, accessLevel: int, isDM: bool = False):
@@ -162,25 +304,51 @@ class HeirarchicalCommandsDB:
         :return: True if the command call was successful, False otherwise
         :rtype: bool
         """
-        commandLower = command.lower()
-        # Search upper access levels first
-        for requiredAccess in range(accessLevel, -1, -1):
-            # Search casing matches (forceKeepCommandCasing) first
-            if command in self.commands[requiredAccess]:
-                await self.commands[requiredAccess][command].call(message, args, isDM)
-                # Return true if a command was found
-                return True
-            elif commandLower in self.commands[requiredAccess]:
-                await self.commands[requiredAccess][commandLower].call(message, args, isDM)
-                return True
+        entries = self.dispatch.get(command.lower())
+        if entries is not None:
+            for requiredAccess, exactIdent, registry in entries:
+                if requiredAccess <= accessLevel and (exactIdent is None or exactIdent == command):
+                    await registry.call(message, args, isDM)
+                    # Return true if a command was found
+                    return True
         # Return false if no command could be matched
         return False
 
 
+    def suggest(self, command: str, accessLevel: int) -> Optional[str]:
+        """Find the command identifier most similar to an unknown command, out of the commands shown in help
+        that are callable at the given access level.
+
+        :param str command: The unknown command
+        :param int accessLevel: The access level of the caller
+        :return: The most similar command identifier, or `None` if none are within `cfg.maxCommandSuggestionDistance` edits
+        :rtype: Optional[str]
+        """
+        if self.suggestions.maxDistance < 1:
+            return None
+        return self.suggestions.closest(command, accessLevel)
+
+
+    def _addDispatchEntry(self, ident: str, accessLevel: int, registry: CommandRegistry):
+        """Add a registered command identifier to `dispatch`.
+        An identifier containing upper case characters can only be called with exactly that casing. Otherwise,
+        it can be called in any casing. Entries are kept in the order that `call` used to search the access levels in:
+        higher access levels first, and within the same access level, exact casing matches first.
+        """
+        lowerIdent = ident.lower()
+        entries = self.dispatch.setdefault(lowerIdent, [])
+        entries.append((accessLevel, None if ident == lowerIdent else ident, registry))
+        entries.sort(key=lambda entry: (-entry[0], entry[1] is None))
+
+
     def clear(self):
         """Remove all command registrations from the database.
         """
-        self.commands = [{} for _ in range(self.numAccessLevels)]
+        self.commands: List[Dict[str, CommandRegistry]] = [{} for _ in range(self.numAccessLevels)]
+        self.dispatch: Dict[str, List[DispatchEntry]] = {}
+        self._helpPages: Dict[Tuple[int, str], List[Embed]] = {}
+        self.suggestions = FuzzyIndex(cfg.maxCommandSuggestionDistance)
+        self.moduleRegistrations: Dict[str, List[Registration]] = {}
 
 
     def addHelpSection(self, accessLevel: int, sectionName: str):
@@ -197,8 +365,3 @@ class HeirarchicalCommandsDB:
             raise ValueError("The given section name already exists in this DB '" + sectionName + "'")
 
         self.helpSections[accessLevel][sectionName] = []
-        self.helpSectionEmbeds[accessLevel][sectionName] = [
-            Embed(title=cfg.userAccessLevels[accessLevel] + " Commands", description=cfg.helpIntro + "\n__" +
-                                                                                        sectionName.title() + "__")]
-        self.helpSectionEmbeds[accessLevel][sectionName][0].set_footer(text="Page 1 of 1")
-        self.totalEmbeds[accessLevel] += 1
@@ -1,19 +1,93 @@
 from __future__ import annotations
-from typing import Optional
+from datetime import timedelta
+from typing import AbstractSet, Dict, Iterable, List, Mapping, Optional, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
-from sqlalchemy import select
+from sqlalchemy import bindparam, select, update
 
-from .snowflakeDb import SnowflakeDB
+from .snowflakeDb import SnowflakeDB, defaultReplicaMaxLag
+from .invalidation import InvalidationBus
 from ..users.basedGuild import BasedGuild
 from ..lib.sql import SessionSharer
 
 class GuildDB(SnowflakeDB[BasedGuild]):
-    def __init__(self, engine: AsyncEngine):
-        super().__init__(BasedGuild, engine)
+    def __init__(self, engine: AsyncEngine, readEngine: Optional[AsyncEngine] = None, replicaMaxLag: timedelta = defaultReplicaMaxLag,
+                    invalidationBus: Optional[InvalidationBus] = None):
+        super().__init__(BasedGuild, engine, readEngine=readEngine, replicaMaxLag=replicaMaxLag, invalidationBus=invalidationBus)
+        self._commandPrefixStatement = select(BasedGuild.commandPrefix).where(BasedGuild.id == bindparam("recordId"))
 
     async def getCommandPrefix(self, recordId: int, session: Optional[AsyncSession] = None):
-        query = select(BasedGuild).with_only_columns(BasedGuild.commandPrefix).where(BasedGuild.id == recordId)
+        async with SessionSharer(session, self._readSessionMaker(recordId)) as s:
+            return await s.session.scalar(self._commandPrefixStatement, {"recordId": recordId})
+
+
+    async def reconcile(self, liveGuildIds: AbstractSet[int], batchSize: int = 1000, deleteDeparted: bool = True,
+                        session: Optional[AsyncSession] = None) -> Tuple[int, int]:
+        """Bring the stored guilds in line with the guilds that the bot is currently in.
+        Guilds joined while the bot was offline are created, and guilds left while the bot was offline are deleted.
+        Deleting is irreversible, so should be skipped with :param:`deleteDeparted` whenever :param:`liveGuildIds`
+        may be incomplete, e.g while some guilds are unavailable. If :param:`liveGuildIds` is empty, nothing is deleted.
+
+        The stored guild IDs are streamed and diffed against :param:`liveGuildIds`, and the differences
+        are applied with bulk statements of up to :param:`batchSize` rows.
+
+        :param AbstractSet[int] liveGuildIds: The IDs of all guilds that the bot is currently in
+        :param int batchSize: The page size for reading IDs, and the maximum rows per bulk statement (Default 1000)
+        :param bool deleteDeparted: Whether to delete stored guilds missing from :param:`liveGuildIds` (Default True)
+        :return: The number of guilds created, and the number of guilds deleted
+        :rtype: Tuple[int, int]
+        """
+        deleteDeparted = deleteDeparted and bool(liveGuildIds)
+        missingIds = set(liveGuildIds)
+        departedIds: List[int] = []
 
         async with SessionSharer(session, self.sessionMaker) as s:
-            return await s.session.scalar(query)
+            async for guildId in self.iterateIds(batchSize=batchSize, session=s.session):
+                if guildId in missingIds:
+                    missingIds.remove(guildId)
+                elif deleteDeparted:
+                    departedIds.append(guildId)
+
+            created = await self.createMany((BasedGuild(id=guildId) for guildId in missingIds), batchSize=batchSize, session=s.session)
+            deleted = await self.deleteMany(departedIds, batchSize=batchSize, session=s.session) if departedIds else 0
+
+        return created, deleted
+
+
+    async def getAppCommandsHashes(self, guildIds: Iterable[int], batchSize: int = 1000, session: Optional[AsyncSession] = None) -> Dict[int, Optional[str]]:
+        """Get the hashes of the app commands last synced to many guilds, with one `IN` query per :param:`batchSize` IDs.
+        Hashes are always read from the primary database, since they are compared against right before syncing.
+
+        :param Iterable[int] guildIds: The IDs of the guilds to look up
+        :param int batchSize: The maximum number of IDs to give in one query (Default 1000)
+        :return: The hash stored for each guild that has a record, or `None` if the guild's commands have not been synced.
+            Guilds without a record are omitted
+        :rtype: Dict[int, Optional[str]]
+        """
+        ids = list(guildIds)
+        hashes: Dict[int, Optional[str]] = {}
+        async with SessionSharer(session, self.sessionMaker) as s:
+            for start in range(0, len(ids), batchSize):
+                rows = await s.session.execute(
+                    select(BasedGuild.id, BasedGuild.appCommandsHash)
+                    .where(BasedGuild.id.in_(ids[start:start + batchSize]))
+                )
+                hashes.update(rows.all())
+
+        return hashes
+
+
+    async def setAppCommandsHashes(self, hashes: Mapping[int, str], session: Optional[AsyncSession] = None):
+        """Record the hashes of the app commands just synced to many guilds, in one bulk update.
+        Guilds without a record are ignored.
+
+        :param Mapping[int, str] hashes: The hash of each guild's synced commands
+        """
+        if not hashes: return
+        guildIds = set((await self.getAppCommandsHashes(hashes, session=session)).keys())
+        if not guildIds: return
+
+        async with SessionSharer(session, self.sessionMaker) as s:
+            await s.session.execute(update(BasedGuild), [{"id": guildId, "appCommandsHash": hashes[guildId]} for guildId in guildIds])
+
+        self.markWritten(guildIds)
@@ -0,0 +1,234 @@
+from abc import ABC, abstractmethod
+import asyncio
+from datetime import timedelta
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union, cast
+import uuid
+
+from sqlalchemy import Boolean, Column, Float, Integer, MetaData, String, Table, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateTable
+
+from .. import lib
+from ..lib.sql import createEngine
+
+InvalidationCallback = Callable[[int, bool], Any]
+
+
+class InvalidationBus(ABC):
+    """Broadcasts the IDs of database records that have been written, so that cached copies of them can be evicted.
+    Invalidations are identified by the record's table name and ID.
+
+    Subscribers are called synchronously with the ID of each invalidated record in their table, and whether the record
+    was deleted, so should be cheap (e.g `dict.pop`). Subscribers are called for invalidations published by this process,
+    as well as those published by other processes if the bus supports it.
+    """
+    def __init__(self) -> None:
+        self._subscribers: Dict[str, List[InvalidationCallback]] = {}
+
+
+    def subscribe(self, table: str, callback: InvalidationCallback):
+        """Call `callback` with the ID of every invalidated record in `table`, and whether the record was deleted.
+
+        :param str table: The name of the table whose invalidations to receive
+        :param InvalidationCallback callback: The function to call with each invalidated record ID and whether it was deleted
+        """
+        self._subscribers.setdefault(table, []).append(callback)
+
+
+    def unsubscribe(self, table: str, callback: InvalidationCallback):
+        """Stop calling `callback` with invalidations for `table`.
+
+        :param str table: The name of the table whose invalidations `callback` was receiving
+        :param InvalidationCallback callback: The function to unsubscribe
+        :raises ValueError: If `callback` is not subscribed to `table`
+        """
+        self._subscribers.get(table, []).remove(callback)
+
+
+    def _dispatch(self, table: str, recordIds: Iterable[int], deleted: bool = False):
+        """Call the subscribers for `table` with each of `recordIds`.
+        """
+        callbacks = self._subscribers.get(table)
+        if not callbacks: return
+
+        for recordId in recordIds:
+            for callback in callbacks:
+                callback(recordId, deleted)
+
+
+    @abstractmethod
+    def publish(self, table: str, recordIds: Iterable[int], deleted: bool = False):
+        """Invalidate the records in `table` with the given IDs. Subscribers in this process are called immediately,
+        subscribers in other processes are called as soon as the bus allows. This method does not block.
+
+        :param str table: The name of the table containing the written records
+        :param Iterable[int] recordIds: The IDs of the written records
+        :param bool deleted: Whether the records were deleted, rather than created or updated (Default False)
+        """
+        ...
+
+
+    async def start(self):
+        """Start sharing invalidations with other processes, if the bus supports it.
+        """
+        pass
+
+
+    async def stop(self):
+        """Stop sharing invalidations with other processes, sharing any that have not been sent yet.
+        """
+        pass
+
+
+class InMemoryInvalidationBus(InvalidationBus):
+    """An invalidation bus for single-process deployments. Invalidations are only dispatched within this process.
+    """
+    def publish(self, table: str, recordIds: Iterable[int], deleted: bool = False):
+        self._dispatch(table, recordIds, deleted)
+
+
+_invalidations = Table(
+    "invalidation", MetaData(),
+    Column("seq", Integer, primary_key=True, autoincrement=True),
+    Column("origin", String(32), nullable=False),
+    Column("tableName", String(64), nullable=False),
+    Column("recordId", Integer, nullable=False),
+    Column("published", Float, nullable=False),
+    Column("deleted", Boolean, nullable=False),
+    sqlite_autoincrement=True
+)
+
+
+class SQLiteInvalidationBus(InvalidationBus):
+    """An invalidation bus for sharing invalidations between processes on the same machine, through a SQLite database file.
+    Published invalidations are dispatched in this process immediately, and written to the database in the background.
+    Every process polls the database for invalidations published by other processes every `pollInterval`,
+    so invalidations reach other processes after at most about `pollInterval`.
+
+    Invalidations are deleted from the database after `retention`. A process that is unable to poll for longer than
+    this may miss invalidations, so `retention` should be much longer than `pollInterval`.
+    """
+    def __init__(self, path: str, pollInterval: timedelta, retention: timedelta = timedelta(minutes=1),
+                    sqlitePragmas: Optional[Dict[str, Union[str, int]]] = None):
+        """
+        :param str path: The path to the SQLite database file to share invalidations through. It is created if it does not exist.
+        :param timedelta pollInterval: How often to check for invalidations from other processes
+        :param timedelta retention: How long to keep invalidations in the database for (Default 1 minute)
+        :param sqlitePragmas: Pragmas to set on the database connection (Default None)
+        :type sqlitePragmas: Optional[Dict[str, Union[str, int]]]
+        """
+        super().__init__()
+        self.path = path
+        self.engine: AsyncEngine = createEngine(f"sqlite+aiosqlite:///{path}", sqlitePragmas=sqlitePragmas)
+        self.pollInterval = pollInterval.total_seconds()
+        self.retention = retention.total_seconds()
+        # Identifies the invalidations published by this bus, so that they are not dispatched twice
+        self.origin = uuid.uuid4().hex
+        self._pending: List[Dict[str, Any]] = []
+        # Created on start, to bind it to the running event loop
+        self._pendingEvent: Optional[asyncio.Event] = None
+        self._lastSeq = 0
+        self._lastPruned = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+
+    def publish(self, table: str, recordIds: Iterable[int], deleted: bool = False):
+        published = time.time()
+        recordIds = tuple(recordIds)
+        self._dispatch(table, recordIds, deleted)
+        self._pending.extend({"origin": self.origin, "tableName": table, "recordId": recordId, "published": published, "deleted": deleted}
+                                for recordId in recordIds)
+        if self._pendingEvent is not None:
+            self._pendingEvent.set()
+
+
+    async def start(self):
+        if self._task is not None: return
+
+        if directory := os.path.dirname(self.path):
+            os.makedirs(directory, exist_ok=True)
+
+        async with self.engine.begin() as connection:
+            # Other processes may be creating the table at the same time
+            await connection.execute(CreateTable(_invalidations, if_not_exists=True))
+            # Only invalidations published from now on are relevant, since this process has nothing cached yet
+            self._lastSeq = (await connection.scalar(select(func.max(_invalidations.c.seq)))) or 0
+
+        self._pendingEvent = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+
+    async def stop(self):
+        if self._task is None: return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        await self._flush()
+        await self.engine.dispose()
+
+
+    async def _run(self):
+        """Write pending invalidations and read other processes' invalidations, until cancelled.
+        Pending invalidations wake the loop early, so that they are shared without waiting for the next poll.
+        """
+        pendingEvent = cast(asyncio.Event, self._pendingEvent)
+        while True:
+            # Not wait_for, which can swallow the cancellation from `stop` if the event is set at the same time
+            waiter = asyncio.ensure_future(pendingEvent.wait())
+            try:
+                await asyncio.wait((waiter,), timeout=self.pollInterval)
+            finally:
+                waiter.cancel()
+
+            try:
+                await self._flush()
+                await self._poll()
+            except Exception as e:
+                lib.discordUtil.logException(cast(asyncio.Task, asyncio.current_task()), e,
+                                                className=type(self).__name__, funcName="_run")
+                await asyncio.sleep(self.pollInterval)
+
+
+    async def _flush(self):
+        """Write all pending invalidations to the database.
+        """
+        if self._pendingEvent is not None:
+            self._pendingEvent.clear()
+        if not self._pending: return
+
+        pending, self._pending = self._pending, []
+        try:
+            async with self.engine.begin() as connection:
+                await connection.execute(insert(_invalidations), pending)
+        except Exception:
+            self._pending[:0] = pending
+            raise
+
+
+    async def _poll(self):
+        """Dispatch the invalidations that other processes have published since the last poll, and delete expired invalidations.
+        """
+        now = time.time()
+        async with self.engine.begin() as connection:
+            rows: List[Tuple[int, str, str, int, bool]] = (await connection.execute(
+                select(_invalidations.c.seq, _invalidations.c.origin, _invalidations.c.tableName, _invalidations.c.recordId,
+                        _invalidations.c.deleted)
+                .where(_invalidations.c.seq > self._lastSeq)
+                .order_by(_invalidations.c.seq)
+            )).all() # type: ignore[reportGeneralTypeIssues]
+
+            if now - self._lastPruned >= self.retention:
+                await connection.execute(delete(_invalidations).where(_invalidations.c.published < now - self.retention))
+                self._lastPruned = now
+
+        for seq, origin, table, recordId, deleted in rows:
+            self._lastSeq = seq
+            if origin != self.origin:
+                self._dispatch(table, (recordId,), deleted)
@@ -1,16 +1,122 @@
-from typing import Optional, Tuple, Type
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, Type
+import weakref
 
 from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine
 from sqlalchemy.sql._typing import _ColumnsClauseArgument
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, Select, bindparam, event, select
 
-from .snowflakeDb import SnowflakeDB
+from .snowflakeDb import SnowflakeDB, defaultReplicaMaxLag
+from .invalidation import InvalidationBus
 from ..lib.sql import SessionSharer
 from ..reactionMenus import reactionMenu
 
+# All ReactionMenuDBs, so that menus inserted through any session can be added to their active menu IDs
+_reactionMenuDBs: "weakref.WeakSet[ReactionMenuDB]" = weakref.WeakSet()
+
+
+@event.listens_for(reactionMenu.DatabaseReactionMenu, "after_insert", propagate=True)
+def _menuInserted(mapper: Any, connection: Any, menu: reactionMenu.DatabaseReactionMenu):
+    for db in _reactionMenuDBs:
+        db.markActive(menu.id)
+
+
 class ReactionMenuDB(SnowflakeDB[reactionMenu.DatabaseReactionMenu]):
-    def __init__(self, engine: AsyncEngine):
-        super().__init__(reactionMenu.DatabaseReactionMenu, engine)
+    """A `SnowflakeDB` for reaction menus, which keeps the IDs of all stored menus in memory.
+    This allows events for messages which are not menus, e.g reactions, to be ignored without any database I/O.
+
+    The active menu IDs are loaded by `loadActiveIds`. Menus created through the ORM or this DB are added as they are
+    inserted, and menus written by other processes are added as their invalidations are received. Menus are removed
+    when they are deleted through this DB, or when their deletion by another process is received. Menus deleted by other
+    means are not removed, so `isActive` may give false positives, but never false negatives.
+
+    A `ReactionMenuDB` that is being replaced should be closed with `close`, so that it stops receiving updates.
+    """
+    def __init__(self, engine: AsyncEngine, readEngine: Optional[AsyncEngine] = None, replicaMaxLag: timedelta = defaultReplicaMaxLag,
+                    invalidationBus: Optional[InvalidationBus] = None):
+        super().__init__(reactionMenu.DatabaseReactionMenu, engine, readEngine=readEngine, replicaMaxLag=replicaMaxLag, invalidationBus=invalidationBus)
+        self._activeIds: Set[int] = set()
+        self._activeIdsLoaded = False
+        _reactionMenuDBs.add(self)
+        if invalidationBus is not None:
+            invalidationBus.subscribe(self.tableName, self._invalidated)
+
+        self._menuTypeStatement = select(reactionMenu.DatabaseReactionMenu.menuType) \
+                                    .where(reactionMenu.DatabaseReactionMenu.id == bindparam("recordId"))
+        self._typedGetStatements: Dict[Type[reactionMenu.DatabaseReactionMenu], Select] = {}
+
+
+    async def loadActiveIds(self, batchSize: int = 1000) -> int:
+        """Load the IDs of all stored menus into memory, enabling `isActive`.
+
+        :param int batchSize: The number of IDs to read per page (Default 1000)
+        :return: The number of active menus loaded
+        :rtype: int
+        """
+        loaded: Set[int] = set()
+        async for menuId in self.iterateIds(batchSize=batchSize):
+            loaded.add(menuId)
+
+        # Menus that were inserted during loading are kept
+        self._activeIds |= loaded
+        self._activeIdsLoaded = True
+        return len(loaded)
+
+
+    def isActive(self, menuId: int) -> bool:
+        """Decide whether a menu may be stored with the given ID, without any I/O.
+        If this returns `False`, then no menu is stored with the ID. If this returns `True`, then a menu probably exists,
+        but the menu must still be fetched to be sure. Before `loadActiveIds` has been called, this always returns `True`.
+
+        :param int menuId: integer discord ID of the menu message
+        :return: `False` if no menu exists with ID :param:`menuId`, `True` otherwise
+        :rtype: bool
+        """
+        return not self._activeIdsLoaded or menuId in self._activeIds
+
+
+    def markActive(self, menuId: int):
+        """Record that a menu may be stored with the given ID. This is done automatically for menus that are inserted
+        through the ORM, and for all records written through this DB.
+
+        :param int menuId: integer discord ID of the menu message
+        """
+        self._activeIds.add(menuId)
+
+
+    def _invalidated(self, menuId: int, deleted: bool):
+        """Track menus written by other processes, from the invalidation bus.
+        """
+        if deleted:
+            self._activeIds.discard(menuId)
+        else:
+            self._activeIds.add(menuId)
+
+
+    def close(self):
+        """Stop tracking menus inserted through the ORM, or written by other processes.
+        """
+        _reactionMenuDBs.discard(self)
+        if self.invalidationBus is not None:
+            self.invalidationBus.unsubscribe(self.tableName, self._invalidated)
+
+
+    def markWritten(self, recordIds: Iterable[int], deleted: bool = False):
+        recordIds = tuple(recordIds)
+        if deleted:
+            self._activeIds.difference_update(recordIds)
+        else:
+            self._activeIds.update(recordIds)
+        super().markWritten(recordIds, deleted=deleted)
+
+
+    def _typedGetStatement(self, menuClass: Type[reactionMenu.DatabaseReactionMenu]) -> Select:
+        """Get the cached statement that selects the menu of type :param:`menuClass` with the bound ID `recordId`.
+        """
+        if (statement := self._typedGetStatements.get(menuClass)) is None:
+            statement = select(menuClass).where(menuClass.id == bindparam("recordId"))
+            self._typedGetStatements[menuClass] = statement
+        return statement
 
 
     async def getMenuClassForRecord(self, recordId: int, session: Optional[AsyncSession] = None) -> Optional[Type[reactionMenu.DatabaseReactionMenu]]:
@@ -20,10 +126,8 @@ class ReactionMenuDB(SnowflakeDB[reactionMenu.DatabaseReactionMenu]):
         :return: The class for the stored record, or None if no record is found with the id
         :rtype: Optional[Type[DatabaseReactionMenu]]
         """
-        recordTypeQuery = select(reactionMenu.DatabaseReactionMenu).where(reactionMenu.DatabaseReactionMenu.id == recordId).with_only_columns(reactionMenu.DatabaseReactionMenu.menuType)
-
-        async with SessionSharer(session, self.sessionMaker) as s:
-            recordType = await s.session.scalar(recordTypeQuery)
+        async with SessionSharer(session, self._readSessionMaker(recordId)) as s:
+            recordType = await s.session.scalar(self._menuTypeStatement, {"recordId": recordId})
 
         if recordType is None: return None
         return reactionMenu.databaseMenuClassFromName(recordType)
@@ -37,16 +141,16 @@ class ReactionMenuDB(SnowflakeDB[reactionMenu.DatabaseReactionMenu]):
         :return: The stored record, or None if no record is found with the id
         :rtype: Optional[DatabaseReactionMenu]
         """
-        async with SessionSharer(session, self.sessionMaker) as s:
+        async with SessionSharer(session, self._readSessionMaker(recordId)) as s:
             menuClass = await self.getMenuClassForRecord(recordId, session=s.session)
             if menuClass is None: return None
 
-            query = select(menuClass).where(menuClass.id == recordId)
+            query = self._typedGetStatement(menuClass)
 
             if withOnlyFields:
                 query = query.with_only_columns(withOnlyFields)
 
-            result = await s.session.execute(query)
+            result = await s.session.execute(query, {"recordId": recordId})
             row = result.one_or_none()
             return None if row is None else row.t[0]
     
@@ -64,3 +168,86 @@ class ReactionMenuDB(SnowflakeDB[reactionMenu.DatabaseReactionMenu]):
         
             row = result.one()
             return row[0]
+
+
+    async def getMany(self, recordIds: Iterable[int], batchSize: int = 1000, session: Optional[AsyncSession] = None) -> List[reactionMenu.DatabaseReactionMenu]:
+        """Get all stored menus with the given IDs. IDs that are not menus are ignored, and IDs that are not active
+        menus are filtered out without any I/O. Menus are read with one `IN` query per :param:`batchSize` IDs,
+        plus one query per menu class, so the number of queries does not depend on the number of menus.
+
+        :param Iterable[int] recordIds: integer discord IDs for the DatabaseReactionMenus to get
+        :param int batchSize: The maximum number of IDs to give in one query (Default 1000)
+        :return: The stored menus, in ascending ID order
+        :rtype: List[DatabaseReactionMenu]
+        """
+        ids = [recordId for recordId in recordIds if self.isActive(recordId)]
+        if not ids: return []
+
+        idColumn = reactionMenu.DatabaseReactionMenu.id
+        menus: List[reactionMenu.DatabaseReactionMenu] = []
+        async with SessionSharer(session, self.sessionMaker) as s:
+            for start in range(0, len(ids), batchSize):
+                page = (await s.session.execute(
+                    select(idColumn, reactionMenu.DatabaseReactionMenu.menuType)
+                    .where(idColumn.in_(ids[start:start + batchSize]))
+                )).all()
+                menus.extend(await self._getTyped(page, s.session))
+
+        menus.sort(key=lambda m: m.id)
+        return menus
+
+
+    async def _getTyped(self, records: Iterable[Tuple[int, str]], session: AsyncSession) -> List[reactionMenu.DatabaseReactionMenu]:
+        """Load many menus whose types are already known, with one query per menu class.
+
+        :param records: The `(id, menuType)` of each menu to load
+        :type records: Iterable[Tuple[int, str]]
+        :return: The loaded menus, in ascending ID order
+        :rtype: List[DatabaseReactionMenu]
+        """
+        idsByType: Dict[str, List[int]] = {}
+        for recordId, menuType in records:
+            idsByType.setdefault(menuType, []).append(recordId)
+
+        menus: List[reactionMenu.DatabaseReactionMenu] = []
+        for menuType, ids in idsByType.items():
+            menuClass = reactionMenu.databaseMenuClassFromName(menuType)
+            menus.extend(await session.scalars(select(menuClass).where(menuClass.id.in_(ids))))
+
+        menus.sort(key=lambda m: m.id)
+        return menus
+
+
+    async def iterate(self, batchSize: int = 1000, where: Optional[ColumnElement[bool]] = None,
+                        session: Optional[AsyncSession] = None) -> AsyncIterator[reactionMenu.DatabaseReactionMenu]:
+        """Iterate over every stored menu, in ascending ID order, in constant memory.
+        Menus are read in pages of :param:`batchSize` using keyset pagination on ID. Each menu is deserialized into
+        the class named in its `menuType` field, with one query per menu class in the page.
+        Menus may safely be deleted or updated during iteration.
+
+        Unlike `SnowflakeDB.iterate`, each page of IDs is read in full rather than streamed, since the menus are then loaded
+        through the same session. No query is left open between pages, so the session may also be used to write while iterating.
+        All pages are read through one session, which is never committed. If no :param:`session` is given, a new session is
+        used for the whole iteration, and closed once iteration ends.
+
+        :param int batchSize: The number of menus to read per page (Default 1000)
+        :param where: A filter to apply to the iterated menus (Default None)
+        :type where: Optional[ColumnElement[bool]]
+        :return: An async iterator over all matching menus
+        :rtype: AsyncIterator[DatabaseReactionMenu]
+        """
+        idColumn = reactionMenu.DatabaseReactionMenu.id
+        query = select(idColumn, reactionMenu.DatabaseReactionMenu.menuType).order_by(idColumn).limit(batchSize)
+        if where is not None:
+            query = query.where(where)
+
+        lastId: Optional[int] = None
+        async with SessionSharer(session, self.sessionMaker, commit=False) as s:
+            while True:
+                page = (await s.session.execute(query if lastId is None else query.where(idColumn > lastId))).all()
+                for menu in await self._getTyped(page, s.session):
+                    yield menu
+
+                if len(page) < batchSize:
+                    return
+                lastId = page[-1].id
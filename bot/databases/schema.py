@@ -0,0 +1,18 @@
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..users import basedUser, basedGuild
+from ..reactionMenus import reactionMenu
+
+modelBases = (basedUser.Base, basedGuild.Base, reactionMenu.Base)
+
+
+async def createTables(engine: AsyncEngine):
+    """Create any of the bot's tables that do not yet exist in the database, from the declarative models.
+    This is intended for bootstrapping SQLite databases. Other databases should be managed with the
+    liquibase changelogs in `db/changelogs`, which this does not record.
+
+    :param AsyncEngine engine: The engine for the database in which to create the tables
+    """
+    async with engine.begin() as connection:
+        for base in modelBases:
+            await connection.run_sync(base.metadata.create_all)
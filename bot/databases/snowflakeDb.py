@@ -1,18 +1,26 @@
 from __future__ import annotations
 
-from typing import Any, Generic, Optional, Tuple, Type, TypeVar
+from collections import OrderedDict
+from datetime import timedelta
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Generic, Iterable, List, Optional, Tuple, Type, TypeVar
 
 from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession, AsyncEngine
-from sqlalchemy import select, exists, delete, update
+from sqlalchemy import ColumnElement, Select, Update, bindparam, lambda_stmt, select, exists, delete, insert, update, inspect
 from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.sql._typing import _ColumnsClauseArgument
 
 from ..baseClasses.dbSnowflake import DbSnowflake
-from ..lib.sql import count, SessionSharer
+from ..lib.sql import approximateCount, count, dialectInsert, isMySQL, SessionSharer
+from .invalidation import InvalidationBus
 
 TRecord = TypeVar("TRecord", bound=DbSnowflake)
 TField = TypeVar("TField", bound=Any)
 
+defaultReplicaMaxLag = timedelta(seconds=5)
+
 
 def idField(identifier: Type[DbSnowflake]) -> InstrumentedAttribute[int]:
     """This method exists to isolate the `type: ignore` required for accessing the record's `~TRecord.id`:attr:.
@@ -22,12 +30,122 @@ def idField(identifier: Type[DbSnowflake]) -> InstrumentedAttribute[int]:
 
 class SnowflakeDB(Generic[TRecord]):
     """Helper for performing CRUD operations on the records database.
+
+    Where the engine's dialect supports it (MySQL, MariaDB, PostgreSQL, SQLite), `upsert` is performed with a native
+    single-statement upsert, and `getOrCreate` with a conflict-ignoring insert, which are race-free under concurrency. Other dialects, and record types
+    with relationships (which must be cascaded by the ORM), fall back onto the ORM implementations.
+
+    The statements for the hot single-record operations (`exists`, `get`, `update`, `delete`) are built once per
+    instance and executed with bound parameters, so that each call skips statement construction and cache key generation.
+
+    If a read replica engine is given, reads that are not given a session (`get`, `exists`, `countAllDocuments`)
+    are served by the replica. Reads given a session use that session, so they read their own writes.
+    Records written through this `SnowflakeDB` are read from the primary until :param:`replicaMaxLag` has passed,
+    and whole-table reads are only served by the replica when no records have been written in that time.
+
+    If an invalidation bus is given, the IDs of records written through this `SnowflakeDB` are published to it,
+    so that caches of the records in this and other processes can evict them.
     """
     sessionMaker: async_sessionmaker[AsyncSession]
+    readSessionMaker: async_sessionmaker[AsyncSession]
     
-    def __init__(self, recordType: Type[TRecord], engine: AsyncEngine):
+    def __init__(self, recordType: Type[TRecord], engine: AsyncEngine, readEngine: Optional[AsyncEngine] = None,
+                    replicaMaxLag: timedelta = defaultReplicaMaxLag, invalidationBus: Optional[InvalidationBus] = None):
+        """
+        :param Type[TRecord] recordType: The type of record stored in the database
+        :param AsyncEngine engine: The engine for the primary database
+        :param readEngine: An engine for a read replica of the primary database (Default None)
+        :type readEngine: Optional[AsyncEngine]
+        :param timedelta replicaMaxLag: How long after a record is written to read it from the primary (Default 5 seconds)
+        :param invalidationBus: The bus to publish the IDs of written records to (Default None)
+        :type invalidationBus: Optional[InvalidationBus]
+        """
         self.sessionMaker = async_sessionmaker(engine)
+        self.readSessionMaker = self.sessionMaker if readEngine is None else async_sessionmaker(readEngine)
+        self._replicaMaxLag = replicaMaxLag.total_seconds()
+        # The IDs of recently written records, mapped to the `time.monotonic()` after which they can be read from the replica.
+        # Entries are moved to the end when rewritten, so deadlines are in ascending order.
+        self._recentWrites: OrderedDict[int, float] = OrderedDict()
+        self.invalidationBus = invalidationBus
+        self.tableName: str = recordType.__tablename__ # type: ignore[reportGeneralTypeIssues]
         self._recordType = recordType
+        self._dialect = engine.dialect
+        self._nativeUpsert = dialectInsert(self._dialect, recordType) is not None \
+                                and not inspect(recordType).relationships
+
+        idColumn = idField(recordType)
+        self._existsStatement = select(exists(1).where(idColumn == bindparam("recordId")))
+        self._getStatement = select(recordType).where(idColumn == bindparam("recordId"))
+        self._updateStatements: Dict[Tuple[str, ...], Update] = {}
+
+
+    def _updateStatement(self, fields: Tuple[str, ...]) -> Update:
+        """Get the cached statement that updates :param:`fields` on the record with the bound ID `recordId`.
+        Each field's new value is bound as `value_<field name>`.
+        The session is not synchronized by the statement, this must be done by the caller.
+
+        :param Tuple[str, ...] fields: The names of the fields to update
+        :return: An update statement for :param:`fields`
+        :rtype: Update
+        """
+        if (statement := self._updateStatements.get(fields)) is None:
+            statement = update(self._recordType) \
+                        .where(idField(self._recordType) == bindparam("recordId")) \
+                        .values({field: bindparam(f"value_{field}") for field in fields}) \
+                        .execution_options(synchronize_session=False)
+            self._updateStatements[fields] = statement
+        return statement
+
+
+    def markWritten(self, recordIds: Iterable[int], deleted: bool = False):
+        """Record that the records with the given IDs have been written to the primary database, so that they are
+        read from the primary until the read replica has caught up, and publish their invalidation.
+        Writes through this `SnowflakeDB` are marked automatically, but records written by other means
+        (e.g `session.add`) should be marked with this method.
+
+        :param Iterable[int] recordIds: integer discord IDs of the written records
+        :param bool deleted: Whether the records were deleted, rather than created or updated (Default False)
+        """
+        recordIds = tuple(recordIds)
+
+        if self.readSessionMaker is not self.sessionMaker:
+            deadline = time.monotonic() + self._replicaMaxLag
+            for recordId in recordIds:
+                self._recentWrites[recordId] = deadline
+                self._recentWrites.move_to_end(recordId)
+
+        if self.invalidationBus is not None:
+            self.invalidationBus.publish(self.tableName, recordIds, deleted=deleted)
+
+
+    def _readSessionMaker(self, recordId: Optional[int] = None) -> async_sessionmaker[AsyncSession]:
+        """Choose where to read from: the read replica, unless the record with :param:`recordId` has been written recently.
+        Reads of the whole table (where :param:`recordId` is `None`) use the replica only if no records have been written recently.
+
+        :param Optional[int] recordId: integer discord ID of the record to read, or `None` for the whole table (Default None)
+        :return: The session maker to use for the read
+        :rtype: async_sessionmaker[AsyncSession]
+        """
+        if self.readSessionMaker is self.sessionMaker: return self.sessionMaker
+
+        now = time.monotonic()
+        while self._recentWrites and next(iter(self._recentWrites.values())) <= now:
+            self._recentWrites.popitem(last=False)
+
+        recentlyWritten = bool(self._recentWrites) if recordId is None else recordId in self._recentWrites
+        return self.sessionMaker if recentlyWritten else self.readSessionMaker
+
+
+    def _recordValues(self, record: TRecord) -> Dict[str, Any]:
+        """Get the column values that have been set on :param:`record`, by attribute name.
+        Unset attributes are excluded, so that upserting does not overwrite stored values with defaults.
+
+        :param TRecord record: The record whose values to read
+        :return: A mapping of attribute names to values, for all column attributes set on :param:`record`
+        :rtype: Dict[str, Any]
+        """
+        state = inspect(record)
+        return {attr.key: state.dict[attr.key] for attr in state.mapper.column_attrs if attr.key in state.dict}
 
 
     async def exists(self, recordId: int, session: Optional[AsyncSession] = None) -> bool:
@@ -37,26 +155,30 @@ class SnowflakeDB(Generic[TRecord]):
         :return: True if recordId corresponds to a record in the database, false if no record is found with the id
         :rtype: bool
         """
-        query = select(exists(1).where(idField(self._recordType) == recordId))
-        
-        async with SessionSharer(session, self.sessionMaker) as s:
-            result = await s.session.scalar(query)
+        async with SessionSharer(session, self._readSessionMaker(recordId)) as s:
+            result = await s.session.scalar(self._existsStatement, {"recordId": recordId})
         
         return result or False
     
 
-    async def countAllDocuments(self, session: Optional[AsyncSession] = None) -> int:
+    async def countAllDocuments(self, session: Optional[AsyncSession] = None, approximate: bool = False) -> int:
         """Count the number of records in the database.
+        If :param:`approximate` is `True`, the count is estimated from table statistics where the dialect supports it,
+        which avoids a full table scan on large tables. Otherwise, and on other dialects, the records are counted exactly.
 
+        :param bool approximate: Whether to estimate the count from table statistics (Default False)
         :return: The number of stored records.
         :rtype: int
         """
-        query = count(self._recordType)
-        
-        async with SessionSharer(session, self.sessionMaker) as s:
-            result = await s.session.scalar(query)
+        async with SessionSharer(session, self._readSessionMaker()) as s:
+            if approximate and (estimateQuery := approximateCount(self._dialect, self._recordType)) is not None:
+                estimate = await s.session.scalar(estimateQuery)
+                if estimate is not None and estimate >= 0:
+                    return int(estimate)
+
+            result = await s.session.scalar(count(self._recordType))
         
-        return result or False
+        return result or 0
 
 
     async def create(self, record: TRecord, session: Optional[AsyncSession] = None):
@@ -65,10 +187,41 @@ class SnowflakeDB(Generic[TRecord]):
         :param TRecord record: The record to create
         :raises IntegrityError: If a :class:`TRecord` already exists in the database with the specified :param:`~record.id`
         """
+        recordId = record.id
         async with SessionSharer(session, self.sessionMaker) as s:
             s.session.add(record)
+
+        self.markWritten((recordId,))
     
 
+    async def createMany(self, records: Iterable[TRecord], batchSize: int = 1000, session: Optional[AsyncSession] = None) -> int:
+        """Insert many new records with bulk `INSERT` statements of up to :param:`batchSize` rows each.
+        Unlike `create`, the records are not added to the session.
+
+        :param Iterable[TRecord] records: The records to create
+        :param int batchSize: The maximum number of rows to insert per statement (Default 1000)
+        :raises IntegrityError: If any of the records already exist in the database
+        :return: The number of records created
+        :rtype: int
+        """
+        created = 0
+        async with SessionSharer(session, self.sessionMaker) as s:
+            batch: List[Dict[str, Any]] = []
+            for record in records:
+                batch.append(self._recordValues(record))
+                if len(batch) == batchSize:
+                    await s.session.execute(insert(self._recordType), batch)
+                    created += len(batch)
+                    self.markWritten(values["id"] for values in batch)
+                    batch = []
+            if batch:
+                await s.session.execute(insert(self._recordType), batch)
+                created += len(batch)
+                self.markWritten(values["id"] for values in batch)
+
+        return created
+
+
     async def get(self, recordId: int, session: Optional[AsyncSession] = None, withOnlyFields: Optional[Tuple[_ColumnsClauseArgument[TRecord]]] = None) -> Optional[TRecord]:
         """Get the record with the given :param:`recordId`. Returns ``None`` if it does not exist.
 
@@ -76,24 +229,98 @@ class SnowflakeDB(Generic[TRecord]):
         :return: The stored record, or ``None`` if no record is found with the :param:`recordId`
         :rtype: Optional[TRecord]
         """
-        query = select(self._recordType).where(idField(self._recordType) == recordId)
+        query = self._getStatement
         
         if withOnlyFields:
             query = query.with_only_columns(withOnlyFields)
 
-        async with SessionSharer(session, self.sessionMaker) as s:
-            result = await s.session.execute(query)
+        async with SessionSharer(session, self._readSessionMaker(recordId)) as s:
+            result = await s.session.execute(query, {"recordId": recordId})
             row = result.one_or_none()
             return None if row is None else row.t[0]
     
 
+    async def iterate(self, batchSize: int = 1000, where: Optional[ColumnElement[bool]] = None,
+                        session: Optional[AsyncSession] = None) -> AsyncIterator[TRecord]:
+        """Iterate over every stored record, in ascending `~TRecord.id`:attr: order, in constant memory.
+        Records are read in pages of :param:`batchSize` using keyset pagination on `~TRecord.id`:attr:, and each page
+        is streamed from the server. Records may safely be deleted or updated during iteration, through another session.
+
+        All pages are read through one session, which is never committed, so a shared session's pending writes are left
+        for the caller to commit. Each page is streamed over the session, so while iterating, do not use it for other queries.
+        If no :param:`session` is given, a new session is used for the whole iteration, and closed once iteration ends.
+        Yielded records are detached at that point: their loaded columns stay readable, but relationships cannot be lazy loaded.
+
+        ```py
+        async for menu in client.databaseReactionMenusDB.iterate(where=DatabaseReactionMenu.expiryTime <= now):
+            ...
+        ```
+
+        :param int batchSize: The number of records to read per page (Default 1000)
+        :param where: A filter to apply to the iterated records (Default None)
+        :type where: Optional[ColumnElement[bool]]
+        :return: An async iterator over all matching records
+        :rtype: AsyncIterator[TRecord]
+        """
+        async for record in self._streamKeyset(select(self._recordType), lambda record: record.id, batchSize, where, session):
+            yield record
+
+
+    async def iterateIds(self, batchSize: int = 1000, where: Optional[ColumnElement[bool]] = None,
+                            session: Optional[AsyncSession] = None) -> AsyncIterator[int]:
+        """Iterate over the `~TRecord.id`:attr: of every stored record, in ascending order, in constant memory.
+        This behaves as `iterate`, but only the ID column is read.
+
+        :param int batchSize: The number of IDs to read per page (Default 1000)
+        :param where: A filter to apply to the iterated records (Default None)
+        :type where: Optional[ColumnElement[bool]]
+        :return: An async iterator over the IDs of all matching records
+        :rtype: AsyncIterator[int]
+        """
+        async for recordId in self._streamKeyset(select(idField(self._recordType)), lambda recordId: recordId, batchSize, where, session):
+            yield recordId
+
+
+    async def _streamKeyset(self, query: Select, key: Callable[[Any], int], batchSize: int,
+                            where: Optional[ColumnElement[bool]], session: Optional[AsyncSession]) -> AsyncIterator[Any]:
+        """Stream the scalar results of :param:`query` in pages of :param:`batchSize`, using keyset pagination on
+        `~TRecord.id`:attr:. :param:`key` must extract the ID from each result.
+        """
+        idColumn = idField(self._recordType)
+        query = query.order_by(idColumn).limit(batchSize).execution_options(yield_per=batchSize)
+        if where is not None:
+            query = query.where(where)
+
+        lastId: Optional[int] = None
+        async with SessionSharer(session, self.sessionMaker, commit=False) as s:
+            while True:
+                pageSize = 0
+                result = await s.session.stream_scalars(query if lastId is None else query.where(idColumn > lastId))
+                async for item in result:
+                    pageSize += 1
+                    lastId = key(item)
+                    yield item
+
+                if pageSize < batchSize:
+                    return
+
+
     async def getOrCreate(self, record: TRecord, session: Optional[AsyncSession] = None) -> TRecord:
         """Get the record with the given :param:`~recordId.id`, or create it if it does not exist.
+        On supporting dialects, this is race-free, and does not lock the stored record if it already exists.
+        The record is only marked as written if it was created.
 
         :param TRecord record: The :class:`TRecord` to get/create
         :return: The stored record
         :rtype: Optional[TRecord]
         """
+        if self._nativeUpsert:
+            recordId = record.id
+            stored, inserted = await self._nativeGetOrCreate(record, session=session)
+            if inserted:
+                self.markWritten((recordId,))
+            return stored
+
         query = select(self._recordType).where(idField(self._recordType) == record.id)
 
         async with SessionSharer(session, self.sessionMaker) as s:
@@ -105,6 +332,43 @@ class SnowflakeDB(Generic[TRecord]):
             
             await self.create(record, session=s.session)
             return record
+
+
+    async def _nativeGetOrCreate(self, record: TRecord, session: Optional[AsyncSession] = None) -> Tuple[TRecord, bool]:
+        """`getOrCreate` implementation using the dialect's native conflict handling.
+        Where `RETURNING` is supported, the record is inserted with `ON CONFLICT DO NOTHING RETURNING`, and the stored
+        record is only selected if the insert returned nothing. Otherwise, the stored record is selected first, and only
+        if it does not exist is the record inserted, ignoring conflicts (`INSERT IGNORE` on MySQL and MariaDB), and selected again.
+        Neither path performs an update, so the stored record is not write locked.
+
+        :return: The stored record, and whether it was inserted by this call
+        :rtype: Tuple[TRecord, bool]
+        """
+        idColumn = idField(self._recordType)
+        stmt = dialectInsert(self._dialect, self._recordType).values(**self._recordValues(record)) # type: ignore[reportOptionalMemberAccess]
+        mySQL = isMySQL(self._dialect)
+        if mySQL:
+            stmt = stmt.prefix_with("IGNORE")
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[idColumn]) # type: ignore[reportGeneralTypeIssues]
+        getParams = {"recordId": record.id}
+        options = {"populate_existing": True}
+
+        async with SessionSharer(session, self.sessionMaker) as s:
+            if not mySQL and self._dialect.insert_returning:
+                result = await s.session.scalars(stmt.returning(self._recordType), execution_options=options)
+                if (stored := result.one_or_none()) is not None:
+                    return stored, True
+                inserted = False
+            else:
+                # Reading first avoids any locking in the common case that the record already exists
+                stored = (await s.session.scalars(self._getStatement, getParams, execution_options=options)).one_or_none()
+                if stored is not None:
+                    return stored, False
+                inserted = (await s.session.execute(stmt)).rowcount > 0 # type: ignore[reportGeneralTypeIssues]
+
+            result = await s.session.scalars(self._getStatement, getParams, execution_options=options)
+            return result.one(), inserted
         
 
     async def delete(self, recordId: int, session: Optional[AsyncSession] = None):
@@ -112,28 +376,98 @@ class SnowflakeDB(Generic[TRecord]):
 
         :param int recordId: integer discord ID for the :class:`TRecord` to delete
         """
-        query = delete(self._recordType).where(idField(self._recordType) == recordId)
+        idColumn = idField(self._recordType)
+        recordType = self._recordType
+        # A lambda statement, rather than a bound parameter, so that the ORM can still evaluate the criteria
+        # to remove the deleted record from the session
+        query = lambda_stmt(lambda: delete(recordType).where(idColumn == recordId))
 
         async with SessionSharer(session, self.sessionMaker) as s:
             await s.session.execute(query)
 
+        self.markWritten((recordId,), deleted=True)
+
+
+    async def deleteMany(self, recordIds: Iterable[int], batchSize: int = 1000, session: Optional[AsyncSession] = None) -> int:
+        """Delete all records with the given IDs, with bulk `DELETE ... WHERE id IN (...)` statements of up to
+        :param:`batchSize` IDs each.
+
+        :param Iterable[int] recordIds: integer discord IDs for the :class:`TRecord`s to delete
+        :param int batchSize: The maximum number of IDs to delete per statement (Default 1000)
+        :return: The number of IDs requested for deletion
+        :rtype: int
+        """
+        idColumn = idField(self._recordType)
+        requested = 0
+        async with SessionSharer(session, self.sessionMaker) as s:
+            batch: List[int] = []
+            for recordId in recordIds:
+                batch.append(recordId)
+                if len(batch) == batchSize:
+                    await s.session.execute(delete(self._recordType).where(idColumn.in_(batch)))
+                    requested += len(batch)
+                    self.markWritten(batch, deleted=True)
+                    batch = []
+            if batch:
+                await s.session.execute(delete(self._recordType).where(idColumn.in_(batch)))
+                requested += len(batch)
+                self.markWritten(batch, deleted=True)
+
+        return requested
+
 
     async def update(self, recordId: int, session: Optional[AsyncSession] = None, **values):
         """Update the record with the given :param:`recordId` to have the values specified in :param:`values`.
 
         :param int recordId: integer discord ID for the :class:`TRecord` to update
         """
-        query = update(self._recordType).where(idField(self._recordType) == recordId).values(**values)
+        query = self._updateStatement(tuple(values))
+        params = {f"value_{field}": value for field, value in values.items()}
+        params["recordId"] = recordId
 
         async with SessionSharer(session, self.sessionMaker) as s:
-            await s.session.execute(query)
+            await s.session.execute(query, params)
+
+            # Synchronize any copy of the record that is loaded into the session
+            if (record := s.session.identity_map.get(identity_key(self._recordType, recordId))) is not None:
+                for field, value in values.items():
+                    set_committed_value(record, field, value)
+
+        self.markWritten((recordId,))
 
 
     async def upsert(self, record: TRecord, session: Optional[AsyncSession] = None):
         """Create :param:`record`, or update an existing record with :param:`record.id` to match
         the values specified on :param:`record`.
+        On supporting dialects, this is a single `INSERT ... ON DUPLICATE KEY UPDATE`/`ON CONFLICT DO UPDATE` statement.
 
         :param TRecord record: the :class:`TRecord` values to upsert
         """
+        recordId = record.id
         async with SessionSharer(session, self.sessionMaker) as s:
-            await s.session.merge(record)
\ No newline at end of file
+            if self._nativeUpsert:
+                await s.session.execute(self._nativeUpsertStatement(record))
+            else:
+                await s.session.merge(record)
+
+        self.markWritten((recordId,))
+
+
+    def _nativeUpsertStatement(self, record: TRecord):
+        """Build a native upsert statement for :param:`record`. Only valid when the dialect supports native upserts.
+
+        :param TRecord record: the :class:`TRecord` values to upsert
+        :return: An insert statement that updates all set values of :param:`record` on conflict
+        """
+        values = self._recordValues(record)
+        stmt = dialectInsert(self._dialect, self._recordType).values(**values) # type: ignore[reportOptionalMemberAccess]
+        updateFields = [k for k in values if k != "id"]
+
+        if isMySQL(self._dialect):
+            # ON DUPLICATE KEY UPDATE requires at least one assignment
+            assignments = {k: stmt.inserted[k] for k in updateFields} if updateFields else {"id": idField(self._recordType)} # type: ignore[reportGeneralTypeIssues]
+            return stmt.on_duplicate_key_update(**assignments) # type: ignore[reportGeneralTypeIssues]
+        if not updateFields:
+            return stmt.on_conflict_do_nothing(index_elements=[idField(self._recordType)]) # type: ignore[reportGeneralTypeIssues]
+        return stmt.on_conflict_do_update(index_elements=[idField(self._recordType)], # type: ignore[reportGeneralTypeIssues]
+                                            set_={k: stmt.excluded[k] for k in updateFields}) # type: ignore[reportGeneralTypeIssues]
@@ -1,10 +1,14 @@
 from __future__ import annotations
+from datetime import timedelta
+from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncEngine
 
-from .snowflakeDb import SnowflakeDB
+from .snowflakeDb import SnowflakeDB, defaultReplicaMaxLag
+from .invalidation import InvalidationBus
 from ..users.basedUser import BasedUser
 
 class UserDB(SnowflakeDB[BasedUser]):
-    def __init__(self, engine: AsyncEngine):
-        super().__init__(BasedUser, engine)
+    def __init__(self, engine: AsyncEngine, readEngine: Optional[AsyncEngine] = None, replicaMaxLag: timedelta = defaultReplicaMaxLag,
+                    invalidationBus: Optional[InvalidationBus] = None):
+        super().__init__(BasedUser, engine, readEngine=readEngine, replicaMaxLag=replicaMaxLag, invalidationBus=invalidationBus)
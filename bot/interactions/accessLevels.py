@@ -1,4 +1,5 @@
-from typing import Dict, Optional, Type, TypeVar, Union
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple, Type, TypeVar, Union
 from abc import ABC, abstractmethod
 
 from discord import Interaction, Member, PartialMessageable
@@ -28,8 +29,12 @@ class _AccessLevelBase(ABC):
 
         :return: An integer representing the access level's position in the access level heirarchy
         :rtype: int
+        :raises ValueError: If the access level is not in `cfg.userAccessLevels`
         """
-        return cfg.userAccessLevels.index(cls.name)
+        intLevel = _registry.intLevels.get(cls) # type: ignore[reportGeneralTypeIssues]
+        if intLevel is None:
+            raise ValueError(f"access level '{cls.name}' is not in cfg.userAccessLevels")
+        return intLevel
 
 
 AccessLevelType = Union[Type["AccessLevelAsync"], Type["AccessLevel"]]
@@ -37,6 +42,46 @@ _accessLevels: Dict[str, AccessLevelType] = {}
 _defaultAccessLevel: AccessLevelType = MISSING
 
 
+class AccessLevelRegistry(NamedTuple):
+    """A frozen snapshot of the registered access levels, in the heirarchy order of `cfg.userAccessLevels`.
+
+    :var levels: The access level at each int level, or `None` if no access level is registered with that name
+    :vartype levels: Tuple[Optional[AccessLevelType], ...]
+    :var descending: The registered access levels, from the highest int level to the lowest
+    :vartype descending: Tuple[AccessLevelType, ...]
+    :var intLevels: The int level of each registered access level
+    :vartype intLevels: Mapping[AccessLevelType, int]
+    """
+    levels: Tuple[Optional[AccessLevelType], ...]
+    descending: Tuple[AccessLevelType, ...]
+    intLevels: Mapping[AccessLevelType, int]
+
+
+def _buildRegistry() -> AccessLevelRegistry:
+    """Snapshot the registered access levels in the heirarchy order of `cfg.userAccessLevels`.
+    """
+    levels = tuple(_accessLevels.get(name) for name in cfg.userAccessLevels)
+    return AccessLevelRegistry(
+        levels = levels,
+        descending = tuple(level for level in reversed(levels) if level is not None),
+        intLevels = MappingProxyType({level: intLevel for intLevel, level in enumerate(levels) if level is not None})
+    )
+
+
+# Rebuilt each time an access level is registered. Access levels are registered on import, which happens after
+# `cfg.validateConfig`, so the registry is built against the validated config and is not rebuilt after startup
+_registry: AccessLevelRegistry = _buildRegistry()
+
+
+def registry() -> AccessLevelRegistry:
+    """Get the frozen registry of access levels. The registry is rebuilt only when an access level is registered.
+
+    :return: The registry of all access levels in `cfg.userAccessLevels`
+    :rtype: AccessLevelRegistry
+    """
+    return _registry
+
+
 def accessLevelNamed(name: str) -> AccessLevelType:
     """Look up the access level with the given name
 
@@ -57,9 +102,12 @@ def accessLevelWithIntLevel(level: int) -> AccessLevelType:
     :return: An access level positioned at `_intLevel` `level` in te access level heirarchy
     :rtype: AccessLevelType
     """
-    if level < 0 or level >= len(cfg.userAccessLevels):
-        raise ValueError(f"Invalid access level int level: {level}. Must be between 0 and {len(cfg.userAccessLevels) - 1}")
-    return accessLevelNamed(cfg.userAccessLevels[level])
+    levels = registry().levels
+    if level < 0 or level >= len(levels):
+        raise ValueError(f"Invalid access level int level: {level}. Must be between 0 and {len(levels) - 1}")
+    if (accessLevel := levels[level]) is None:
+        raise KeyError(cfg.userAccessLevels[level])
+    return accessLevel
 
 
 def defaultAccessLevel() -> AccessLevelType:
@@ -77,7 +125,7 @@ def maxAccessLevel() -> AccessLevelType:
     :return: The heirarchically-highest access level
     :rtype: AccessLevelType
     """
-    return accessLevelNamed(cfg.userAccessLevels[-1])
+    return accessLevelWithIntLevel(len(cfg.userAccessLevels) - 1)
 
 T = TypeVar("T", bound=AccessLevelType)
 
@@ -93,7 +141,7 @@ def accessLevel(name: Optional[str] = None, default: bool = False):
     :type default: bool
     """
     def inner(accessLevel: T, name = name, default = default) -> T:
-        global _defaultAccessLevel
+        global _defaultAccessLevel, _registry
         if not issubclass(accessLevel, _AccessLevelBase):
             raise ValueError(f"decorator is only valid for use on access level subclasses")
         if not isinstance(name, str):
@@ -109,6 +157,7 @@ def accessLevel(name: Optional[str] = None, default: bool = False):
         if len(_accessLevels) == maxAccessLevels:
             raise ValueError(f"Maximum access levels exceeded. Only {maxAccessLevels} access levels are supported.")
         _accessLevels[name] = accessLevel
+        _registry = _buildRegistry()
         if default:
             _defaultAccessLevel = accessLevel
         return accessLevel
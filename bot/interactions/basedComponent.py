@@ -1,4 +1,4 @@
-from typing import Any, Awaitable, Optional, TypeVar, Union, Callable, Protocol, cast, Dict
+from typing import Any, Awaitable, Optional, Tuple, TypeVar, Union, Callable, Protocol, cast, Dict
 from enum import Enum, EnumMeta, _EnumDict
 from inspect import iscoroutinefunction
 import inspect
@@ -314,6 +314,25 @@ def staticComponentMeta(customId: str) -> StaticComponentMeta:
     return StaticComponentMeta(ID, args=args)
 
 
+def splitStaticComponentCustomId(customId: str) -> Optional[Tuple[str, str]]:
+    """Split a static component `custom_id` into its ID and args, without looking up the ID in `StaticComponents`.
+    This is a cheaper alternative to `staticComponentMeta` for the interaction fast path, which looks up IDs by their string value.
+
+    :param customId: The `custom_id` to split
+    :type customId: str
+    :return: The value of the component's ID in the `StaticComponents` enum and the component's args,
+        or `None` if `customId` does not represent a static component
+    :rtype: Optional[Tuple[str, str]]
+    """
+    if not customId.startswith(STATIC_COMPONENT_CUSTOM_ID_PREFIX):
+        return None
+    start = len(STATIC_COMPONENT_CUSTOM_ID_PREFIX)
+    separator = customId.find(STATIC_COMPONENT_CUSTOM_ID_SEPARATOR, start)
+    if separator == -1:
+        return customId[start:], ""
+    return customId[start:separator], customId[separator + len(STATIC_COMPONENT_CUSTOM_ID_SEPARATOR):]
+
+
 async def maybeDefer(interaction: Interaction, ephemeral: bool = False, thinking: bool = False):
     """Defer an interaction response, unless it has already been responded to.
 
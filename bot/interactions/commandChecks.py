@@ -1,28 +1,197 @@
-from typing import Type, Union
+import asyncio
+from collections import OrderedDict
+from datetime import timedelta
+import time
+from typing import Generic, List, Optional, Tuple, Type, TypeVar, Union
 
-from discord import Interaction
+from discord import Interaction, PartialMessageable
 
 from ..cfg import cfg
+from .. import botState, lib
 from . import accessLevels
 
+TLevel = TypeVar("TLevel")
+# The key in `Interaction.extras` where the interaction user's access level is memoized
+_ACCESS_LEVEL_EXTRAS_KEY = "BASED_accessLevel"
 
-async def _checkLevel(level: Type["accessLevels.AccessLevelType"], interaction: Interaction) -> bool:
-    return await level.userHasAccess(interaction) \
-            if issubclass(level, accessLevels.AccessLevelAsync) \
-            else level.userHasAccess(interaction)
+
+class AccessLevelCache(Generic[TLevel]):
+    """Remembers users' access levels, keyed by guild and user ID. Entries expire `ttl` after they are set,
+    and should be invalidated when anything that an access level depends on changes, e.g the user's roles.
+    Since entries are shared between all channels in a guild, cached access levels must not depend on the channel.
+
+    :var ttl: How long to remember each access level for, in seconds
+    :vartype ttl: float
+    """
+    def __init__(self, ttl: timedelta) -> None:
+        self.ttl = ttl.total_seconds()
+        # Ordered by expiry time, since all entries have the same ttl
+        self._entries: OrderedDict[Tuple[Optional[int], int], Tuple[float, TLevel]] = OrderedDict()
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def _prune(self, now: float):
+        """Forget all expired entries.
+        """
+        while self._entries:
+            key, (expiry, _) = next(iter(self._entries.items()))
+            if expiry > now: return
+            del self._entries[key]
+
+
+    def get(self, guildId: Optional[int], userId: int) -> Optional[TLevel]:
+        """Get the remembered access level of a user in a guild.
+
+        :param Optional[int] guildId: The ID of the guild, or `None` for DMs
+        :param int userId: The ID of the user
+        :return: The user's access level, or `None` if it is not remembered
+        :rtype: Optional[TLevel]
+        """
+        entry = self._entries.get((guildId, userId))
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+
+    def set(self, guildId: Optional[int], userId: int, level: TLevel):
+        """Remember the access level of a user in a guild, for `ttl`.
+
+        :param Optional[int] guildId: The ID of the guild, or `None` for DMs
+        :param int userId: The ID of the user
+        :param TLevel level: The user's access level
+        """
+        now = time.monotonic()
+        self._prune(now)
+        key = (guildId, userId)
+        self._entries[key] = (now + self.ttl, level)
+        self._entries.move_to_end(key)
+
+
+    def invalidate(self, guildId: Optional[int], userId: int):
+        """Forget the access level of a user in a guild.
+
+        :param Optional[int] guildId: The ID of the guild, or `None` for DMs
+        :param int userId: The ID of the user
+        """
+        self._entries.pop((guildId, userId), None)
+
+
+    def invalidateGuild(self, guildId: int):
+        """Forget the access levels of all users in a guild.
+
+        :param int guildId: The ID of the guild
+        """
+        for key in [key for key in self._entries if key[0] == guildId]:
+            del self._entries[key]
+
+
+    def clear(self):
+        """Forget all access levels.
+        """
+        self._entries.clear()
+
+
+async def _checkLevelAsync(level: Type["accessLevels.AccessLevelAsync"], interaction: Interaction) -> Optional[bool]:
+    """Await an async access level check, giving up after `cfg.timeouts.accessLevelCheckTimeout` if a timeout is configured.
+
+    :return: Whether the check passed, or `None` if it timed out
+    :rtype: Optional[bool]
+    """
+    timeout = cfg.timeouts.accessLevelCheckTimeout.total_seconds()
+    if timeout <= 0:
+        return await level.userHasAccess(interaction)
+    try:
+        return await asyncio.wait_for(level.userHasAccess(interaction), timeout)
+    except asyncio.TimeoutError:
+        botState.client.logger.log("commandChecks", "checkLevelAsync",
+                                    f"Access level check '{level.name}' timed out after {timeout}s, treating it as failed",
+                                    eventType="TIMEOUT")
+        return None
+
+
+async def _inferUserPermissionsSequential(interaction: Interaction) -> Tuple[Type["accessLevels.AccessLevelType"], bool]:
+    """Await each async check in turn, from the highest level down.
+
+    :return: The user's access level, and whether any check above it timed out
+    :rtype: Tuple[AccessLevelType, bool]
+    """
+    timedOut = False
+    for level in accessLevels.registry().descending:
+        if issubclass(level, accessLevels.AccessLevelAsync):
+            passed = await _checkLevelAsync(level, interaction)
+            if passed:
+                return level, timedOut
+            timedOut = timedOut or passed is None
+        elif level.userHasAccess(interaction):
+            return level, timedOut
+    return accessLevels.defaultAccessLevel(), timedOut
+
+
+async def _inferUserPermissionsConcurrent(interaction: Interaction) -> Tuple[Type["accessLevels.AccessLevelType"], bool]:
+    """Find the highest passing sync check first, since only async levels above it can change the result.
+    Then start all of those async checks at once, and take their results from the highest level down.
+    Lower checks that are no longer needed are cancelled, or have their exceptions logged if they have already failed.
+
+    :return: The user's access level, and whether any check above it timed out
+    :rtype: Tuple[AccessLevelType, bool]
+    """
+    default = accessLevels.defaultAccessLevel()
+    asyncLevels: List[Type[accessLevels.AccessLevelAsync]] = []
+    for level in accessLevels.registry().descending:
+        if issubclass(level, accessLevels.AccessLevelAsync):
+            asyncLevels.append(level)
+        elif level.userHasAccess(interaction):
+            default = level
+            break
+
+    if not asyncLevels:
+        return default, False
+
+    checks = [asyncio.create_task(_checkLevelAsync(level, interaction)) for level in asyncLevels]
+    awaited = 0
+    timedOut = False
+    try:
+        for level, check in zip(asyncLevels, checks):
+            awaited += 1
+            passed = await check
+            if passed:
+                return level, timedOut
+            timedOut = timedOut or passed is None
+        return default, timedOut
+    finally:
+        # Exceptions from awaited checks have already been raised
+        for check in checks[awaited:]:
+            if check.done() and not check.cancelled():
+                lib.discordUtil.logExceptionsOnTask(check)
+            else:
+                check.cancel()
 
 
 async def inferUserPermissions(interaction: Interaction) -> Type["accessLevels.AccessLevelType"]:
     """Get the commands access level of the user that triggered an interaction.
+    The access level is memoized on the interaction, and cached in `botState.client.interactionAccessLevels`.
+    Access levels inferred without a resolved channel are not cached, since checks needing the channel fail without it.
+    Neither are access levels inferred while a higher level's check timed out, so that a slow check does not demote the user for
+    the whole cache TTL.
     
     :return: message.author's access level
     :rtype: basedCommand.AccessLevelType
     """
-    for levelName in cfg.userAccessLevels[::-1]:
-        level = accessLevels._accessLevels[levelName]
-        if await _checkLevel(level, interaction):
-            return level
-    return accessLevels.defaultAccessLevel()
+    if (level := interaction.extras.get(_ACCESS_LEVEL_EXTRAS_KEY)) is not None:
+        return level
+
+    cache = botState.client.interactionAccessLevels
+    if (level := cache.get(interaction.guild_id, interaction.user.id)) is None:
+        level, timedOut = await (_inferUserPermissionsConcurrent(interaction) if cfg.accessLevelCheckStrategy == "concurrent" \
+                                    else _inferUserPermissionsSequential(interaction))
+        if not timedOut and interaction.channel is not None and not isinstance(interaction.channel, PartialMessageable):
+            cache.set(interaction.guild_id, interaction.user.id, level)
+
+    interaction.extras[_ACCESS_LEVEL_EXTRAS_KEY] = level
+    return level
 
 
 def accessLevelSufficient(current: Type["accessLevels.AccessLevelType"], required: Type["accessLevels.AccessLevelType"]) -> bool:
@@ -34,8 +203,13 @@ def accessLevelSufficient(current: Type["accessLevels.AccessLevelType"], require
     :type required: accessLevels.AccessLevelType
     :return: `True` if `current` is at least as high in the access level heirarchy as `required`, `False` otherwise
     :rtype: bool
+    :raises ValueError: If either access level is not in `cfg.userAccessLevels`
     """
-    return current._intLevel() >= required._intLevel()
+    intLevels = accessLevels.registry().intLevels
+    try:
+        return intLevels[current] >= intLevels[required]
+    except KeyError as e:
+        raise ValueError(f"access level '{e.args[0].name}' is not in cfg.userAccessLevels") from None
 
 
 async def userHasAccess(interaction: Interaction, level: Type["accessLevels.AccessLevelType"]) -> bool:
@@ -0,0 +1,271 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import timedelta
+import time
+from typing import TYPE_CHECKING, Any, Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+from discord import AppCommandType, app_commands
+from discord.abc import Snowflake
+
+from . import accessLevels, basedCommand
+from ..cfg import cfg
+
+if TYPE_CHECKING:
+    from .. import client
+
+
+class ScopeIndex(NamedTuple):
+    """The chat input commands visible in one scope, organized by the access level that they require.
+    A guild's scope contains its global commands as well as the guild's own commands.
+
+    :var commands: The commands requiring exactly each access level, in tree order
+    :vartype commands: Dict[AccessLevelType, List[app_commands.Command]]
+    :var accessible: The commands callable at each access level, i.e requiring that access level or lower
+    :vartype accessible: Dict[AccessLevelType, List[app_commands.Command]]
+    :var helpSections: For each access level, the commands requiring exactly that access level that should be shown in help menus,
+        by help section. Sections are in the order that they were first registered, and empty sections are omitted
+    :vartype helpSections: Dict[AccessLevelType, Dict[str, List[app_commands.Command]]]
+    :var sectionNames: Every help section with commands to show in help menus at any access level, in registration order
+    :vartype sectionNames: Tuple[str, ...]
+    :var sortedSectionNames: `sectionNames` in sorted order, for autocompletion
+    :vartype sortedSectionNames: Tuple[str, ...]
+    :var names: The unique qualified names of the commands callable at each access level, in sorted order, for autocompletion
+    :vartype names: Dict[AccessLevelType, Tuple[str, ...]]
+    :var renderedPages: Help pages rendered from this scope, for the help command to fill and reuse.
+        These are discarded along with the scope when commands are added or removed
+    :vartype renderedPages: LRUCache
+    """
+    commands: Dict["accessLevels.AccessLevelType", List[app_commands.Command]]
+    accessible: Dict["accessLevels.AccessLevelType", List[app_commands.Command]]
+    helpSections: Dict["accessLevels.AccessLevelType", Dict[str, List[app_commands.Command]]]
+    sectionNames: Tuple[str, ...]
+    sortedSectionNames: Tuple[str, ...]
+    names: Dict["accessLevels.AccessLevelType", Tuple[str, ...]]
+    renderedPages: "LRUCache"
+
+
+class LRUCache:
+    """A mapping that holds at most `maxSize` values, forgetting the least recently used value to make room for new ones.
+
+    :var maxSize: The maximum number of values to hold
+    :vartype maxSize: int
+    """
+    def __init__(self, maxSize: int):
+        """
+        :param int maxSize: The maximum number of values to hold
+        """
+        self.maxSize = maxSize
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a value, marking it as recently used.
+
+        :param Hashable key: The key that the value was stored under
+        :return: The value, or `None` if it is not held
+        :rtype: Optional[Any]
+        """
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, forgetting the least recently used value if the cache is full.
+
+        :param Hashable key: The key to store the value under
+        :param Any value: The value to store
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxSize:
+            self._entries.popitem(last=False)
+
+
+class CommandIndex:
+    """The client's app commands, indexed by (guild scope, access level), so that help menus do not need to walk the command tree.
+    Each scope is built from the command tree the first time that it is looked up, and the whole index is invalidated
+    whenever commands are added to or removed from the tree.
+    Guilds without any guild commands share the global scope.
+    """
+    def __init__(self, client: "client.BasedClient"):
+        """
+        :param client: The client whose command tree to index
+        :type client: client.BasedClient
+        """
+        self.client = client
+        # Guild ID (None for global) -> the guild's scope
+        self._scopes: Dict[Optional[int], ScopeIndex] = {}
+
+
+    def invalidate(self):
+        """Forget all indexed scopes, so that they are rebuilt from the command tree when they are next looked up.
+        """
+        self._scopes.clear()
+
+
+    def scope(self, guild: Optional[Snowflake] = None) -> ScopeIndex:
+        """Get the commands visible in a guild, or in DMs.
+
+        :param guild: The guild to look up commands for, or `None` for global commands only (Default None)
+        :type guild: Optional[Snowflake]
+        :return: The commands visible in `guild`, by access level
+        :rtype: ScopeIndex
+        """
+        key = None if guild is None else guild.id
+        if (index := self._scopes.get(key)) is None:
+            index = self._scopes[key] = self._buildScope(guild)
+        return index
+
+
+    def _buildScope(self, guild: Optional[Snowflake]) -> ScopeIndex:
+        tree = self.client.tree
+        if guild is None:
+            visible = [c for c in tree.walk_commands(type=AppCommandType.chat_input) if isinstance(c, app_commands.Command)]
+        else:
+            guildCommands = [c for c in tree.walk_commands(guild=guild, type=AppCommandType.chat_input) if isinstance(c, app_commands.Command)]
+            if not guildCommands:
+                return self.scope(None)
+            visible = self.scope(None).accessible[accessLevels.maxAccessLevel()] + guildCommands
+
+        ascending = tuple(reversed(accessLevels.registry().descending))
+        commands: Dict[accessLevels.AccessLevelType, List[app_commands.Command]] = {level: [] for level in ascending}
+        for command in visible:
+            commands[basedCommand.accessLevel(command)].append(command)
+
+        accessible: Dict[accessLevels.AccessLevelType, List[app_commands.Command]] = {}
+        callableCommands: List[app_commands.Command] = []
+        for level in ascending:
+            callableCommands = callableCommands + commands[level]
+            accessible[level] = callableCommands
+
+        # Walk the client's help sections rather than the tree, to list commands in the order that they were registered
+        visibleSet = set(visible)
+        helpSections: Dict[accessLevels.AccessLevelType, Dict[str, List[app_commands.Command]]] = {level: {} for level in ascending}
+        sectionNames: List[str] = []
+        for section, sectionCommands in self.client.helpSections.items():
+            for command in sectionCommands:
+                if command in visibleSet and basedCommand.commandMeta(command).showInHelp:
+                    helpSections[basedCommand.accessLevel(command)].setdefault(section, []).append(command)
+                    if not sectionNames or sectionNames[-1] != section:
+                        sectionNames.append(section)
+
+        names = {level: tuple(sorted({c.qualified_name for c in accessible[level]})) for level in ascending}
+
+        return ScopeIndex(commands, accessible, helpSections, tuple(sectionNames), tuple(sorted(sectionNames)), names, LRUCache(cfg.helpPageCacheSize))
+
+
+def completeNames(names: Sequence[str], current: str, limit: int = 25) -> List[str]:
+    """Find the names that contain `current`, for autocompletion. Names starting with `current` are found by bisecting `names`
+    and are listed first. Only if there are fewer than `limit` of them are the remaining names scanned for `current`.
+
+    :param Sequence[str] names: The names to search, in sorted order
+    :param str current: The text to complete
+    :param int limit: The maximum number of names to find (Default 25)
+    :return: Up to `limit` names starting with `current` in sorted order, followed by names containing `current` in sorted order
+    :rtype: List[str]
+    """
+    start = end = bisect_left(names, current)
+    while end < len(names) and end - start < limit and names[end].startswith(current):
+        end += 1
+
+    found = list(names[start:end])
+    if len(found) < limit:
+        for name in names:
+            if current in name and not name.startswith(current):
+                found.append(name)
+                if len(found) == limit:
+                    break
+    return found
+
+
+class AutocompleteCache:
+    """Remembers autocomplete results for a short time, so that repeated keystrokes do not repeat the lookup,
+    or the inference of the user's access level.
+    Each result is stored against the `ScopeIndex` that it was found from, and is ignored once that scope has been rebuilt.
+
+    :var ttl: How long to remember each result for, in seconds
+    :vartype ttl: float
+    """
+    def __init__(self, ttl: timedelta):
+        self.ttl = ttl.total_seconds()
+        # Ordered by expiry time, since all entries have the same ttl
+        self._entries: OrderedDict[Hashable, Tuple[float, ScopeIndex, List[app_commands.Choice]]] = OrderedDict()
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def get(self, key: Hashable, scope: ScopeIndex) -> Optional[List[app_commands.Choice]]:
+        """Get a remembered autocomplete result.
+
+        :param Hashable key: The key that the result was stored under, e.g (guild ID, user ID, current text)
+        :param ScopeIndex scope: The current index of the scope that the result is for
+        :return: The remembered choices, or `None` if they are not remembered, have expired, or were found from an older index
+        :rtype: Optional[List[app_commands.Choice]]
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic() or entry[1] is not scope:
+            return None
+        return entry[2]
+
+
+    def set(self, key: Hashable, scope: ScopeIndex, choices: List[app_commands.Choice]):
+        """Remember an autocomplete result for `ttl`.
+
+        :param Hashable key: The key to store the result under
+        :param ScopeIndex scope: The index of the scope that the result was found from
+        :param List[app_commands.Choice] choices: The result
+        """
+        now = time.monotonic()
+        while self._entries:
+            oldest, (expiry, _, _) = next(iter(self._entries.items()))
+            if expiry > now: break
+            del self._entries[oldest]
+
+        self._entries[key] = (now + self.ttl, scope, choices)
+        self._entries.move_to_end(key)
+
+
+    def clear(self):
+        """Forget all results.
+        """
+        self._entries.clear()
+
+
+class BasedCommandTree(app_commands.CommandTree):
+    """A command tree that invalidates its client's `CommandIndex` whenever commands are added or removed,
+    and rebuilds the synced scope after syncing.
+    """
+    def add_command(self, *args, **kwargs):
+        super().add_command(*args, **kwargs)
+        self.client.commandIndex.invalidate()
+
+
+    def remove_command(self, *args, **kwargs):
+        command = super().remove_command(*args, **kwargs)
+        self.client.commandIndex.invalidate()
+        return command
+
+
+    def clear_commands(self, *args, **kwargs):
+        super().clear_commands(*args, **kwargs)
+        self.client.commandIndex.invalidate()
+
+
+    def copy_global_to(self, *args, **kwargs):
+        super().copy_global_to(*args, **kwargs)
+        self.client.commandIndex.invalidate()
+
+
+    async def sync(self, *, guild: Optional[Snowflake] = None):
+        synced = await super().sync(guild=guild)
+        self.client.commandIndex.invalidate()
+        self.client.commandIndex.scope(guild)
+        return synced
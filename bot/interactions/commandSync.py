@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from discord import HTTPException, RateLimited, app_commands
+from discord.abc import Snowflake
+
+
+class ScopeSyncResult(NamedTuple):
+    """The outcome of syncing one scope's app commands.
+
+    :var guildId: The ID of the synced guild, or `None` for global commands
+    :vartype guildId: Optional[int]
+    :var synced: The commands that were synced, or `None` if the scope was skipped or failed to sync
+    :vartype synced: Optional[List[app_commands.AppCommand]]
+    :var exception: The exception raised while syncing the scope, if it failed
+    :vartype exception: Optional[Exception]
+    """
+    guildId: Optional[int]
+    synced: Optional[List[app_commands.AppCommand]] = None
+    exception: Optional[Exception] = None
+
+    @property
+    def skipped(self) -> bool:
+        """Whether the scope was not synced because its commands had not changed since they were last synced
+        """
+        return self.synced is None and self.exception is None
+
+
+async def scopePayload(tree: app_commands.CommandTree, guild: Optional[Snowflake] = None) -> List[Dict[str, Any]]:
+    """Serialize the commands in one scope of a command tree, exactly as `CommandTree.sync` would upload them.
+
+    :param app_commands.CommandTree tree: The tree whose commands to serialize
+    :param guild: The guild whose commands to serialize, or `None` for global commands (Default None)
+    :type guild: Optional[Snowflake]
+    :return: The payload that syncing the scope would upload
+    :rtype: List[Dict[str, Any]]
+    """
+    commands = tree.get_commands(guild=guild)
+    translator = tree.translator
+    if translator:
+        return [await command.get_translated_payload(tree, translator) for command in commands]
+    return [command.to_dict(tree) for command in commands]
+
+
+def payloadHash(payload: List[Dict[str, Any]]) -> str:
+    """Hash a scope's serialized commands. Discord does not preserve the order of synced commands,
+    so the hash does not depend on the order of `payload`.
+
+    :param List[Dict[str, Any]] payload: The serialized commands, from `scopePayload`
+    :return: The hex SHA-256 of the payload, 64 characters long
+    :rtype: str
+    """
+    commands = sorted(json.dumps(command, sort_keys=True, separators=(",", ":"), default=str) for command in payload)
+    return hashlib.sha256("\n".join(commands).encode()).hexdigest()
+
+
+def _retryAfter(exception: HTTPException) -> Optional[float]:
+    """Read the number of seconds to wait from a rate limited response, if discord gave one.
+    """
+    headerValue = exception.response.headers.get("Retry-After") if exception.response is not None else None
+    try:
+        return float(headerValue) if headerValue is not None else None
+    except ValueError:
+        return None
+
+
+class SyncBackoff:
+    """Shared between concurrent syncs, so that a rate limit response for one scope pauses all of them
+    until the rate limit has passed, rather than each scope spending its retries on the same limit.
+    """
+    def __init__(self):
+        self._resumeAt = 0.0
+
+
+    async def wait(self):
+        """Wait until any rate limit reported by another sync has passed.
+        """
+        delay = self._resumeAt - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+    def backOff(self, seconds: float):
+        """Pause all syncs for `seconds`, or until an existing pause ends, whichever is later.
+
+        :param float seconds: How long to pause for
+        """
+        self._resumeAt = max(self._resumeAt, time.monotonic() + seconds)
+
+
+async def syncScope(tree: app_commands.CommandTree, guild: Optional[Snowflake], backoff: SyncBackoff, retries: int,
+                    retryDelay: float) -> List[app_commands.AppCommand]:
+    """Sync one scope of a command tree, retrying when rate limited.
+    Waits for as long as discord asks, or otherwise with exponential backoff starting at `retryDelay`.
+
+    :param app_commands.CommandTree tree: The tree to sync
+    :param guild: The guild to sync, or `None` for global commands
+    :type guild: Optional[Snowflake]
+    :param SyncBackoff backoff: The backoff shared with other concurrent syncs
+    :param int retries: The maximum number of times to retry after being rate limited
+    :param float retryDelay: The number of seconds to wait before the first retry, when discord does not say
+    :raise HTTPException: If syncing failed for a reason other than a rate limit, or was still rate limited after `retries` retries
+    :return: The synced commands
+    :rtype: List[app_commands.AppCommand]
+    """
+    attempt = 0
+    while True:
+        await backoff.wait()
+        try:
+            return await tree.sync(guild=guild)
+        except RateLimited as e:
+            if attempt == retries: raise
+            delay = e.retry_after
+        except HTTPException as e:
+            if e.status != 429 or attempt == retries: raise
+            delay = _retryAfter(e) or retryDelay * 2 ** attempt
+
+        backoff.backOff(delay)
+        attempt += 1
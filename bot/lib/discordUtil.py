@@ -6,7 +6,7 @@ from carica import ISerializable
 
 import discord
 from discord.errors import NotFound
-from discord import PartialMessageable, User, Member, ClientUser, Guild, Message
+from discord import PartialMessageable, PartialMessage, User, Member, ClientUser, Guild, Message
 from discord import Embed, Colour, HTTPException, Forbidden, RawReactionActionEvent
 from discord import DMChannel, GroupChannel, TextChannel
 from discord.abc import Messageable
@@ -101,6 +101,41 @@ async def endLongProcess(message: Message):
         pass
 
 
+def partialReactionFromRaw(payload: RawReactionActionEvent) -> Tuple[Optional[PartialMessage], Optional[Union[User, Member, ClientUser]],
+                                                                        Optional[emojis.BasedEmoji]]:
+    """Retrieve reaction and user info from a RawReactionActionEvent payload, without making any api calls.
+    The user is resolved from the payload or the client's cache, and the reacted message is given as a `PartialMessage`.
+    If the full message is needed, use `reactionFromRaw` instead.
+
+    :param RawReactionActionEvent payload: Payload describing the reaction action
+    :return: The message whose reactions changed, the user who completed the action, and the emoji that changed.
+            The user is `None` if they are not cached, and the emoji is `None` if it is a custom emoji that is not available to the bot.
+    :rtype: Tuple[PartialMessage, Optional[Union[User, Member, ClientUser]], Optional[BasedEmoji]]
+    """
+    client = botState.client
+    message = client.get_partial_messageable(payload.channel_id, guild_id=payload.guild_id) \
+                .get_partial_message(payload.message_id)
+
+    user: Optional[Union[User, Member, ClientUser]]
+    if payload.member is not None:
+        user = payload.member
+    elif client.user is not None and payload.user_id == client.user.id:
+        user = client.user
+    elif payload.guild_id is not None:
+        guild = client.get_guild(payload.guild_id)
+        user = None if guild is None else guild.get_member(payload.user_id)
+    else:
+        user = client.get_user(payload.user_id)
+
+    # Convert reacted emoji to BasedEmoji
+    try:
+        emoji = emojis.BasedEmoji.fromPartial(payload.emoji, rejectInvalid=True)
+    except exceptions.UnrecognisedCustomEmoji:
+        emoji = None
+
+    return message, user, emoji
+
+
 async def reactionFromRaw(payload: RawReactionActionEvent) -> Tuple[Optional[Message], Optional[Union[User, Member, ClientUser]],
                                                                     Optional[emojis.BasedEmoji]]:
     """Retrieve complete Reaction and user info from a RawReactionActionEvent payload.
@@ -1,6 +1,8 @@
-from typing import Any, Optional, Tuple, Type
-from sqlalchemy import Select, select, func
-from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+from typing import Any, Dict, Optional, Tuple, Type, Union
+from sqlalchemy import Select, TextClause, event, select, func, text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import Dialect
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncEngine, AsyncSession
 
 from ..baseClasses.declarativeBaseProtocol import DeclarativeBaseProtocol
 
@@ -20,14 +22,105 @@ def count(table: Type[DeclarativeBaseProtocol]) -> Select[Tuple[int]]:
     :return: A selectable that retrieves a count
     :rtype: Select[Tuple[int]]
     """
-    return select(table).order_by(None).with_only_columns(func.count())
+    return select(func.count()).select_from(table)
+
+
+def isMySQL(dialect: Dialect) -> bool:
+    """Decide whether `dialect` is MySQL or MariaDB, which share SQL syntax.
+    SQLAlchemy names the dialect "mariadb" when a MariaDB connection string is given.
+
+    :param dialect: The dialect to check
+    :type dialect: Dialect
+    :return: `True` if `dialect` is MySQL or MariaDB, `False` otherwise
+    :rtype: bool
+    """
+    return dialect.name in ("mysql", "mariadb")
+
+
+def approximateCount(dialect: Dialect, table: Type[DeclarativeBaseProtocol]) -> Optional[TextClause]:
+    """Estimate the number of documents in a table from the database's table statistics, without scanning the table.
+    Estimates are available for MySQL and MariaDB (`information_schema.TABLES`) and PostgreSQL (`pg_class.reltuples`).
+    The estimate may be stale, and PostgreSQL gives a negative estimate for tables that have never been analyzed.
+
+    :param dialect: The dialect of the engine that the statement will be executed on
+    :type dialect: Dialect
+    :param table: The table in which to estimate the number of documents
+    :type table: Type[DeclarativeBase]
+    :return: A statement that selects the estimate, or `None` if `dialect` does not offer estimates
+    :rtype: Optional[TextClause]
+    """
+    if isMySQL(dialect):
+        return text("SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tableName") \
+                .bindparams(tableName=table.__tablename__)
+    if dialect.name == "postgresql":
+        return text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:tableName)") \
+                .bindparams(tableName=f'"{table.__tablename__}"')
+    return None
+
+
+DialectInsert = Union[mysql.Insert, postgresql.Insert, sqlite.Insert]
+
+
+def dialectInsert(dialect: Dialect, table: Type[DeclarativeBaseProtocol]) -> Optional[DialectInsert]:
+    """Construct an `INSERT` statement for `table` that supports the native upsert clauses of `dialect`.
+    MySQL (and MariaDB) inserts support `on_duplicate_key_update`, PostgreSQL and SQLite inserts
+    support `on_conflict_do_update` and `on_conflict_do_nothing`.
+
+    :param dialect: The dialect of the engine that the statement will be executed on
+    :type dialect: Dialect
+    :param table: The table in which to insert
+    :type table: Type[DeclarativeBase]
+    :return: A dialect-specific insert into `table`, or `None` if `dialect` has no native upsert support
+    :rtype: Optional[DialectInsert]
+    """
+    if isMySQL(dialect):
+        return mysql.insert(table)
+    if dialect.name == "postgresql":
+        return postgresql.insert(table)
+    if dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return None
+
+
+def createEngine(connectionString: str, sqlitePragmas: Optional[Dict[str, Union[str, int]]] = None, **kwargs: Any) -> AsyncEngine:
+    """Create an async engine for `connectionString`. Any extra keyword arguments are passed to `create_async_engine`.
+    If the connection string is for a SQLite database, every connection made by the engine
+    will first have the given pragmas set on it.
+
+    :param str connectionString: The connection string for the database, e.g `sqlite+aiosqlite:///based.db`
+    :param sqlitePragmas: Pragma names and values to set on SQLite connections (Default None)
+    :type sqlitePragmas: Optional[Dict[str, Union[str, int]]]
+    :return: A new engine
+    :rtype: AsyncEngine
+    """
+    engine = create_async_engine(connectionString, **kwargs)
+    if engine.dialect.name == "sqlite" and sqlitePragmas:
+        statements = [f"PRAGMA {name} = {value}" for name, value in sqlitePragmas.items()]
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def setPragmas(dbapiConnection: Any, _: Any):
+            cursor = dbapiConnection.cursor()
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.close()
+
+    return engine
 
 
 class SessionSharer:
-    def __init__(self, session: Optional[AsyncSession], sessionMaker: async_sessionmaker[AsyncSession]) -> None:
+    def __init__(self, session: Optional[AsyncSession], sessionMaker: async_sessionmaker[AsyncSession], commit: bool = True) -> None:
+        """
+        :param session: The session to share, or `None` to open a new session from `sessionMaker`
+        :type session: Optional[AsyncSession]
+        :param sessionMaker: The session maker to open a new session from, if `session` is `None`
+        :type sessionMaker: async_sessionmaker[AsyncSession]
+        :param bool commit: Whether to commit the session on exit. Give `False` for read-only work, so that a shared
+            session's pending writes are left for its owner to commit (Default True)
+        """
         self._session = session
         self._sessionMaker = sessionMaker
         self._newSession = session is None
+        self._commit = commit
 
 
     async def __aenter__(self):
@@ -39,7 +132,8 @@ class SessionSharer:
 
 
     async def __aexit__(self, type_: Any, value: Any, traceback: Any) -> None:
-        await self.session.commit()
+        if self._commit:
+            await self.session.commit()
         if self._newSession:
             await self.session.__aexit__(type_, value, traceback)
 
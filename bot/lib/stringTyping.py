@@ -1,4 +1,6 @@
 # TODO: Remake most of these with regex
+from typing import Optional
+
 
 def isInt(x) -> bool:
     """Decide whether or not something is either an integer, or is castable to integer.
@@ -65,3 +67,47 @@ def getNumExtension(num: int) -> str:
     :rtype: str
     """
     return numExtensions[int(str(num)[-1])] if not (num > 10 and num < 20) else "th"
+
+
+def editDistance(a: str, b: str, maxDistance: Optional[int] = None) -> int:
+    """Count the minimum number of single character insertions, deletions and substitutions needed to turn one string
+    into another (the Levenshtein distance). For example, "help" -> "hlep" is 2, and "help" -> "helps" is 1.
+    If only small distances matter, give `maxDistance` to stop counting as soon as the distance is known to be greater.
+
+    :param str a: The first string
+    :param str b: The second string
+    :param Optional[int] maxDistance: The greatest distance to count up to (Default None)
+    :return: The edit distance between a and b, or `maxDistance + 1` if it is greater than `maxDistance`
+    :rtype: int
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    lenA, lenB = len(a), len(b)
+    # The distance is never more than the length of the longer string
+    if maxDistance is None or maxDistance > lenA:
+        maxDistance = lenA
+    elif lenA - lenB > maxDistance:
+        return maxDistance + 1
+    tooFar = maxDistance + 1
+
+    # Only the previous row of the distance matrix is needed. Only cells within maxDistance of the diagonal can be
+    # within maxDistance, so the rest are left as tooFar
+    previous = list(range(lenB + 1))
+    for i in range(1, lenA + 1):
+        charA = a[i - 1]
+        current = [tooFar] * (lenB + 1)
+        current[0] = rowMin = i if i <= maxDistance else tooFar
+        for j in range(max(1, i - maxDistance), min(lenB, i + maxDistance) + 1):
+            distance = previous[j - 1] + (charA != b[j - 1])
+            if previous[j] + 1 < distance:
+                distance = previous[j] + 1
+            if current[j - 1] + 1 < distance:
+                distance = current[j - 1] + 1
+            current[j] = distance
+            if distance < rowMin:
+                rowMin = distance
+        # Distances never decrease from one row to the next
+        if rowMin > maxDistance:
+            return tooFar
+        previous = current
+    return min(previous[lenB], tooFar)
@@ -1,12 +1,13 @@
-from typing import Any, Awaitable, Generic, Optional, Protocol, Type, TypeVar, Union, Dict, List, cast
+from typing import Any, Awaitable, Generic, Optional, Protocol, Sequence, Type, TypeVar, Union, Dict, List, cast
 from datetime import datetime
+import asyncio
 from abc import abstractmethod, ABC, ABCMeta
 
 from discord import Embed,  NotFound, HTTPException, Forbidden
 from discord import Member, User
 from discord import Client as DiscordClient
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, delete
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.orm.decl_api import DeclarativeAttributeIntercept
 from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncSession
@@ -122,7 +123,7 @@ class DatabaseReactionMenuOption(ReactionMenuOption, Base, metaclass=ABCDeclarat
     __tablename__ = "reactionMenuOption"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    menuId: Mapped[int] = mapped_column(ForeignKey("reactionMenu.id"))
+    menuId: Mapped[int] = mapped_column(ForeignKey("reactionMenu.id", ondelete="CASCADE"), index=True)
     emoji: Mapped[str]
     name: Mapped[Optional[str]]
     value: Mapped[Optional[str]]
@@ -308,7 +309,7 @@ class DatabaseReactionMenu(ReactionMenu[DatabaseReactionMenuOption], Base, Gener
     channelId: Mapped[int]
     menuType: Mapped[str]
     ownerId: Mapped[Optional[int]]
-    expiryTime: Mapped[Optional[datetime]]
+    expiryTime: Mapped[Optional[datetime]] = mapped_column(index=True)
     multipleChoice: Mapped[Optional[bool]]
     options: Mapped[List[DatabaseReactionMenuOption]] = relationship()
 
@@ -334,6 +335,46 @@ class DatabaseReactionMenu(ReactionMenu[DatabaseReactionMenuOption], Base, Gener
         return await self.awaitable_attrs.options
 
 
+# The maximum number of menu IDs to give in one statement when ending many menus
+_END_MENUS_BATCH_SIZE = 1000
+
+
+async def endDatabaseMenus(client: "client.BasedClient", menus: Sequence[DatabaseReactionMenu], timedOut: bool = False,
+                            session: Optional[AsyncSession] = None, maxConcurrency: int = 10):
+    """End many database menus at once. This behaves as calling `end` on each menu, but the menus' `onEnd` callbacks
+    are run concurrently (at most :param:`maxConcurrency` at a time), and the menu records are deleted with bulk statements.
+    The menus' options are deleted explicitly, so that they are not orphaned where the foreign key does not cascade,
+    e.g on SQLite databases without foreign key enforcement.
+    Exceptions raised by `onEnd` callbacks are logged, and do not prevent the menus from ending.
+
+    :param Sequence[DatabaseReactionMenu] menus: The menus to end
+    :param bool timedOut: Whether the menus are ending due to timeout (Default False)
+    :param int maxConcurrency: The maximum number of `onEnd` callbacks to run at once (Default 10)
+    """
+    if not menus: return
+
+    semaphore = asyncio.Semaphore(maxConcurrency)
+    async def onEnd(menu: DatabaseReactionMenu):
+        async with semaphore:
+            await menu.onEnd(timedOut)
+
+    tasks = lib.discordUtil.BasicScheduler()
+    for menu in menus:
+        tasks.add(onEnd(menu))
+    await tasks.wait()
+    tasks.logExceptions()
+
+    menuIds = [menu.id for menu in menus]
+    async with SessionSharer(session, client.sessionMaker) as s:
+        for start in range(0, len(menuIds), _END_MENUS_BATCH_SIZE):
+            batch = menuIds[start:start + _END_MENUS_BATCH_SIZE]
+            await s.session.execute(delete(DatabaseReactionMenuOption).where(DatabaseReactionMenuOption.menuId.in_(batch)))
+        await client.databaseReactionMenusDB.deleteMany(menuIds, batchSize=_END_MENUS_BATCH_SIZE, session=s.session)
+
+    for menu in menus:
+        menu._end(client, timedOut)
+
+
 def isDatabaseMenuTypeName(clsName: str) -> bool:
     """Decide if `clsName` is the name of a `DatabaseReactionMenu` class.
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from typing import Optional
 
+from sqlalchemy import CHAR
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
@@ -14,10 +15,13 @@ class BasedGuild(Base):
 
     :var id: The ID of the guild, directly corresponding to a discord guild's ID.
     :vartype id: int
+    :var appCommandsHash: The hash of the guild's app commands when they were last synced, or `None` if they have not been synced
+    :vartype appCommandsHash: Optional[str]
     """
     __tablename__ = "guild"
     id: Mapped[int] = mapped_column(primary_key=True)
     commandPrefix: Mapped[Optional[str]]
+    appCommandsHash: Mapped[Optional[str]] = mapped_column(CHAR(64))
 
 
     def __str__(self) -> str:
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar, Union
+
+import pytest
+
+from bot.cfg import cfg
+
+# Most of the bot imports its config on import, so it must be validated before any tests import the bot
+cfg.validateConfig()
+
+from bot import lib # noqa: E402
+from bot.interactions import basedCommand # noqa: E402, F401
+from bot.databases import schema # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncEngine # noqa: E402
+
+T = TypeVar("T")
+
+
+@pytest.fixture
+def runWithEngine() -> Callable[..., Any]:
+    """Run a coroutine function in a new event loop, against a new database containing the bot's tables.
+    The function is called with the engine followed by any extra args, and its result is returned.
+    The database is in-memory SQLite, unless a `connectionString` is given. Any `sqlitePragmas` are set on each connection.
+    The engine is disposed afterwards.
+
+    ```py
+    def test_something(runWithEngine):
+        assert runWithEngine(countGuilds, 3) == 3
+    ```
+    """
+    def run(test: Callable[..., Awaitable[T]], *args: Any, connectionString: str = "sqlite+aiosqlite://",
+            sqlitePragmas: Optional[Dict[str, Union[str, int]]] = None) -> T:
+        async def inner() -> T:
+            engine: AsyncEngine = lib.sql.createEngine(connectionString, sqlitePragmas=sqlitePragmas)
+            await schema.createTables(engine)
+            try:
+                return await test(engine, *args)
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(inner())
+
+    return run
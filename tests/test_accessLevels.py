@@ -0,0 +1,57 @@
+import pytest
+
+from bot import lib # noqa: F401
+from bot.cfg import cfg
+from bot.interactions import basedCommand # noqa: F401
+from bot.interactions import accessLevels, commandChecks
+
+
+def test_registry_follows_config_order():
+    registry = accessLevels.registry()
+    assert [level.name for level in registry.levels if level is not None] == cfg.userAccessLevels
+    assert registry.descending == tuple(reversed(registry.levels))
+    for intLevel, level in enumerate(registry.levels):
+        assert registry.intLevels[level] == level._intLevel() == intLevel
+        assert accessLevels.accessLevelWithIntLevel(intLevel) is level
+    assert accessLevels.maxAccessLevel() is registry.levels[-1]
+
+
+def test_registering_rebuilds_registry(monkeypatch):
+    monkeypatch.setattr(accessLevels, "_accessLevels", dict(accessLevels._accessLevels))
+    monkeypatch.setattr(accessLevels, "_registry", accessLevels.registry())
+    monkeypatch.setattr(cfg, "userAccessLevels", cfg.userAccessLevels + ["owner"])
+    before = accessLevels.registry()
+
+    @accessLevels.accessLevel("owner")
+    class OwnerAccessLevel(accessLevels.AccessLevel):
+        @classmethod
+        def userHasAccess(cls, interaction) -> bool:
+            return False
+
+    registry = accessLevels.registry()
+    assert registry is not before
+    assert registry.descending[0] is OwnerAccessLevel
+    assert accessLevels.maxAccessLevel() is OwnerAccessLevel
+    assert commandChecks.accessLevelSufficient(OwnerAccessLevel, accessLevels.registry().levels[-2]) # type: ignore[reportGeneralTypeIssues]
+
+
+class UnregisteredAccessLevel(accessLevels.AccessLevel):
+    name = "unregistered"
+
+    @classmethod
+    def userHasAccess(cls, interaction) -> bool:
+        return True
+
+
+def test_sufficient_compares_heirarchy():
+    user, developer = accessLevels.defaultAccessLevel(), accessLevels.maxAccessLevel()
+    assert commandChecks.accessLevelSufficient(developer, user)
+    assert commandChecks.accessLevelSufficient(user, user)
+    assert not commandChecks.accessLevelSufficient(user, developer)
+
+
+def test_sufficient_rejects_unknown_levels():
+    with pytest.raises(ValueError):
+        commandChecks.accessLevelSufficient(UnregisteredAccessLevel, accessLevels.defaultAccessLevel())
+    with pytest.raises(ValueError):
+        UnregisteredAccessLevel._intLevel()
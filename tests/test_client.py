@@ -0,0 +1,177 @@
+from types import SimpleNamespace
+
+import discord
+from sqlalchemy import event, select
+
+from bot.client import BasedClient
+from bot.databases import guildDB, reactionMenuDB, userDB
+from bot.interactions import basedApp, basedComponent, commandSync
+from bot.reactionMenus import reactionMenu
+from bot.users.basedGuild import BasedGuild
+
+
+def makeClient(engine) -> BasedClient:
+    return BasedClient(engine, userDB.UserDB(engine), guildDB.GuildDB(engine), {}, reactionMenuDB.ReactionMenuDB(engine))
+
+
+async def syncWithFailingScope(engine, monkeypatch):
+    client = makeClient(engine)
+    await client.guildsDB.createMany(BasedGuild(id=i) for i in (1, 2))
+    scopePayload = commandSync.scopePayload
+
+    async def failingScopePayload(tree, guild=None):
+        if guild is not None and guild.id == 2:
+            raise RuntimeError("cannot serialize")
+        return await scopePayload(tree, guild)
+
+    async def sync(*, guild=None):
+        return []
+
+    monkeypatch.setattr(commandSync, "scopePayload", failingScopePayload)
+    monkeypatch.setattr(client.tree, "sync", sync)
+    results = await client.syncAppCommands((SimpleNamespace(id=1), SimpleNamespace(id=2)))
+
+    assert results[0].synced == [] and results[0].exception is None
+    assert isinstance(results[1].exception, RuntimeError)
+    hashes = await client.guildsDB.getAppCommandsHashes((1, 2))
+    assert hashes[1] is not None and hashes[2] is None
+
+
+def test_sync_scope_failure_keeps_other_hashes(runWithEngine, monkeypatch):
+    runWithEngine(syncWithFailingScope, monkeypatch)
+
+
+class StaticComponentTestCog(basedApp.BasedCog):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    @basedApp.BasedCog.staticComponentCallback(basedComponent.StaticComponents.Clear_View)
+    async def clearView(self, interaction, args: str):
+        self.calls.append(args)
+
+
+def componentInteraction(ID, args: str = ""):
+    return SimpleNamespace(type=discord.InteractionType.component,
+                            data={"custom_id": basedComponent.staticComponentCustomId(ID, args)})
+
+
+async def staticComponentDispatch(engine, monkeypatch):
+    client = makeClient(engine)
+    logged = []
+    monkeypatch.setattr(client.logger, "log", lambda *args, **kwargs: logged.append(args))
+    cog = StaticComponentTestCog()
+    await client.add_cog(cog)
+    await client.on_interaction(componentInteraction(basedComponent.StaticComponents.Clear_View, "args")) # type: ignore[reportGeneralTypeIssues]
+    assert cog.calls == ["args"]
+
+    # Unregistered IDs are ignored silently
+    await client.on_interaction(componentInteraction(basedComponent.StaticComponents.Help)) # type: ignore[reportGeneralTypeIssues]
+    assert not logged
+
+    # Registered callbacks whose cog cannot be found are logged
+    monkeypatch.setattr(client, "get_cog", lambda name: None)
+    client._staticComponentDispatch = None
+    await client.on_interaction(componentInteraction(basedComponent.StaticComponents.Clear_View)) # type: ignore[reportGeneralTypeIssues]
+    assert cog.calls == ["args"]
+    assert len(logged) == 1 and "StaticComponentTestCog" in logged[0][2]
+
+
+def test_static_component_dispatch(runWithEngine, monkeypatch):
+    runWithEngine(staticComponentDispatch, monkeypatch)
+
+
+async def reconcileGuilds(engine, monkeypatch, unavailable: bool):
+    client = makeClient(engine)
+    logged = []
+    monkeypatch.setattr(client.logger, "log", lambda *args, **kwargs: logged.append(args))
+    monkeypatch.setattr(BasedClient, "guilds", property(lambda self: [SimpleNamespace(id=2, unavailable=unavailable)]))
+    await client.guildsDB.createMany(BasedGuild(id=i) for i in (1, 2))
+    await client.reconcileGuilds()
+    return [guildId async for guildId in client.guildsDB.iterateIds()], logged
+
+
+def test_reconcile_guilds(runWithEngine, monkeypatch):
+    guildIds, logged = runWithEngine(reconcileGuilds, monkeypatch, False)
+    assert guildIds == [2]
+    assert len(logged) == 1 and "0 added, 1 removed" in logged[0][2]
+
+
+def test_reconcile_guilds_skips_removals_while_unavailable(runWithEngine, monkeypatch):
+    guildIds, logged = runWithEngine(reconcileGuilds, monkeypatch, True)
+    assert guildIds == [1, 2]
+    assert len(logged) == 1 and "removals skipped" in logged[0][2]
+
+
+async def isMenu(engine):
+    client = makeClient(engine)
+    db = client.databaseReactionMenusDB
+    async with db.sessionMaker() as session:
+        session.add(reactionMenu.DatabaseReactionMenu(id=1, channelId=1))
+        await session.commit()
+
+    # Any message may be a menu until the stored menu IDs are loaded
+    before = [client.isMenu(i) for i in (1, 2, 3)]
+    await db.loadActiveIds()
+    client.inMemoryReactionMenusDB[3] = object() # type: ignore[reportGeneralTypeIssues]
+    after = [client.isMenu(i) for i in (1, 2, 3)]
+    await db.delete(1)
+    return before, after, client.isMenu(1)
+
+
+def test_is_menu(runWithEngine):
+    assert runWithEngine(isMenu) == ([True, True, True], [True, False, True], False)
+
+
+ended = []
+
+
+class EndMenusTestMenu(reactionMenu.DatabaseReactionMenu):
+    async def onEnd(self, timedOut, session=None):
+        ended.append(self.id)
+
+
+class InMemoryTestMenu:
+    def __init__(self, menuId):
+        self.id = menuId
+
+    async def end(self, client):
+        ended.append(self.id)
+
+
+async def endMenus(engine, toEnd):
+    ended.clear()
+    client = makeClient(engine)
+    async with client.sessionMaker() as session:
+        for menuId in range(1, 6):
+            session.add(EndMenusTestMenu(id=menuId, channelId=1, options=[
+                reactionMenu.DatabaseReactionMenuOption(emoji="1️⃣", name="one")
+            ]))
+        await session.commit()
+    await client.databaseReactionMenusDB.loadActiveIds()
+    client.inMemoryReactionMenusDB[10] = InMemoryTestMenu(10) # type: ignore[reportGeneralTypeIssues]
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        count = await client.endMenus(toEnd)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+
+    async with client.sessionMaker() as session:
+        remaining = (await session.scalars(select(reactionMenu.DatabaseReactionMenuOption.menuId))).all()
+    return count, sorted(ended), remaining, len(statements)
+
+
+def test_end_menus(runWithEngine):
+    oneMenu = runWithEngine(endMenus, (1, 10, 99))
+    assert oneMenu[:3] == (2, [1, 10], [2, 3, 4, 5])
+    manyMenus = runWithEngine(endMenus, (1, 2, 3, 10, 99))
+    assert manyMenus[:3] == (4, [1, 2, 3, 10], [4, 5])
+    # The number of queries does not depend on the number of menus
+    assert manyMenus[3] == oneMenu[3]
+
+
+def test_end_menus_ignores_non_menus(runWithEngine):
+    assert runWithEngine(endMenus, (98, 99)) == (0, [], [1, 2, 3, 4, 5], 0)
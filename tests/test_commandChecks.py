@@ -0,0 +1,105 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from discord import PartialMessageable
+
+from bot import botState, lib # noqa: F401
+from bot.cfg import cfg
+from bot.interactions import basedCommand # noqa: F401
+from bot.interactions import accessLevels, commandChecks
+
+
+def fakeInteraction(channel):
+    return SimpleNamespace(extras={}, guild_id=1, user=SimpleNamespace(id=2), channel=channel)
+
+
+@pytest.fixture
+def accessLevelCache(monkeypatch):
+    cache = commandChecks.AccessLevelCache(timedelta(minutes=1))
+    monkeypatch.setattr(botState, "client", SimpleNamespace(interactionAccessLevels=cache), raising=False)
+    return cache
+
+
+@pytest.mark.parametrize("channel", (None, PartialMessageable(state=None, id=3))) # type: ignore[reportGeneralTypeIssues]
+def test_unresolved_channel_not_cached(accessLevelCache, channel):
+    level = asyncio.run(commandChecks.inferUserPermissions(fakeInteraction(channel))) # type: ignore[reportGeneralTypeIssues]
+    assert level is accessLevels.defaultAccessLevel()
+    assert accessLevelCache.get(1, 2) is None
+
+
+def test_resolved_channel_cached(accessLevelCache):
+    level = asyncio.run(commandChecks.inferUserPermissions(fakeInteraction(SimpleNamespace(id=3)))) # type: ignore[reportGeneralTypeIssues]
+    assert accessLevelCache.get(1, 2) is level
+
+
+class PassingAsyncLevel(accessLevels.AccessLevelAsync):
+    name = "passing"
+
+    @classmethod
+    async def userHasAccess(cls, interaction) -> bool:
+        await asyncio.sleep(0.01)
+        return True
+
+
+class FailingAsyncLevel(accessLevels.AccessLevelAsync):
+    name = "failing"
+
+    @classmethod
+    async def userHasAccess(cls, interaction) -> bool:
+        raise RuntimeError("check failed")
+
+
+def test_concurrent_unneeded_failures_logged(monkeypatch):
+    levels = (PassingAsyncLevel, FailingAsyncLevel, accessLevels.defaultAccessLevel())
+    monkeypatch.setattr(accessLevels, "registry", lambda: accessLevels.AccessLevelRegistry(levels, levels, {}))
+    logged = []
+    monkeypatch.setattr(lib.discordUtil, "logExceptionsOnTask", lambda task: logged.append(task.exception()))
+
+    level, timedOut = asyncio.run(commandChecks._inferUserPermissionsConcurrent(fakeInteraction(None))) # type: ignore[reportGeneralTypeIssues]
+    assert level is PassingAsyncLevel and not timedOut
+    assert len(logged) == 1 and isinstance(logged[0], RuntimeError)
+
+
+def test_concurrent_awaited_failure_raised(monkeypatch):
+    levels = (FailingAsyncLevel, PassingAsyncLevel, accessLevels.defaultAccessLevel())
+    monkeypatch.setattr(accessLevels, "registry", lambda: accessLevels.AccessLevelRegistry(levels, levels, {}))
+    logged = []
+    monkeypatch.setattr(lib.discordUtil, "logExceptionsOnTask", lambda task: logged.append(task.exception()))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(commandChecks._inferUserPermissionsConcurrent(fakeInteraction(None))) # type: ignore[reportGeneralTypeIssues]
+    assert not logged
+
+
+class SlowAsyncLevel(accessLevels.AccessLevelAsync):
+    name = "slow"
+
+    @classmethod
+    async def userHasAccess(cls, interaction) -> bool:
+        await asyncio.sleep(10)
+        return True
+
+
+@pytest.mark.parametrize("strategy", ("sequential", "concurrent"))
+def test_timed_out_level_logged_and_not_cached(monkeypatch, accessLevelCache, strategy):
+    levels = (SlowAsyncLevel, accessLevels.defaultAccessLevel())
+    monkeypatch.setattr(accessLevels, "registry", lambda: accessLevels.AccessLevelRegistry(levels, levels, {}))
+    monkeypatch.setattr(cfg, "accessLevelCheckStrategy", strategy)
+    monkeypatch.setattr(cfg.timeouts, "accessLevelCheckTimeout", timedelta(milliseconds=10))
+    logged = []
+    botState.client.logger = SimpleNamespace(log=lambda *args, **kwargs: logged.append(args))
+
+    level = asyncio.run(commandChecks.inferUserPermissions(fakeInteraction(SimpleNamespace(id=3)))) # type: ignore[reportGeneralTypeIssues]
+    assert level is accessLevels.defaultAccessLevel()
+    assert accessLevelCache.get(1, 2) is None
+    assert len(logged) == 1
+
+
+def test_no_timeout_by_default(monkeypatch):
+    assert cfg.timeouts.accessLevelCheckTimeout.total_seconds() == 0
+    levels = (PassingAsyncLevel, accessLevels.defaultAccessLevel())
+    monkeypatch.setattr(accessLevels, "registry", lambda: accessLevels.AccessLevelRegistry(levels, levels, {}))
+    level, timedOut = asyncio.run(commandChecks._inferUserPermissionsSequential(fakeInteraction(None))) # type: ignore[reportGeneralTypeIssues]
+    assert level is PassingAsyncLevel and not timedOut
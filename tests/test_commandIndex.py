@@ -0,0 +1,198 @@
+import asyncio
+import copy
+from datetime import timedelta
+from types import SimpleNamespace
+
+import discord
+from discord import app_commands
+import pytest
+
+from bot import lib
+from bot.cfg import cfg
+from bot.client import BasedClient
+from bot.cogs import HelpCog
+from bot.databases import guildDB, reactionMenuDB, userDB
+from bot.interactions import accessLevels, basedCommand, commandChecks, commandIndex
+
+
+def makeCommand(name, accessLevel, helpSection="misc", showInHelp=True):
+    async def callback(interaction: discord.Interaction):
+        pass
+    command = app_commands.Command(name=name, description=name, callback=callback)
+    return basedCommand.basedCommand(accessLevel=accessLevel, helpSection=helpSection, showInHelp=showInHelp)(command)
+
+
+def addCommand(client, command, guild=None):
+    client.tree.add_command(command, guild=guild)
+    client.addBasedCommand(command)
+
+
+@pytest.fixture
+def client():
+    # No connections are made to the database
+    engine = lib.sql.createEngine("sqlite+aiosqlite://")
+    client = BasedClient(engine, userDB.UserDB(engine), guildDB.GuildDB(engine), {}, reactionMenuDB.ReactionMenuDB(engine))
+    addCommand(client, makeCommand("ping", "user"))
+    addCommand(client, makeCommand("kick", "mod", "moderation"))
+    addCommand(client, makeCommand("secret", "user", showInHelp=False))
+    addCommand(client, makeCommand("local", "admin"), guild=discord.Object(1))
+    return client
+
+
+def names(commands):
+    return [command.name for command in commands]
+
+
+def test_global_scope(client):
+    scope = client.commandIndex.scope(None)
+    assert {level.name: names(commands) for level, commands in scope.commands.items()} \
+            == {"user": ["ping", "secret"], "mod": ["kick"], "admin": [], "developer": []}
+    assert {level.name: names(commands) for level, commands in scope.accessible.items()} \
+            == {"user": ["ping", "secret"], "mod": ["ping", "secret", "kick"], "admin": ["ping", "secret", "kick"],
+                "developer": ["ping", "secret", "kick"]}
+    # Hidden commands can be called and completed, but are not listed in help
+    assert {level.name: {section: names(commands) for section, commands in sections.items()}
+                for level, sections in scope.helpSections.items()} \
+            == {"user": {"misc": ["ping"]}, "mod": {"moderation": ["kick"]}, "admin": {}, "developer": {}}
+    assert scope.sectionNames == ("misc", "moderation")
+    assert {level.name: names for level, names in scope.names.items()}["mod"] == ("kick", "ping", "secret")
+
+
+def test_guild_scopes(client):
+    globalScope = client.commandIndex.scope(None)
+    # Guilds without guild commands share the global scope
+    assert client.commandIndex.scope(discord.Object(2)) is globalScope
+
+    guildScope = client.commandIndex.scope(discord.Object(1))
+    assert guildScope is not globalScope
+    assert {level.name: names(commands) for level, commands in guildScope.accessible.items()}["admin"] \
+            == ["ping", "secret", "kick", "local"]
+    assert {level.name: names(commands) for level, commands in guildScope.accessible.items()}["mod"] == ["ping", "secret", "kick"]
+    local = client.tree.get_command("local", guild=discord.Object(1))
+    assert guildScope.helpSections[basedCommand.accessLevel(local)] == {"misc": [local]}
+
+
+def test_tree_changes_invalidate_scopes(client):
+    scope = client.commandIndex.scope(None)
+    assert client.commandIndex.scope(None) is scope
+
+    pong = makeCommand("pong", "user")
+    addCommand(client, pong)
+    rebuilt = client.commandIndex.scope(None)
+    assert rebuilt is not scope
+    assert "pong" in rebuilt.names[basedCommand.accessLevel(pong)]
+
+    client.tree.remove_command("pong")
+    client.removeBasedCommand(pong)
+    assert "pong" not in client.commandIndex.scope(None).names[basedCommand.accessLevel(pong)]
+
+    client.tree.clear_commands(guild=discord.Object(1))
+    assert client.commandIndex.scope(discord.Object(1)) is client.commandIndex.scope(None)
+
+
+NAMES = ("alpha", "beta", "betamax", "gamma", "gamma beta", "help", "zeta")
+
+
+@pytest.mark.parametrize("current, limit, expected", (
+    ("beta", 25, ["beta", "betamax", "gamma beta"]),
+    ("eta", 25, ["beta", "betamax", "gamma beta", "zeta"]),
+    ("a", 25, ["alpha", "beta", "betamax", "gamma", "gamma beta", "zeta"]),
+    ("", 3, ["alpha", "beta", "betamax"]),
+    ("beta", 2, ["beta", "betamax"]),
+    ("eta", 2, ["beta", "betamax"]),
+    ("q", 25, [])
+))
+def test_complete_names(current, limit, expected):
+    assert commandIndex.completeNames(NAMES, current, limit) == expected
+
+
+def test_complete_names_matches_scan():
+    for current in ("", "a", "am", "be", "gamma ", "ta", "zeta", "zz"):
+        prefixed = [name for name in NAMES if name.startswith(current)]
+        contained = [name for name in NAMES if current in name and not name.startswith(current)]
+        for limit in range(1, len(NAMES) + 1):
+            assert commandIndex.completeNames(NAMES, current, limit) == (prefixed + contained)[:limit]
+
+
+def test_autocomplete_cache(client, monkeypatch):
+    now = 100.0
+    monkeypatch.setattr(commandIndex.time, "monotonic", lambda: now)
+    cache = commandIndex.AutocompleteCache(timedelta(seconds=2))
+    scope = client.commandIndex.scope(None)
+    choices = [app_commands.Choice(name="ping", value="ping")]
+    cache.set((None, 1, "p"), scope, choices)
+    assert cache.get((None, 1, "p"), scope) is choices
+    assert cache.get((None, 2, "p"), scope) is None
+
+    # Results found from a scope that has since been rebuilt are ignored
+    client.commandIndex.invalidate()
+    assert cache.get((None, 1, "p"), client.commandIndex.scope(None)) is None
+
+    # Expired results are ignored, and are forgotten when new results are stored
+    now = 101.5
+    cache.set((None, 2, "p"), scope, choices)
+    now = 102.0
+    assert cache.get((None, 1, "p"), scope) is None
+    assert cache.get((None, 2, "p"), scope) is choices
+    cache.set((None, 3, "p"), scope, choices)
+    assert len(cache) == 2
+
+
+def test_lru_cache():
+    cache = commandIndex.LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    # "b" is now the least recently used
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    cache.set("a", 4)
+    cache.set("d", 5)
+    assert (cache.get("a"), cache.get("c"), cache.get("d")) == (4, None, 5)
+    assert len(cache) == 2
+
+
+@pytest.fixture
+def helpCog(client, monkeypatch):
+    # Emojis are only initialized once the bot has started
+    emojis = copy.copy(cfg.defaultEmojis)
+    emojis.initializeEmojis()
+    monkeypatch.setattr(cfg, "defaultEmojis", emojis)
+    cog = HelpCog.HelpCog(client)
+    cog.sent = []
+    async def sendHelpPage(interaction, page):
+        cog.sent.append(page)
+    monkeypatch.setattr(cog, "sendHelpPage", sendHelpPage)
+    return cog
+
+
+def showSection(helpCog, monkeypatch, userLevel, section, pageNum=None, commandLevel=None):
+    """Show a single help section page, returning the page sent.
+    """
+    async def inferUserPermissions(interaction):
+        return userLevel
+    monkeypatch.setattr(commandChecks, "inferUserPermissions", inferUserPermissions)
+    asyncio.run(helpCog.showHelpPageSingleSection(SimpleNamespace(guild=None), commandLevel or userLevel, section, pageNum=pageNum)) # type: ignore[reportGeneralTypeIssues]
+    return helpCog.sent[-1]
+
+
+def test_rendered_help_pages(client, helpCog, monkeypatch):
+    user, mod = accessLevels.accessLevelNamed("user"), accessLevels.accessLevelNamed("mod")
+    pages = client.commandIndex.scope(None).renderedPages
+
+    first = showSection(helpCog, monkeypatch, user, "misc")
+    assert showSection(helpCog, monkeypatch, user, "misc", pageNum=1) is first
+    # Pages are keyed by the user's own access level as well as the level being viewed
+    assert showSection(helpCog, monkeypatch, mod, "misc", commandLevel=user) is not first
+    assert len(pages) == 2
+
+    # Unknown sections and pages past the end of a section are not cached
+    showSection(helpCog, monkeypatch, user, "unknown", pageNum=3)
+    showSection(helpCog, monkeypatch, user, "misc", pageNum=3)
+    assert len(pages) == 2
+
+    # Changing the commands discards the rendered pages along with the scope
+    addCommand(client, makeCommand("pong", "user"))
+    rebuilt = showSection(helpCog, monkeypatch, user, "misc")
+    assert len(rebuilt.embed.fields) == len(first.embed.fields) + 1
+    assert len(client.commandIndex.scope(None).renderedPages) == 1
@@ -0,0 +1,120 @@
+import pytest
+
+from bot.commandsManager.commandParser import CommandParser, ParsedCommand, PrefixMatch, PrefixTrie, mentionPrefixes, parseCommand
+
+USER_ID = 1234
+
+
+def test_trie_empty_prefix():
+    with pytest.raises(ValueError):
+        PrefixTrie().add("")
+
+
+def test_trie_no_match():
+    trie = PrefixTrie((".", "!!"))
+    assert trie.match("hello") is None
+    assert trie.match("!hello") is None
+    assert trie.match("") is None
+
+
+def test_trie_multi_character_prefix():
+    trie = PrefixTrie(("bot!",))
+    assert trie.match("bot!help") == PrefixMatch("bot!", 4)
+    assert trie.match("bot help") is None
+
+
+def test_trie_longest_overlapping_prefix_wins():
+    trie = PrefixTrie(("!", "!!", "!!!"))
+    assert trie.match("!help") == PrefixMatch("!", 1)
+    assert trie.match("!!help") == PrefixMatch("!!", 2)
+    assert trie.match("!!!help") == PrefixMatch("!!!", 3)
+    # The longest prefix that fully matches wins, even if a longer prefix starts matching
+    assert PrefixTrie(("a", "abc")).match("abd") == PrefixMatch("a", 1)
+
+
+def test_trie_skips_spaces_only_when_asked():
+    trie = PrefixTrie((".",))
+    trie.add("<@1>", skipSpaces=True)
+    assert trie.match(".  help") == PrefixMatch(".", 1)
+    assert trie.match("<@1>   help") == PrefixMatch("<@1>", 7)
+
+
+def test_parse_prefix_only():
+    trie = PrefixTrie((".",))
+    assert parseCommand(".", trie) is None
+
+
+def test_parse_no_prefix():
+    assert parseCommand("help", PrefixTrie((".",))) is None
+
+
+def test_parse_command_without_args():
+    assert parseCommand(".help", PrefixTrie((".",))) == ParsedCommand(".", "help", "")
+
+
+def test_parse_command_with_args():
+    assert parseCommand(".say hello  world", PrefixTrie((".",))) == ParsedCommand(".", "say", "hello  world")
+
+
+def test_parse_space_after_prefix():
+    # Spaces are only skipped after mentions, so this is an empty command name
+    assert parseCommand(". foo", PrefixTrie((".",))) == ParsedCommand(".", "", "foo")
+
+
+def test_parse_multi_character_prefixes():
+    trie = PrefixTrie(("!", "!!"))
+    assert parseCommand("!!help me", trie) == ParsedCommand("!!", "help", "me")
+    assert parseCommand("!help me", trie) == ParsedCommand("!", "help", "me")
+
+
+def test_parse_smart_apostrophes_only_in_args():
+    parsed = parseCommand(".it’s don‘t ‘quoted’", PrefixTrie((".",)))
+    assert parsed == ParsedCommand(".", "it’s", "don't 'quoted'")
+
+
+@pytest.mark.parametrize("mention", mentionPrefixes(USER_ID))
+def test_parser_mentions(mention):
+    parser = CommandParser(USER_ID)
+    assert parser.parse(f"{mention} help", (".",)) == ParsedCommand(mention, "help", "")
+    assert parser.parse(f"{mention}    say hi", (".",)) == ParsedCommand(mention, "say", "hi")
+    assert parser.parse(f"{mention}help", (".",)) == ParsedCommand(mention, "help", "")
+    assert parser.parse(f"{mention}   ", (".",)) is None
+    assert parser.parse(mention, (".",)) is None
+
+
+def test_parser_other_mentions_ignored():
+    parser = CommandParser(USER_ID)
+    assert parser.parse("<@999> help", (".",)) is None
+    assert parser.parse(".help", (".",)) == ParsedCommand(".", "help", "")
+
+
+def test_parser_without_mention_user():
+    parser = CommandParser()
+    assert parser.parse(f"<@{USER_ID}> help", (".",)) is None
+
+
+def test_parser_caches_tries():
+    parser = CommandParser(USER_ID, cacheSize=2)
+    trie = parser.trieFor((".",))
+    assert parser.trieFor((".",)) is trie
+    parser.trieFor(("!",))
+    parser.trieFor(("?",))
+    assert parser.trieFor((".",)) is not trie
+
+
+def test_set_mention_user_clears_tries():
+    parser = CommandParser()
+    trie = parser.trieFor((".",))
+    assert parser.parse(f"<@{USER_ID}> help", (".",)) is None
+
+    parser.setMentionUser(USER_ID)
+    assert parser.trieFor((".",)) is not trie
+    assert parser.parse(f"<@{USER_ID}> help", (".",)) == ParsedCommand(f"<@{USER_ID}>", "help", "")
+
+    # Setting the same user again keeps the cached tries
+    trie = parser.trieFor((".",))
+    parser.setMentionUser(USER_ID)
+    assert parser.trieFor((".",)) is trie
+
+    parser.setMentionUser(None)
+    assert parser.parse(f"<@{USER_ID}> help", (".",)) is None
@@ -0,0 +1,59 @@
+import sys
+
+import pytest
+
+from bot import commands
+
+MODULE_NAME = "reloadTestCommands"
+FULL_NAME = "bot.commands." + MODULE_NAME
+
+COMMANDS_MODULE = """
+from . import commandsDB
+
+async def {name}(message, args, isDM):
+    pass
+
+commandsDB.register("{name}", {name}, 0, shortHelp="{name} help")
+"""
+
+
+@pytest.fixture
+def commandsModule(tmp_path, monkeypatch):
+    monkeypatch.setattr(commands, "__path__", [*commands.__path__, str(tmp_path)])
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+    path = tmp_path / (MODULE_NAME + ".py")
+    yield path
+    commands.commandsDB.unregisterModule(FULL_NAME)
+    sys.modules.pop(FULL_NAME, None)
+
+
+def helpFieldValues():
+    return [field.value for page in commands.commandsDB.helpSectionPages(0, "miscellaneous") for field in page.fields]
+
+
+def test_reload_commands_module(commandsModule):
+    commandsModule.write_text(COMMANDS_MODULE.format(name="alpha"))
+    db = commands.reloadCommandsModule(MODULE_NAME)
+    assert db is commands.commandsDB
+    assert "alpha" in db.dispatch
+    assert "alpha help" in helpFieldValues()
+
+    commandsModule.write_text(COMMANDS_MODULE.format(name="betaCommand"))
+    commands.reloadCommandsModule(MODULE_NAME)
+    assert "alpha" not in db.dispatch
+    assert "betacommand" in db.dispatch
+    assert "alpha help" not in helpFieldValues()
+    assert "betaCommand help" in helpFieldValues()
+
+
+def test_failed_reload_restores_commands(commandsModule):
+    commandsModule.write_text(COMMANDS_MODULE.format(name="alpha"))
+    commands.reloadCommandsModule(MODULE_NAME)
+
+    commandsModule.write_text(COMMANDS_MODULE.format(name="gamma") + "\nraise RuntimeError('broken')\n")
+    with pytest.raises(RuntimeError):
+        commands.reloadCommandsModule(MODULE_NAME)
+    assert "alpha" in commands.commandsDB.dispatch
+    assert "gamma" not in commands.commandsDB.dispatch
+    assert helpFieldValues().count("alpha help") == 1
+    assert "gamma help" not in helpFieldValues()
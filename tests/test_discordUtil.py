@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from bot import botState, lib
+
+
+class FakeMessageable:
+    def __init__(self, channelId, guildId):
+        self.channelId = channelId
+        self.guildId = guildId
+
+    def get_partial_message(self, messageId):
+        return (self.channelId, self.guildId, messageId)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    members = {10: SimpleNamespace(name="guild member")}
+    guild = SimpleNamespace(get_member=members.get)
+    client = SimpleNamespace(
+        user=SimpleNamespace(id=1),
+        get_partial_messageable=lambda channelId, guild_id=None: FakeMessageable(channelId, guild_id),
+        get_guild={100: guild}.get,
+        get_user={20: SimpleNamespace(name="dm user")}.get,
+        get_emoji={5: "<:known:5>"}.get,
+        logger=SimpleNamespace(log=lambda *args, **kwargs: None)
+    )
+    monkeypatch.setattr(botState, "client", client, raising=False)
+    return client
+
+
+def payload(userId, guildId=None, member=None, emoji=discord.PartialEmoji(name="👍")):
+    return SimpleNamespace(channel_id=1000, guild_id=guildId, message_id=2000, user_id=userId, member=member, emoji=emoji)
+
+
+def test_partial_reaction_message_and_emoji(client):
+    message, _, emoji = lib.discordUtil.partialReactionFromRaw(payload(20)) # type: ignore[reportGeneralTypeIssues]
+    assert message == (1000, None, 2000)
+    assert emoji is not None and emoji.sendable == "👍"
+
+    _, _, emoji = lib.discordUtil.partialReactionFromRaw(payload(20, emoji=discord.PartialEmoji(name="known", id=5))) # type: ignore[reportGeneralTypeIssues]
+    assert emoji is not None and emoji.id == 5
+
+
+def test_partial_reaction_unknown_custom_emoji(client):
+    _, _, emoji = lib.discordUtil.partialReactionFromRaw(payload(20, emoji=discord.PartialEmoji(name="unknown", id=6))) # type: ignore[reportGeneralTypeIssues]
+    assert emoji is None
+
+
+@pytest.mark.parametrize("userId, guildId, member, expected", (
+    (10, 100, SimpleNamespace(name="payload member"), "payload member"),
+    (10, 100, None, "guild member"),
+    (11, 100, None, None),
+    (10, 101, None, None),
+    (20, None, None, "dm user"),
+    (21, None, None, None)
+))
+def test_partial_reaction_user(client, userId, guildId, member, expected):
+    _, user, _ = lib.discordUtil.partialReactionFromRaw(payload(userId, guildId, member)) # type: ignore[reportGeneralTypeIssues]
+    assert (None if user is None else user.name) == expected
+
+
+def test_partial_reaction_own_user(client):
+    for guildId in (None, 100):
+        _, user, _ = lib.discordUtil.partialReactionFromRaw(payload(1, guildId)) # type: ignore[reportGeneralTypeIssues]
+        assert user is client.user
@@ -0,0 +1,75 @@
+import random
+
+from bot.commandsManager.fuzzyIndex import FuzzyIndex
+
+
+def levenshtein(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def bruteForceClosest(idents, query, accessLevel, maxDistance):
+    """The closest identifier by measuring the distance to every identifier callable at the access level.
+    """
+    matches = [(levenshtein(query.lower(), ident.lower()), ident) for ident, levels in idents.items()
+                if min(levels) <= accessLevel]
+    best = min(matches, default=None)
+    return None if best is None or best[0] > maxDistance else best[1]
+
+
+def randomWord(rng, maxLength=7):
+    return "".join(rng.choice("abcAB") for _ in range(rng.randint(1, maxLength)))
+
+
+def test_closest_matches_brute_force():
+    rng = random.Random(0)
+    for maxDistance in (1, 2, 3):
+        index = FuzzyIndex(maxDistance)
+        # Identifier as suggested -> access levels it was added at. Casings of the same identifier are not mixed
+        idents = {}
+        for _ in range(60):
+            ident = randomWord(rng)
+            if ident.lower() in {i.lower() for i in idents} and ident not in idents:
+                continue
+            accessLevel = rng.randrange(3)
+            index.add(ident, accessLevel)
+            idents.setdefault(ident, []).append(accessLevel)
+
+        for ident in rng.sample(sorted(idents), 20):
+            accessLevel = idents[ident].pop()
+            index.remove(ident, accessLevel)
+            if not idents[ident]:
+                del idents[ident]
+        assert len(index) == len(idents)
+
+        for _ in range(300):
+            query = randomWord(rng, 12)
+            for accessLevel in range(3):
+                assert index.closest(query, accessLevel) == bruteForceClosest(idents, query, accessLevel, maxDistance)
+
+
+def test_long_queries_rejected():
+    index = FuzzyIndex(2)
+    index.add("abcdef", 0)
+    index.add("ab", 0)
+    assert index.closest("abcdefgh", 0) == "abcdef"
+    assert index.closest("abcdefghi", 0) is None
+
+    # Removing the longest identifier shortens the longest query that can match
+    index.remove("abcdef", 0)
+    assert index.closest("abcd", 0) == "ab"
+    assert index.closest("abcde", 0) is None
+
+
+def test_ties_broken_alphabetically():
+    index = FuzzyIndex(1)
+    for ident in ("cat", "bat", "hat"):
+        index.add(ident, 0)
+    assert index.closest("at", 0) == "bat"
+    index.remove("bat", 0)
+    assert index.closest("at", 0) == "cat"
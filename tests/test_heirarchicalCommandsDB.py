@@ -0,0 +1,138 @@
+import asyncio
+import random
+
+from bot.cfg import cfg
+from bot.commandsManager.heirarchicalCommandsDB import HeirarchicalCommandsDB
+
+
+async def command(message, args, isDM):
+    pass
+
+
+def newDB() -> HeirarchicalCommandsDB:
+    db = HeirarchicalCommandsDB(len(cfg.userAccessLevels))
+    db.addHelpSection(0, "games")
+    for i in range(3):
+        db.register(f"game{i}", command, 0, helpSection="games", shortHelp="A game", module="games")
+    db.register("info", command, 0, shortHelp="Information", module="info")
+    return db
+
+
+def test_unregister_module_removes_commands():
+    db = newDB()
+    assert len(db.helpSectionPages(0, "games")) == 1
+
+    db.unregisterModule("games")
+    assert "game0" not in db.commands[0]
+    assert "game0" not in db.dispatch
+    assert db.suggest("gane0", 0) is None
+    assert list(db.helpSectionPages(0, "miscellaneous")[0].fields) == list(newDB().helpSectionPages(0, "miscellaneous")[0].fields)
+
+
+def test_emptied_sections_have_no_pages():
+    db = newDB()
+    assert "games" in db.helpSectionEmbeds[0]
+
+    db.unregisterModule("games")
+    assert db.helpSectionPages(0, "games") == []
+    assert "games" not in db.helpSectionEmbeds[0]
+    assert db.totalEmbeds[0] == 1
+
+
+def test_restore_registrations():
+    db = newDB()
+    db.restoreRegistrations(db.unregisterModule("games"))
+    assert "game0" in db.commands[0]
+    assert len(db.helpSectionPages(0, "games")[0].fields) == 3
+
+
+def recordingCommand(called, name):
+    async def command(message, args, isDM):
+        called.append(name)
+    return command
+
+
+def callName(db, called, command, accessLevel):
+    called.clear()
+    found = asyncio.run(db.call(command, None, "", accessLevel)) # type: ignore[reportGeneralTypeIssues]
+    return called[0] if found else None
+
+
+def test_call_priority():
+    db = HeirarchicalCommandsDB(len(cfg.userAccessLevels))
+    called = []
+    db.register("ping", recordingCommand(called, "ping@0"), 0, noHelp=True)
+    db.register("Ping", recordingCommand(called, "Ping@0"), 0, forceKeepCommandCasing=True, noHelp=True)
+    db.register("ping", recordingCommand(called, "ping@2"), 2, noHelp=True)
+    db.register("Pong", recordingCommand(called, "Pong@1"), 1, forceKeepCommandCasing=True, noHelp=True)
+
+    # Exact casing matches are preferred, and lower case commands match any casing
+    assert [callName(db, called, c, 0) for c in ("ping", "PING", "Ping")] == ["ping@0", "ping@0", "Ping@0"]
+    # Higher access levels are preferred, even over exact casing matches at lower levels
+    assert [callName(db, called, c, 2) for c in ("ping", "Ping")] == ["ping@2", "ping@2"]
+    # Case sensitive commands only match their own casing, at or above their access level
+    assert [callName(db, called, c, l) for c, l in (("Pong", 1), ("pong", 1), ("Pong", 0), ("Pong", 2))] \
+            == ["Pong@1", None, None, "Pong@1"]
+
+
+def referenceCall(db, command, accessLevel):
+    """The search order of the original call implementation, before commands were flattened into `dispatch`.
+    """
+    for requiredAccess in range(accessLevel, -1, -1):
+        for ident in (command, command.lower()):
+            if ident in db.commands[requiredAccess]:
+                return db.commands[requiredAccess][ident].ident, requiredAccess
+    return None
+
+
+def test_call_matches_reference():
+    rng = random.Random(0)
+    db = HeirarchicalCommandsDB(len(cfg.userAccessLevels))
+    called = []
+    names = ["".join(rng.choice("aAbB") for _ in range(3)) for _ in range(40)]
+    for name in names:
+        accessLevel = rng.randrange(db.numAccessLevels)
+        keepCasing = rng.random() < 0.5
+        ident = name if keepCasing else name.lower()
+        if ident not in db.commands[accessLevel]:
+            db.register(name, recordingCommand(called, (ident, accessLevel)), accessLevel,
+                        forceKeepCommandCasing=keepCasing, noHelp=True)
+
+    for name in names:
+        for command in (name, name.lower(), name.upper(), name.swapcase()):
+            for accessLevel in range(db.numAccessLevels):
+                assert callName(db, called, command, accessLevel) == referenceCall(db, command, accessLevel)
+
+
+def test_help_pages_built_lazily_per_section():
+    db = newDB()
+    # Registering commands does not build any help pages
+    assert db._helpPages == {}
+
+    games = db.helpSectionPages(0, "games")
+    misc = db.helpSectionPages(0, "miscellaneous")
+    assert db.helpSectionPages(0, "games") is games
+    assert set(db._helpPages) == {(0, "games"), (0, "miscellaneous")}
+
+    # Only the changed section is rebuilt
+    db.register("game3", command, 0, helpSection="games", shortHelp="A game", module="games")
+    assert (0, "games") not in db._helpPages
+    assert db.helpSectionPages(0, "miscellaneous") is misc
+    assert len(db.helpSectionPages(0, "games")[0].fields) == 4
+
+
+def test_help_pages_split(monkeypatch):
+    monkeypatch.setattr(cfg, "maxCommandsPerHelpPage", 2)
+    db = newDB()
+    pages = db.helpSectionPages(0, "games")
+    assert [[field.name for field in page.fields] for page in pages] == [["command", "command"], ["command"]]
+    assert [page.footer.text for page in pages] == ["Page 1 of 2", "Page 2 of 2"]
+    assert db.totalEmbeds[0] == 3
+
+
+def test_help_thumbnail_applies_to_built_and_unbuilt_pages():
+    db = newDB()
+    games = db.helpSectionPages(0, "games")
+    db.setHelpThumbnail("https://example.com/thumbnail.png")
+    assert games[0].thumbnail.url == "https://example.com/thumbnail.png"
+    assert db.helpSectionPages(0, "miscellaneous")[0].thumbnail.url == "https://example.com/thumbnail.png"
@@ -0,0 +1,133 @@
+import asyncio
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot.databases import reactionMenuDB
+from bot.databases.invalidation import InMemoryInvalidationBus, SQLiteInvalidationBus
+from bot.reactionMenus import reactionMenu
+
+
+class ReactionMenuDBTestMenu(reactionMenu.DatabaseReactionMenu):
+    pass
+
+
+class ReactionMenuDBOtherTestMenu(reactionMenu.DatabaseReactionMenu):
+    pass
+
+
+async def waitFor(condition, timeout: float = 5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def crossProcessActiveIds(engine, directory: Path):
+    busPath = str(directory / "invalidations.db")
+    # Each bus stands in for another bot process sharing the database
+    busA = SQLiteInvalidationBus(busPath, timedelta(milliseconds=10))
+    busB = SQLiteInvalidationBus(busPath, timedelta(milliseconds=10))
+    await busA.start()
+    await busB.start()
+    try:
+        dbA = reactionMenuDB.ReactionMenuDB(engine, invalidationBus=busA)
+        dbB = reactionMenuDB.ReactionMenuDB(engine, invalidationBus=busB)
+        await dbA.loadActiveIds()
+        await dbB.loadActiveIds()
+        assert not dbB.isActive(1)
+
+        await dbA.create(ReactionMenuDBTestMenu(id=1, channelId=1))
+        assert dbA.isActive(1)
+        await waitFor(lambda: dbB.isActive(1))
+
+        await dbA.delete(1)
+        assert not dbA.isActive(1)
+        await waitFor(lambda: not dbB.isActive(1))
+
+        await dbA.createMany([ReactionMenuDBTestMenu(id=2, channelId=1), ReactionMenuDBTestMenu(id=3, channelId=1)])
+        await waitFor(lambda: dbB.isActive(2) and dbB.isActive(3))
+        await dbA.deleteMany((2, 3))
+        await waitFor(lambda: not dbB.isActive(2) and not dbB.isActive(3))
+
+        # A closed DB no longer receives updates, e.g after being replaced by reloadDBs
+        dbB.close()
+        dbC = reactionMenuDB.ReactionMenuDB(engine, invalidationBus=busB)
+        await dbC.loadActiveIds()
+        await dbA.create(ReactionMenuDBTestMenu(id=4, channelId=1))
+        await waitFor(lambda: dbC.isActive(4))
+        assert 4 not in dbB._activeIds
+    finally:
+        await busA.stop()
+        await busB.stop()
+
+
+def test_cross_process_active_ids(runWithEngine, tmp_path):
+    runWithEngine(crossProcessActiveIds, tmp_path, connectionString=f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}")
+
+
+async def closeUnsubscribes(engine):
+    bus = InMemoryInvalidationBus()
+    dbs = [reactionMenuDB.ReactionMenuDB(engine, invalidationBus=bus) for _ in range(3)]
+    for db in dbs:
+        db.close()
+    assert not bus._subscribers[dbs[0].tableName]
+    assert not any(db in reactionMenuDB._reactionMenuDBs for db in dbs)
+
+
+def test_close_unsubscribes(runWithEngine):
+    runWithEngine(closeUnsubscribes)
+
+
+async def endMenusDeletesOptions(engine):
+    # Without the foreign_keys pragma, SQLite does not cascade deletes to the options
+    db = reactionMenuDB.ReactionMenuDB(engine)
+    async with db.sessionMaker() as session:
+        for menuId in (1, 2, 3):
+            session.add(ReactionMenuDBTestMenu(id=menuId, channelId=1, options=[
+                reactionMenu.DatabaseReactionMenuOption(emoji=emoji, name=emoji) for emoji in ("1️⃣", "2️⃣")
+            ]))
+        await session.commit()
+
+    # As in the client, menus stay loaded after the session that fetched them commits
+    sessionMaker = async_sessionmaker(engine, expire_on_commit=False)
+    client = SimpleNamespace(sessionMaker=sessionMaker, databaseReactionMenusDB=db, dispatch=lambda *args: None)
+    async with sessionMaker() as session:
+        menus = await db.getMany((1, 2), session=session)
+        await reactionMenu.endDatabaseMenus(client, menus, session=session) # type: ignore[reportGeneralTypeIssues]
+
+    async with db.sessionMaker() as session:
+        assert (await session.scalars(select(reactionMenu.DatabaseReactionMenuOption.menuId))).all() == [3, 3]
+        assert (await session.scalars(select(reactionMenu.DatabaseReactionMenu.id))).all() == [3]
+
+
+def test_end_menus_deletes_options(runWithEngine):
+    runWithEngine(endMenusDeletesOptions)
+
+
+async def iterateTyped(engine):
+    db = reactionMenuDB.ReactionMenuDB(engine)
+    async with db.sessionMaker() as session:
+        for menuId in range(1, 6):
+            menuClass = ReactionMenuDBTestMenu if menuId % 2 else ReactionMenuDBOtherTestMenu
+            session.add(menuClass(id=menuId, channelId=1))
+        await session.commit()
+
+    menus = [menu async for menu in db.iterate(batchSize=2, where=reactionMenu.DatabaseReactionMenu.id > 1)]
+    assert [(menu.id, type(menu)) for menu in menus] == [
+        (2, ReactionMenuDBOtherTestMenu), (3, ReactionMenuDBTestMenu), (4, ReactionMenuDBOtherTestMenu), (5, ReactionMenuDBTestMenu)
+    ]
+
+    # A shared session is not committed by iterating
+    async with db.sessionMaker() as session:
+        session.add(ReactionMenuDBTestMenu(id=6, channelId=1))
+        assert [menu.id async for menu in db.iterate(batchSize=2, session=session)] == [1, 2, 3, 4, 5, 6]
+        await session.rollback()
+    assert [menuId async for menuId in db.iterateIds()] == [1, 2, 3, 4, 5]
+
+
+def test_iterate_typed(runWithEngine):
+    runWithEngine(iterateTyped)
@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import inspect, select
+
+from bot.cfg import cfg
+from bot.databases import reactionMenuDB, schema
+from bot.reactionMenus import reactionMenu
+
+
+class SchemaTestMenu(reactionMenu.DatabaseReactionMenu):
+    pass
+
+
+async def pragmasAndTables(engine):
+    async with engine.connect() as connection:
+        pragmas = {name: (await connection.exec_driver_sql(f"PRAGMA {name}")).scalar() for name in ("journal_mode", "foreign_keys", "busy_timeout")}
+        tables = await connection.run_sync(lambda syncConnection: set(inspect(syncConnection).get_table_names()))
+
+    # Creating the tables again leaves the existing tables in place
+    await schema.createTables(engine)
+    return pragmas, tables
+
+
+def test_sqlite_profile(runWithEngine, tmp_path):
+    pragmas, tables = runWithEngine(pragmasAndTables, connectionString=f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}",
+                                    sqlitePragmas=cfg.sqlitePragmas)
+    assert pragmas == {"journal_mode": "wal", "foreign_keys": 1, "busy_timeout": 5000}
+    assert tables == {"user", "guild", "reactionMenu", "reactionMenuOption"}
+
+
+async def deleteCascades(engine):
+    db = reactionMenuDB.ReactionMenuDB(engine)
+    async with db.sessionMaker() as session:
+        session.add(SchemaTestMenu(id=1, channelId=1, options=[reactionMenu.DatabaseReactionMenuOption(emoji="1️⃣", name="one")]))
+        await session.commit()
+
+    await db.delete(1)
+    async with db.sessionMaker() as session:
+        return (await session.scalars(select(reactionMenu.DatabaseReactionMenuOption.menuId))).all()
+
+
+def test_foreign_keys_cascade_menu_deletes(runWithEngine):
+    assert runWithEngine(deleteCascades, sqlitePragmas={"foreign_keys": "ON"}) == []
+
+
+@pytest.mark.parametrize("pragmas", ({"journal_mode; DROP TABLE guild": "WAL"}, {"journal_mode": "WAL; DROP TABLE guild"}))
+def test_invalid_pragmas_rejected(monkeypatch, pragmas):
+    monkeypatch.setattr(cfg, "sqlitePragmas", pragmas)
+    with pytest.raises(ValueError):
+        cfg.validateConfig()
@@ -0,0 +1,168 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import inspect, select, text
+from sqlalchemy.dialects.mysql.mariadb import MariaDBDialect
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot import lib
+from bot.databases import guildDB, schema, snowflakeDb
+from bot.users.basedGuild import BasedGuild
+
+
+class RecordingBus:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, table, recordIds, deleted=False):
+        self.published.extend(recordIds)
+
+
+async def getOrCreate(engine, insertReturning: bool):
+    db = guildDB.GuildDB(engine)
+    db._dialect.insert_returning = insertReturning
+    db.invalidationBus = bus = RecordingBus() # type: ignore[reportGeneralTypeIssues]
+
+    created = await db.getOrCreate(BasedGuild(id=1, commandPrefix="!"))
+    assert inspect(created).identity == (1,)
+    assert bus.published == [1]
+
+    existing = await db.getOrCreate(BasedGuild(id=1, commandPrefix="?"))
+    assert inspect(existing).identity == (1,)
+    # Getting an existing record is not a write, and does not change it
+    assert bus.published == [1]
+    async with db.sessionMaker() as session:
+        assert await session.scalar(select(BasedGuild.commandPrefix)) == "!"
+
+
+@pytest.mark.parametrize("insertReturning", (True, False))
+def test_get_or_create_marks_only_inserts(runWithEngine, insertReturning):
+    runWithEngine(getOrCreate, insertReturning)
+
+
+async def reconcile(engine, liveGuildIds, deleteDeparted):
+    db = guildDB.GuildDB(engine)
+    await db.createMany(BasedGuild(id=i) for i in (1, 2, 3))
+    result = await db.reconcile(liveGuildIds, batchSize=2, deleteDeparted=deleteDeparted)
+    return result, [guildId async for guildId in db.iterateIds()]
+
+
+def test_reconcile(runWithEngine):
+    assert runWithEngine(reconcile, {2, 3, 4}, True) == ((1, 1), [2, 3, 4])
+
+
+def test_reconcile_skipping_deletes(runWithEngine):
+    assert runWithEngine(reconcile, {2, 3, 4}, False) == ((1, 0), [1, 2, 3, 4])
+
+
+def test_reconcile_without_guilds_deletes_nothing(runWithEngine):
+    assert runWithEngine(reconcile, set(), True) == ((0, 0), [1, 2, 3])
+
+
+async def iterate(engine):
+    db = guildDB.GuildDB(engine)
+    await db.createMany(BasedGuild(id=i, commandPrefix=str(i)) for i in range(1, 6))
+
+    # Records stay readable after the iteration's session has closed
+    guilds = [guild async for guild in db.iterate(batchSize=2)]
+    assert [(guild.id, guild.commandPrefix) for guild in guilds] == [(i, str(i)) for i in range(1, 6)]
+    assert [guildId async for guildId in db.iterateIds(batchSize=2, where=BasedGuild.id > 2)] == [3, 4, 5]
+
+    # A shared session is not committed by iterating
+    async with db.sessionMaker() as session:
+        session.add(BasedGuild(id=6))
+        assert [guildId async for guildId in db.iterateIds(batchSize=2, session=session)] == [1, 2, 3, 4, 5, 6]
+        await session.rollback()
+    assert [guildId async for guildId in db.iterateIds()] == [1, 2, 3, 4, 5]
+
+
+def test_iterate(runWithEngine):
+    runWithEngine(iterate)
+
+
+async def singleRecordStatements(engine):
+    db = guildDB.GuildDB(engine)
+    await db.createMany(BasedGuild(id=i, commandPrefix=str(i)) for i in (1, 2))
+
+    # Update statements are built once for each set of fields
+    assert db._updateStatement(("commandPrefix",)) is db._updateStatement(("commandPrefix",))
+    assert db._updateStatement(("commandPrefix",)) is not db._updateStatement(("commandPrefix", "appCommandsHash"))
+
+    # As in the client, shared sessions do not expire their records when committed
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        loaded = await db.get(1, session=session)
+        await db.update(1, session=session, commandPrefix="?")
+        await db.update(2, session=session, commandPrefix="?", appCommandsHash="a" * 64)
+        # The loaded record is synchronized without being refreshed
+        assert loaded.commandPrefix == "?"
+
+    assert [(guild.commandPrefix, guild.appCommandsHash) async for guild in db.iterate()] == [("?", None), ("?", "a" * 64)]
+    assert [await db.exists(i) for i in (1, 2, 3)] == [True, True, False]
+    assert await db.get(3) is None
+    assert list(db._updateStatements) == [("commandPrefix",), ("commandPrefix", "appCommandsHash")]
+
+
+def test_single_record_statements(runWithEngine):
+    runWithEngine(singleRecordStatements)
+
+
+async def replicaReads(primary, monkeypatch):
+    now = 100.0
+    monkeypatch.setattr(snowflakeDb.time, "monotonic", lambda: now)
+    # The replica never receives writes, so any read served by it is stale
+    replica = lib.sql.createEngine("sqlite+aiosqlite://")
+    await schema.createTables(replica)
+    try:
+        db = guildDB.GuildDB(primary, readEngine=replica, replicaMaxLag=timedelta(seconds=5))
+        await db.create(BasedGuild(id=1))
+        reads = [await db.exists(1), await db.exists(2), await db.countAllDocuments()]
+
+        now = 103.0
+        await db.create(BasedGuild(id=2))
+        now = 105.0
+        # Record 1's window has passed, but record 2 is still within its window
+        reads += [await db.exists(1), await db.exists(2), await db.countAllDocuments()]
+
+        now = 108.0
+        reads += [await db.exists(2), await db.countAllDocuments()]
+
+        # Reads through a shared session always see the primary
+        async with db.sessionMaker() as session:
+            reads += [await db.exists(1, session=session), await db.countAllDocuments(session=session)]
+        return reads
+    finally:
+        await replica.dispose()
+
+
+def test_replica_staleness_window(runWithEngine, monkeypatch):
+    assert runWithEngine(replicaReads, monkeypatch) == [True, False, 1, False, True, 2, False, 0, True, 2]
+
+
+def test_mariadb_native_upsert():
+    dialect = MariaDBDialect()
+    db = guildDB.GuildDB(SimpleNamespace(dialect=dialect)) # type: ignore[reportGeneralTypeIssues]
+    assert db._nativeUpsert
+    statement = str(db._nativeUpsertStatement(BasedGuild(id=1, commandPrefix="!")).compile(dialect=dialect))
+    assert statement.startswith("INSERT INTO guild") and "ON DUPLICATE KEY UPDATE" in statement
+
+
+async def countAll(engine, monkeypatch, estimate):
+    db = guildDB.GuildDB(engine)
+    await db.createMany(BasedGuild(id=i) for i in range(1, 4))
+    counts = [await db.countAllDocuments(), await db.countAllDocuments(approximate=True)]
+    # Stand in for a dialect with table statistics
+    monkeypatch.setattr(snowflakeDb, "approximateCount", lambda dialect, table: text(f"SELECT {estimate}"))
+    counts.append(await db.countAllDocuments(approximate=True))
+    counts.append(await db.countAllDocuments())
+    return counts
+
+
+def test_count_approximate(runWithEngine, monkeypatch):
+    # SQLite has no estimates, so approximate counts are exact
+    assert runWithEngine(countAll, monkeypatch, 42) == [3, 3, 42, 3]
+
+
+def test_count_approximate_falls_back_on_unanalyzed_tables(runWithEngine, monkeypatch):
+    # PostgreSQL estimates tables that have never been analyzed as -1
+    assert runWithEngine(countAll, monkeypatch, -1) == [3, 3, 3, 3]
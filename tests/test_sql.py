@@ -0,0 +1,24 @@
+import pytest
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.dialects.mysql.mariadb import MariaDBDialect
+
+from bot import lib
+from bot.users.basedGuild import BasedGuild
+
+
+@pytest.mark.parametrize("dialect", (mysql.dialect(), MariaDBDialect()))
+def test_mysql_dialects(dialect):
+    assert lib.sql.isMySQL(dialect)
+    assert isinstance(lib.sql.dialectInsert(dialect, BasedGuild), mysql.Insert)
+    assert "information_schema.TABLES" in str(lib.sql.approximateCount(dialect, BasedGuild))
+
+
+@pytest.mark.parametrize("dialect", (postgresql.dialect(), sqlite.dialect()))
+def test_other_dialects(dialect):
+    assert not lib.sql.isMySQL(dialect)
+    assert not isinstance(lib.sql.dialectInsert(dialect, BasedGuild), mysql.Insert)
+
+
+def test_approximate_count_dialects():
+    assert "pg_class" in str(lib.sql.approximateCount(postgresql.dialect(), BasedGuild))
+    assert lib.sql.approximateCount(sqlite.dialect(), BasedGuild) is None